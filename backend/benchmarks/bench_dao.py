@@ -0,0 +1,88 @@
+"""
+Микробенчмарк чтения BaseDAO на таблицах разного размера: find_all (ORM-объекты),
+find_all_rows (dict без identity map) и страница keyset-пагинации.
+
+Запуск из каталога backend:
+    python benchmarks/bench_dao.py [--sizes 100,1000,10000,100000] [--output path.json]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import SRC_DIR, percentile, write_results  # noqa: E402
+
+sys.path.insert(0, SRC_DIR)
+
+from loguru import logger  # noqa: E402
+
+from api.schemas import AddReport  # noqa: E402
+from db.dao import ReportsDAO  # noqa: E402
+from db.database import Base, build_engine  # noqa: E402
+from db.models import Report, User  # noqa: E402,F401
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # noqa: E402
+
+
+async def timed(session_maker, call, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        async with session_maker() as session:
+            started = time.perf_counter()
+            await call(ReportsDAO(session))
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def bench_size(size: int, repeat: int) -> list[dict]:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_engine(f"sqlite+aiosqlite:///{directory}/bench.sqlite3")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_maker() as session:
+            await ReportsDAO(session).add_many(
+                [AddReport(title=f"Report {i}", content="myo-signal summary " * 20) for i in range(size)]
+            )
+            await session.commit()
+
+        cases = {
+            "find_all": lambda dao: dao.find_all(None),
+            "find_all_rows": lambda dao: dao.find_all_rows(None),
+            "find_all_rows_page_100": lambda dao: dao.find_all_rows(None, limit=100),
+        }
+        results = []
+        for name, call in cases.items():
+            # Меньше повторов для полной выборки больших таблиц
+            runs = repeat if name.endswith("_100") else max(3, repeat * 1000 // max(size, 1000))
+            timings = await timed(session_maker, call, runs)
+            result = {
+                "method": name,
+                "rows": size,
+                "runs": runs,
+                "p50_ms": round(percentile(timings, 50) * 1000, 3),
+                "p99_ms": round(percentile(timings, 99) * 1000, 3),
+            }
+            print(f"{name:24s} rows={size:<8d} p50={result['p50_ms']}ms p99={result['p99_ms']}ms")
+            results.append(result)
+        await engine.dispose()
+    return results
+
+
+async def main(args) -> None:
+    logger.remove()
+    results = []
+    for size in args.sizes:
+        results.extend(await bench_size(size, args.repeat))
+    print(f"results: {write_results('bench_dao', results, args.output)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda value: [int(s) for s in value.split(",")], default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
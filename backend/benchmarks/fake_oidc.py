@@ -0,0 +1,83 @@
+"""
+Локальная замена Keycloak для бенчмарков: token endpoint и JWKS одного realm-а.
+
+Authorization code задает пользователя и роли: "<sub>:<role1>,<role2>".
+Токены подписываются RSA-ключом, сгенерированным при старте.
+"""
+import json
+import time
+import uuid
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from jwcrypto import jwk, jwt
+
+
+class TokenSigner:
+    def __init__(self, issuer: str, audience: str = "account", ttl: int = 300):
+        self.issuer = issuer
+        self.audience = audience
+        self.ttl = ttl
+        self.key = jwk.JWK.generate(kty="RSA", size=2048, kid=uuid.uuid4().hex, alg="RS256", use="sig")
+
+    def jwks(self) -> dict:
+        return {"keys": [json.loads(self.key.export_public())]}
+
+    def issue(self, sub: str, roles: list[str], typ: str = "Bearer") -> str:
+        now = int(time.time())
+        claims = {
+            "iss": self.issuer,
+            "aud": self.audience,
+            "sub": sub,
+            "typ": typ,
+            "iat": now,
+            "exp": now + self.ttl,
+            "realm_access": {"roles": roles},
+            "email": f"{sub}@example.com",
+            "email_verified": True,
+            "name": f"User {sub}",
+            "preferred_username": sub,
+            "given_name": "User",
+            "family_name": sub,
+        }
+        token = jwt.JWT(header={"alg": "RS256", "kid": self.key.kid, "typ": "JWT"}, claims=claims)
+        token.make_signed_token(self.key)
+        return token.serialize()
+
+    def token_response(self, sub: str, roles: list[str]) -> dict:
+        return {
+            "access_token": self.issue(sub, roles),
+            "refresh_token": self.issue(sub, roles, typ="Refresh"),
+            "id_token": self.issue(sub, roles, typ="ID"),
+            "expires_in": self.ttl,
+            "refresh_expires_in": self.ttl * 10,
+            "token_type": "Bearer",
+        }
+
+
+def create_fake_oidc_app(realm: str, signer: TokenSigner) -> FastAPI:
+    app = FastAPI()
+    prefix = f"/realms/{realm}/protocol/openid-connect"
+
+    @app.get(f"{prefix}/certs")
+    async def certs():
+        return signer.jwks()
+
+    @app.post(f"{prefix}/token")
+    async def token(request: Request):
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        grant_type = form.get("grant_type")
+        if grant_type == "authorization_code":
+            sub, _, roles = form.get("code", "").partition(":")
+            return signer.token_response(sub or "user", [role for role in roles.split(",") if role])
+        if grant_type == "refresh_token":
+            claims = json.loads(jwt.JWT(jwt=form["refresh_token"], key=signer.key).claims)
+            return signer.token_response(claims["sub"], claims["realm_access"]["roles"])
+        return JSONResponse(status_code=400, content={"error": "unsupported_grant_type"})
+
+    @app.post(f"{prefix}/logout")
+    async def logout():
+        return Response(status_code=204)
+
+    return app
@@ -0,0 +1,198 @@
+"""
+Нагрузочный тест API: приложение из main.py под uvicorn, локальная замена Keycloak
+(fake_oidc.py) и SQLite с заранее заполненной таблицей отчетов.
+
+Для /api/reports, /api/users и /api/login/callback на разных уровнях конкурентности
+измеряются пропускная способность и латентность p50/p99. Отчеты принадлежат пользователю
+протеза из токена нагрузочного теста. /api/reports измеряется отдельно с попаданиями в кеш
+ответов (одна и та же страница) и с промахами (у каждого запроса свой курсор); фактические
+hits/misses кеша за сценарий записываются в результаты. Клиент и серверы работают в
+одном event loop, поэтому абсолютные цифры занижены - сравнивать стоит между коммитами.
+
+Запуск из каталога backend:
+    python benchmarks/load_test.py [--requests 2000] [--concurrency 1,8,32,64] [--output path.json]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from common import SRC_DIR, percentile, write_results  # noqa: E402
+
+
+REALM = "bench-realm"
+ADMIN_ROLE = "administrator"
+PROTHETIC_ROLE = "prothetic_user"
+# sub пользователя протеза в токене нагрузочного теста - владелец отчетов
+PROTHETIC_SUB = "bench-prothetic"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(data_dir: str, oidc_port: int, app_port: int) -> None:
+    # Settings читаются при импорте, поэтому окружение задается до импорта приложения
+    os.makedirs(os.path.join(data_dir, "backend-data"), exist_ok=True)
+    os.environ.update(
+        BASE_DIR=data_dir,
+        BASE_URL=f"http://127.0.0.1:{app_port}",
+        KEYCLOAK_BASE_URL=f"http://127.0.0.1:{oidc_port}",
+        KEYCLOAK_REALM=REALM,
+        KEYCLOAK_CLIENT_ID="bench-client",
+        KEYCLOAK_CLIENT_SECRET="bench-secret",
+        KEYCLOAK_ADMIN_ROLE=ADMIN_ROLE,
+        KEYCLOAK_PROTHETIC_USER_ROLE=PROTHETIC_ROLE,
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+    )
+    sys.path.insert(0, SRC_DIR)
+    os.chdir(SRC_DIR)
+
+
+async def start_server(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+async def seed_database(reports: int, users: int) -> None:
+    from api.schemas import AddReport, AddUser
+    from db.dao import ReportsDAO, UsersDAO
+    from db.database import async_session_maker
+
+    async with async_session_maker() as session:
+        # Пользователи - до отчетов: reports.user_id ссылается на users
+        await UsersDAO(session).add_many([
+            AddUser(
+                id=user_id, email=f"{user_id}@example.com", email_verified=True, name=user_id,
+                preferred_username=user_id, given_name="User", family_name=user_id,
+            )
+            for user_id in [PROTHETIC_SUB] + [f"user-{i}" for i in range(users)]
+        ])
+        await ReportsDAO(session).add_many([
+            AddReport(title=f"Report {i}", content="myo-signal summary " * 20, user_id=PROTHETIC_SUB)
+            for i in range(reports)
+        ])
+        await session.commit()
+
+
+async def run_scenario(client, name: str, make_request, total: int, concurrency: int) -> dict:
+    from cache.response_cache import response_cache
+
+    latencies: list[float] = []
+    hits, misses = response_cache.hits, response_cache.misses
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "cache_hits": response_cache.hits - hits,
+        "cache_misses": response_cache.misses - misses,
+    }
+    print(f"{name:28s} c={concurrency:<4d} rps={result['rps']:<9} "
+          f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms errors={errors} "
+          f"cache={result['cache_hits']}/{result['cache_misses']}")
+    return result
+
+
+async def main(args) -> None:
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    oidc_port, app_port = free_port(), free_port()
+    configure_environment(data_dir, oidc_port, app_port)
+
+    import httpx
+    from fake_oidc import TokenSigner, create_fake_oidc_app
+    from db.pagination import encode_cursor
+    from main import app
+
+    signer = TokenSigner(issuer=f"http://127.0.0.1:{oidc_port}/realms/{REALM}", ttl=3600)
+    oidc_server, oidc_task = await start_server(create_fake_oidc_app(REALM, signer), oidc_port)
+    app_server, app_task = await start_server(app, app_port)
+    await seed_database(args.reports, args.users)
+
+    prothetic_token = signer.issue(PROTHETIC_SUB, [PROTHETIC_ROLE])
+    admin_token = signer.issue("bench-admin", [ADMIN_ROLE])
+
+    async def get_reports_cached(client, i):
+        # Одна страница: после первого запроса - попадания в кеш ответов
+        return await client.get("/api/reports")
+
+    miss_keys = itertools.count()
+
+    async def get_reports_uncached(client, i):
+        # Свой (курсор, limit) у каждого запроса всех прогонов - ключ кеша не повторяется, каждый запрос идет в БД
+        key = next(miss_keys)
+        params = {"cursor": encode_cursor(key % args.reports), "limit": 100 + key // args.reports}
+        return await client.get("/api/reports", params=params)
+
+    async def get_users(client, i):
+        return await client.get("/api/users")
+
+    async def login_callback(client, i):
+        return await client.get("/api/login/callback", params={"code": f"login-{i % 100}:{PROTHETIC_ROLE}"})
+
+    scenarios = [
+        ("/api/reports (cache hit)", {"access_token": prothetic_token}, get_reports_cached),
+        ("/api/reports (cache miss)", {"access_token": prothetic_token}, get_reports_uncached),
+        ("/api/users", {"access_token": admin_token}, get_users),
+        ("/api/login/callback", {}, login_callback),
+    ]
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    for name, cookies, make_request in scenarios:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{app_port}", cookies=cookies, limits=limits
+        ) as client:
+            for concurrency in args.concurrency:
+                results.append(await run_scenario(client, name, make_request, args.requests, concurrency))
+
+    for server, task in ((app_server, app_task), (oidc_server, oidc_task)):
+        server.should_exit = True
+        await task
+    print(f"results: {write_results('load_test', results, args.output)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=lambda value: [int(c) for c in value.split(",")], default=[1, 8, 32, 64])
+    parser.add_argument("--reports", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--output")
+    arguments = parser.parse_args()
+    if arguments.output:
+        arguments.output = os.path.abspath(arguments.output)
+    asyncio.run(main(arguments))
@@ -0,0 +1,175 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli и zstandard - необязательные зависимости
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack", "text/")
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Sync flush: каждый чанк потокового ответа (NDJSON) уходит клиенту сразу
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+
+def parse_accept_encoding(value: str) -> dict[str, float]:
+    # "br;q=1.0, gzip;q=0.8, *;q=0.1" -> {"br": 1.0, "gzip": 0.8, "*": 0.1}
+    result = {}
+    for item in value.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[name.strip().lower()] = q
+    return result
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов: zstd, br или gzip по Accept-Encoding клиента
+    (при равном q - в этом порядке). Ответы меньше minimum_size и несжимаемые типы
+    отдаются как есть. Потоковые ответы сжимаются по чанкам.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        zstd_level: int = 3,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self._factories = {}
+        if zstandard is not None:
+            self._factories["zstd"] = lambda: _Zstd(zstd_level)
+        if brotli is not None:
+            self._factories["br"] = lambda: _Brotli(brotli_quality)
+        self._factories["gzip"] = lambda: _Gzip(gzip_level)
+
+    @property
+    def encodings(self) -> list[str]:
+        """Доступные кодировки в порядке предпочтения"""
+        return list(self._factories)
+
+    def compressor(self, encoding: str):
+        """Новый компрессор кодировки: compress(data, final) возвращает очередной сжатый фрагмент"""
+        return self._factories[encoding]()
+
+    def choose_encoding(self, accept_encoding: str) -> str | None:
+        accepted = parse_accept_encoding(accept_encoding)
+        best, best_q = None, 0.0
+        for name in self._factories:
+            q = accepted.get(name, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = name, q
+        return best
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Заголовки отправляются вместе с первым чанком тела, когда известно, сжимать ли ответ
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                # Ответ из файла через расширения ASGI (http.response.pathsend/zerocopy) не сжимается
+                if start_message is not None and compressor is None and not passthrough:
+                    passthrough = True
+                    await send(start_message)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    # Файлы с поддержкой Range (FileResponse) отдаются как есть: диапазоны считаются по исходным байтам
+                    or "accept-ranges" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = self.compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                # Сжатое тело отличается побайтно: строгий ETag становится слабым
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                if more_body:
+                    del headers["Content-Length"]
+                    compressed = compressor.compress(body, final=False)
+                else:
+                    compressed = compressor.compress(body, final=True)
+                    headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_wrapper)
+        if start_message is not None and compressor is None and not passthrough:
+            # Ответ без тела (например, только http.response.start)
+            await send(start_message)
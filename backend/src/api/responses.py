@@ -0,0 +1,47 @@
+from datetime import date, datetime
+from typing import Any
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+try:
+    import msgpack
+except ImportError:  # MessagePack - необязательная зависимость
+    msgpack = None
+
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+def _msgpack_default(value: Any):
+    # Время передается строкой ISO 8601, как и в JSON
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+def response_media_type(request: Request) -> str:
+    """MessagePack, если клиент явно его принимает и пакет msgpack установлен, иначе JSON"""
+    accept = request.headers.get("accept", "")
+    if msgpack is not None and any(media_type in accept for media_type in _MSGPACK_MEDIA_TYPES):
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def render(payload: Any, media_type: str) -> bytes:
+    """Сериализация ответа: orjson (datetime, dict строк БД - без обхода jsonable_encoder) или MessagePack"""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(payload, default=_msgpack_default)
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+
+def negotiated_response(request: Request, payload: Any, status_code: int = 200) -> Response:
+    """Ответ в формате из заголовка Accept (JSON или MessagePack)"""
+    media_type = response_media_type(request)
+    headers = {"Vary": "Accept"}
+    if media_type == JSON_MEDIA_TYPE:
+        return ORJSONResponse(payload, status_code=status_code, headers=headers)
+    return Response(render(payload, media_type), status_code=status_code, media_type=media_type, headers=headers)
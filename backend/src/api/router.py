@@ -1,22 +1,35 @@
+import asyncio
+import os
+from datetime import date
+from typing import AsyncIterator
 from urllib.parse import urlencode
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse, RedirectResponse, StreamingResponse
 from loguru import logger
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.schemas import AddUser
+from api.responses import negotiated_response, render, response_media_type
+from api.schemas import AddUser, ExportRequest, ReportOut, UserReportsFilter
+from auth.cookies import set_token_cookies
 from auth.dependencies import get_keycloak_client, check_administrator, check_prothetic_user
 from auth.keycloak_client import KeycloakClient
+from auth.user_sync import user_profile_sync
+from cache.response_cache import etag_matches, response_cache
 from settings.config import settings
-from db.dao import ReportsDAO, UsersDAO
-from db.dependencies import (
-    get_session_with_commit,
-    get_session_without_commit,
-)
+from db.dao import ReportsDAO, ReportSummaryDAO, UsersDAO
+from db.database import session_router
+from db.query import Condition, QuerySpec, QuerySpecError
+from db.pagination import decode_cursor, encode_cursor, next_cursor
+from ingest.reports import parse_reports, report_ingest_queue
+from db.dependencies import get_session_without_commit, get_sticky_key, mark_write
+from export.jobs import export_jobs
+from export.render import MEDIA_TYPES
 
 
-router = APIRouter(prefix="/api", tags=["API"])
+# orjson по умолчанию; списки строк БД отдаются через negotiated_response (JSON или MessagePack)
+router = APIRouter(prefix="/api", tags=["API"], default_response_class=ORJSONResponse)
 
 
 @router.get("/login/callback", include_in_schema=False)
@@ -24,13 +37,12 @@ async def login_callback(
     code: str | None = None,
     error: str | None = None,
     error_description: str | None = None,
-    session: AsyncSession = Depends(get_session_with_commit),
     keycloak: KeycloakClient = Depends(get_keycloak_client),
 ) -> RedirectResponse:
     """
     Ванильный login без использования библиотеки.
     Обрабатывает callback после авторизации в Keycloak.
-    Получает токен, информацию о пользователе, сохраняет пользователя в БД (если нужно)
+    Получает токен, информацию о пользователе, ставит профиль пользователя в очередь записи в БД
     и устанавливает cookie с токенами. Обрабатывает ошибки от Keycloak.
     """
     if error:
@@ -60,42 +72,18 @@ async def login_callback(
         if not user_id:
             raise HTTPException(status_code=401, detail="ID пользователя не найден")
 
-        # Проверка существования пользователя, создание нового при необходимости
-        users_dao = UsersDAO(session)
-        user = await users_dao.find_one_or_none_by_id(user_id)
-        if not user and isinstance(user_info, dict):
-            user_info["id"] = user_info.pop("sub")
-            await users_dao.add(AddUser(**user_info))
+        # Профиль пишется в БД в фоне; логин не зависит ни от полноты профиля, ни от записи
+        try:
+            user_profile_sync.sync(AddUser.model_validate({**user_info, "id": user_id}))
+        except ValidationError as e:
+            logger.warning(f"Профиль пользователя {user_id} не сохранен: {e.error_count()} ошибок валидации")
+        except Exception as e:
+            logger.error(f"Профиль пользователя {user_id} не поставлен в очередь записи: {e}")
 
         # Установка cookie с токенами и редирект
         response = RedirectResponse(url="/protected")
-        response.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            secure=True,
-            samesite="lax",
-            path="/",
-            max_age=token_data.get("expires_in", 3600),
-        )
-        response.set_cookie(
-            key="refresh_token",
-            value=refresh_token,
-            httponly=True,
-            secure=True,
-            samesite="lax",
-            path="/",
-            max_age=token_data.get("refresh_expires_in", 2592000),
-        )
-        response.set_cookie(
-            key="id_token",
-            value=id_token,
-            httponly=True,
-            secure=True,
-            samesite="lax",
-            path="/",
-            max_age=token_data.get("expires_in", 3600),
-        )
+        set_token_cookies(response, token_data)
+        mark_write(response, user_id)
         logger.info(f"User {user_id} logged in successfully")
         return response
 
@@ -143,22 +131,291 @@ async def logout(request: Request):
     return response
 
 
+async def stream_reports_ndjson(user_id: str, chunk_size: int, sticky_key: str | None) -> AsyncIterator[bytes]:
+    # Сессия открывается внутри генератора: сессия из Depends закрывается до отправки тела ответа
+    async with session_router.reader(sticky_key)() as session:
+        reports = ReportsDAO(session).stream_all(UserReportsFilter(user_id=user_id), chunk_size=chunk_size)
+        # Строки отправляются пачками: меньше ASGI-сообщений и лучше сжатие потока
+        lines = []
+        async for report in reports:
+            lines.append(ReportOut.model_validate(report).model_dump_json().encode("utf-8"))
+            if len(lines) >= chunk_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+
+def cached_response(request: Request, body: bytes, etag: str, media_type: str) -> Response:
+    # 304 без тела, если клиент уже держит эту версию ответа
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+async def run_query_spec(request: Request, dao, spec: QuerySpec, name: str) -> Response:
+    try:
+        if spec.count_only:
+            return negotiated_response(request, {"status": "ok", "count": await dao.count_by_spec(spec)})
+        return negotiated_response(request, {"status": "ok", name: await dao.find_by_spec(spec)})
+    except QuerySpecError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/reports")
 async def get_reports(
+    request: Request,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+    stream: bool = False,
     current_user: dict = Depends(check_prothetic_user),
     session: AsyncSession = Depends(get_session_without_commit),
 ):
     """
-    Возвращает все отчеты.
+    Возвращает отчеты текущего пользователя страницами (keyset-пагинация по id, next_cursor - курсор следующей страницы).
+    stream=true - полная выгрузка всех отчетов в NDJSON с постоянным потреблением памяти.
+    Страницы кешируются по пользователю и параметрам запроса, поддерживается ETag/If-None-Match.
+    check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
+    """
+    if stream:
+        return StreamingResponse(
+            stream_reports_ndjson(current_user["sub"], settings.REPORTS_STREAM_CHUNK_SIZE, get_sticky_key(request)),
+            media_type="application/x-ndjson",
+        )
+
+    media_type = response_media_type(request)
+    cache_key = response_cache.make_key(
+        current_user["sub"], {"limit": limit, "cursor": cursor, "media_type": media_type}
+    )
+    # Поколение читается до запроса в БД, чтобы не закешировать устаревшие данные под новым поколением
+    generation = await response_cache.generation(ReportsDAO.cache_namespace)
+    cached = await response_cache.get(ReportsDAO.cache_namespace, generation, cache_key)
+    if cached is None:
+        reports_dao = ReportsDAO(session)
+        try:
+            reports = await reports_dao.find_all_rows(
+                UserReportsFilter(user_id=current_user["sub"]), limit=limit, cursor=cursor
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        payload = {"status": "ok", "reports": reports, "next_cursor": next_cursor(reports, limit)}
+        body = render(payload, media_type)
+        cached = await response_cache.set(ReportsDAO.cache_namespace, generation, cache_key, body)
+    return cached_response(request, cached.body, cached.etag, media_type)
+
+
+async def read_body_limited(request: Request, max_bytes: int) -> bytes:
+    """Тело запроса не длиннее max_bytes, иначе 413 - без чтения и разбора остатка тела"""
+    too_large = HTTPException(status_code=413, detail=f"Request body is too large, max {max_bytes} bytes")
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    # Content-Length может отсутствовать (chunked) или быть неверным: считаем байты при чтении
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+
+@router.post("/reports/ingest", status_code=202)
+async def ingest_reports(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(check_prothetic_user),
+):
+    """
+    Прием отчетов пачкой: NDJSON (application/x-ndjson) или JSON-массив.
+    Отчеты ставятся в очередь и пишутся в БД в фоне пачками, ответ не ждет записи.
+    202 - отчеты в очереди процесса: ошибки записи повторяются, незаписанные отчеты сохраняются
+    в dead letter на диске; при аварийном завершении процесса отчеты из очереди теряются
+    (не более одного раза, см. ingest/reports.py).
+    Если очередь заполнена - 429 с Retry-After.
+    Тело больше INGEST_MAX_BODY_BYTES или отчетов больше INGEST_MAX_ITEMS_PER_REQUEST - 413.
     check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
     """
-    reports_dao = ReportsDAO(session)
-    reports = await reports_dao.find_all(None)
-    return {"status": "ok", "reports": reports}
+    body = await read_body_limited(request, settings.INGEST_MAX_BODY_BYTES)
+    try:
+        reports = parse_reports(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Автор отчетов - владелец токена, user_id из тела запроса не принимается
+    for report in reports:
+        report.user_id = current_user["sub"]
+    if len(reports) > settings.INGEST_MAX_ITEMS_PER_REQUEST:
+        raise HTTPException(
+            status_code=413, detail=f"Too many reports, max {settings.INGEST_MAX_ITEMS_PER_REQUEST} per request"
+        )
+    if not report_ingest_queue.offer(reports):
+        raise HTTPException(
+            status_code=429,
+            detail="Ingest queue is full",
+            headers={"Retry-After": str(settings.INGEST_RETRY_AFTER)},
+        )
+    # Отчеты пишутся в фоне через flush_interval: следующие чтения клиента - из primary
+    mark_write(response, current_user["sub"])
+    return {"status": "accepted", "accepted": len(reports)}
+
+
+def export_job_payload(job) -> dict:
+    payload = {"status": "ok", "job": job.model_dump(mode="json")}
+    if job.status == "done":
+        payload["download_url"] = f"/api/reports/export/{job.id}/download"
+    return payload
+
+
+@router.post("/reports/export", status_code=202)
+async def export_reports(
+    request: Request,
+    response: Response,
+    export: ExportRequest,
+    current_user: dict = Depends(check_prothetic_user),
+):
+    """
+    Ставит в очередь выгрузку всех отчетов текущего пользователя в CSV, XLSX или PDF.
+    Статус - GET по адресу из Location, готовый файл - по download_url из статуса.
+    Если очередь заполнена - 429 с Retry-After.
+    check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
+    """
+    if export.format not in export_jobs.formats:
+        raise HTTPException(status_code=400, detail=f"Export format {export.format} is not available")
+    job = await export_jobs.submit(current_user["sub"], export.format, get_sticky_key(request))
+    if job is None:
+        raise HTTPException(
+            status_code=429,
+            detail="Export queue is full",
+            headers={"Retry-After": str(settings.EXPORT_RETRY_AFTER)},
+        )
+    response.headers["Location"] = f"/api/reports/export/{job.id}"
+    return export_job_payload(job)
+
+
+@router.get("/reports/export/{job_id}")
+async def get_export(job_id: str, current_user: dict = Depends(check_prothetic_user)):
+    """
+    Статус выгрузки отчетов текущего пользователя: queued, running, done или failed.
+    check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
+    """
+    job = await export_jobs.get(job_id, current_user["sub"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return export_job_payload(job)
+
+
+@router.get("/reports/export/{job_id}/download")
+async def download_export(job_id: str, current_user: dict = Depends(check_prothetic_user)):
+    """
+    Готовый файл выгрузки. Файл отдается с диска FileResponse (sendfile, если сервер его поддерживает),
+    поддерживаются Range-запросы.
+    check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
+    """
+    job = await export_jobs.get(job_id, current_user["sub"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    path = export_jobs.result_path(job)
+    if not await asyncio.to_thread(os.path.exists, path):
+        raise HTTPException(status_code=404, detail="Export expired")
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[job.format],
+        filename=export_jobs.filename(job),
+    )
+
+
+@router.get("/reports/search")
+async def search_reports(
+    request: Request,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    current_user: dict = Depends(check_prothetic_user),
+    session: AsyncSession = Depends(get_session_without_commit),
+):
+    """
+    Полнотекстовый поиск по заголовкам и тексту отчетов текущего пользователя.
+    Результаты по убыванию релевантности, snippet - HTML-фрагмент с совпадениями в <mark>.
+    check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
+    """
+    try:
+        offset = decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(offset, int) or offset < 0 or offset > settings.SEARCH_MAX_OFFSET:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    results = await ReportsDAO(session).search(current_user["sub"], q, limit=limit, offset=offset)
+    cursor = encode_cursor(offset + limit) if len(results) == limit else None
+    return negotiated_response(request, {"status": "ok", "results": results, "next_cursor": cursor})
+
+
+@router.post("/reports/query")
+async def query_reports(
+    request: Request,
+    spec: QuerySpec,
+    current_user: dict = Depends(check_prothetic_user),
+    session: AsyncSession = Depends(get_session_without_commit),
+):
+    """
+    Отчеты текущего пользователя по спецификации запроса: условия, диапазоны дат, IN,
+    сортировка и limit/offset по индексированным колонкам; count_only=true - только количество.
+    check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
+    """
+    spec = spec.model_copy(update={"where": [*spec.where, Condition(field="user_id", value=current_user["sub"])]})
+    return await run_query_spec(request, ReportsDAO(session), spec, "reports")
+
+
+@router.get("/reports/summary")
+async def get_reports_summary(
+    request: Request,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    current_user: dict = Depends(check_prothetic_user),
+    session: AsyncSession = Depends(get_session_without_commit),
+):
+    """
+    Сводка отчетов текущего пользователя по дням из таблицы сводок.
+    check_prothetic_user - проверяет валидность access_token пользователя и проверяет роль пользователя протеза
+    """
+    days = await ReportSummaryDAO(session).find_user_days(current_user["sub"], date_from, date_to)
+    return negotiated_response(request, {"status": "ok", "days": days})
+
+
+@router.get("/reports/summary/daily")
+async def get_reports_daily_totals(
+    request: Request,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    current_user: dict = Depends(check_administrator),
+    session: AsyncSession = Depends(get_session_without_commit),
+):
+    """
+    Итоги отчетов по дням по всем пользователям из таблицы сводок.
+    check_administrator - проверяет валидность access_token пользователя и проверяет роль администратора
+    """
+    days = await ReportSummaryDAO(session).find_daily_totals(date_from, date_to)
+    return negotiated_response(request, {"status": "ok", "days": days})
+
+
+@router.post("/users/query")
+async def query_users(
+    request: Request,
+    spec: QuerySpec,
+    current_user: dict = Depends(check_administrator),
+    session: AsyncSession = Depends(get_session_without_commit),
+):
+    """
+    Пользователи по спецификации запроса (фильтры и сортировка по индексированным колонкам).
+    check_administrator - проверяет валидность access_token пользователя и проверяет роль администратора
+    """
+    return await run_query_spec(request, UsersDAO(session), spec, "users")
 
 
 @router.get("/users")
 async def get_users(
+    request: Request,
     current_user: dict = Depends(check_administrator),
     session: AsyncSession = Depends(get_session_without_commit),
 ):
@@ -167,5 +424,5 @@ async def get_users(
     check_administrator - проверяет валидность access_token пользователя и проверяет роль администратора
     """
     users_dao = UsersDAO(session)
-    users = await users_dao.find_all(None)
-    return {"status": "ok", "users": users}
+    users = await users_dao.find_all_rows(None)
+    return negotiated_response(request, {"status": "ok", "users": users})
@@ -1,16 +1,67 @@
-from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict
 
 
 class AddUser(BaseModel):
     id: str
-    email: str
-    email_verified: bool
-    name: str
+    # Необязательные claims профиля Keycloak
+    email: str | None = None
+    email_verified: bool = False
+    name: str = ""
     preferred_username: str
-    given_name: str
-    family_name: str
+    given_name: str = ""
+    family_name: str = ""
 
 
 class AddReport(BaseModel):
     title: str
     content: str
+    user_id: str | None = None
+
+
+class UserReportsFilter(BaseModel):
+    user_id: str
+
+
+class ReportOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: str | None
+    title: str
+    content: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class AddReportSummary(BaseModel):
+    user_id: str
+    day: date
+    reports: int
+    content_length: int
+    first_report_at: datetime
+    last_report_at: datetime
+
+
+class SetSummaryWatermark(BaseModel):
+    name: str
+    watermark: datetime
+
+
+class ExportRequest(BaseModel):
+    format: Literal["csv", "xlsx", "pdf"] = "csv"
+
+
+class ExportJob(BaseModel):
+    id: str
+    user_id: str
+    format: str
+    status: Literal["queued", "running", "done", "failed"] = "queued"
+    created_at: datetime
+    finished_at: datetime | None = None
+    rows: int = 0
+    truncated: bool = False
+    size: int | None = None
+    error: str | None = None
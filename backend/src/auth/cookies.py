@@ -0,0 +1,33 @@
+from fastapi import Response
+
+
+def set_token_cookies(response: Response, token_data: dict) -> None:
+    """Установить cookie access_token, refresh_token и id_token из ответа token endpoint-а Keycloak"""
+    response.set_cookie(
+        key="access_token",
+        value=token_data["access_token"],
+        httponly=True,
+        secure=True,
+        samesite="lax",
+        path="/",
+        max_age=token_data.get("expires_in", 3600),
+    )
+    response.set_cookie(
+        key="refresh_token",
+        value=token_data["refresh_token"],
+        httponly=True,
+        secure=True,
+        samesite="lax",
+        path="/",
+        max_age=token_data.get("refresh_expires_in", 2592000),
+    )
+    if token_data.get("id_token"):
+        response.set_cookie(
+            key="id_token",
+            value=token_data["id_token"],
+            httponly=True,
+            secure=True,
+            samesite="lax",
+            path="/",
+            max_age=token_data.get("expires_in", 3600),
+        )
@@ -1,7 +1,11 @@
+from typing import Iterable, Literal
+
 from fastapi import Depends, HTTPException, Request
 from auth.keycloak_client import KeycloakClient
+from auth.permissions import Principal
 from loguru import logger
 
+from monitoring.metrics import AUTH_DURATION
 from settings.config import settings
 
 
@@ -19,36 +23,53 @@ async def get_token_from_cookie(request: Request) -> str | None:
 async def get_current_user(
     token: str = Depends(get_token_from_cookie),
     keycloak: KeycloakClient = Depends(get_keycloak_client),
-) -> dict:
+) -> Principal:
     if not token:
         logger.error('No access token in get_current_user')
         raise HTTPException(status_code=401, detail="Unauthorized: No access token")
 
     try:
-        user_info = await keycloak.get_user_info(token)
+        with AUTH_DURATION.time():
+            user_info = await keycloak.get_user_info(token)
         return user_info
     except HTTPException as e:
         logger.error(f'Invalid token in get_current_user: {e}')
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-# Проверяем администратора
-async def check_administrator(
-    current_user: dict = Depends(get_current_user),
-) -> dict:
-    current_roles = current_user.get('realm_access', {}).get('roles', [])
-    if settings.KEYCLOAK_ADMIN_ROLE not in current_roles:
-        logger.error(f'Wrong user roles, not administrator user: {current_roles}')
-        raise HTTPException(status_code=403, detail=f'Wrong user roles, not administrator user: {current_roles}')
-    return current_user
+def requires(
+    roles: Iterable[str],
+    match: Literal["all", "any"] = "all",
+    client: str | None = None,
+):
+    """
+    Зависимость маршрута: пользователь должен иметь все (match="all") или хотя бы одну
+    (match="any") из ролей. client - роли клиента из resource_access вместо ролей realm-а.
+    Роли токена собираются в frozenset один раз и кешируются вместе с claims,
+    поэтому проверка не зависит от числа ролей пользователя.
+    """
+    if match not in ("all", "any"):
+        raise ValueError(f"Unknown match mode: {match}")
+    required = frozenset(f"{client}:{role}" if client else role for role in roles)
+
+    async def check_roles(current_user: Principal = Depends(get_current_user)) -> Principal:
+        if match == "all":
+            allowed = required <= current_user.roles
+        else:
+            allowed = not required.isdisjoint(current_user.roles)
+        if not allowed:
+            logger.error(
+                f"Wrong user roles for {current_user.get('sub')}, "
+                f"required ({match}): {sorted(required - current_user.roles)}"
+            )
+            raise HTTPException(status_code=403, detail="Wrong user roles")
+        return current_user
 
+    return check_roles
+
+
+# Проверяем администратора
+check_administrator = requires([settings.KEYCLOAK_ADMIN_ROLE])
 
 # Проверяем пользователя протезом
-async def check_prothetic_user(
-    current_user: dict = Depends(get_current_user),
-) -> dict:
-    current_roles = current_user.get('realm_access', {}).get('roles', [])
-    if settings.KEYCLOAK_PROTHETIC_USER_ROLE not in current_roles:
-        logger.error(f'Wrong user roles, not prothetic user: {current_roles}')
-        raise HTTPException(status_code=403, detail=f'Wrong user roles, not prothetic user: {current_roles}')
-    return current_user
+check_prothetic_user = requires([settings.KEYCLOAK_PROTHETIC_USER_ROLE])
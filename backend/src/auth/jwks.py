@@ -0,0 +1,84 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable
+
+from jwcrypto import jwk, jwt
+from jwcrypto.common import JWException
+from loguru import logger
+
+
+class InvalidTokenError(Exception):
+    """Токен не прошел локальную проверку подписи или claims"""
+
+
+class JWKSVerifier:
+    """
+    Локальная проверка JWT по JWKS realm-а.
+    Публичные ключи загружаются один раз и кешируются на ttl секунд.
+    При встрече неизвестного kid набор ключей перезагружается (не чаще min_refresh_interval).
+    Подпись, exp и aud проверяются локально, без запросов в Keycloak на каждый токен.
+    """
+
+    def __init__(
+        self,
+        fetch_jwks: Callable[[], Awaitable[dict]],
+        ttl: int = 3600,
+        audience: str | None = None,
+        leeway: int = 60,
+        min_refresh_interval: int = 10,
+    ):
+        self._fetch_jwks = fetch_jwks
+        self._ttl = ttl
+        self._audience = audience or None
+        self._leeway = leeway
+        self._min_refresh_interval = min_refresh_interval
+        self._keyset: jwk.JWKSet | None = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _refresh(self, force: bool = False) -> jwk.JWKSet:
+        # Перезагрузка JWKS, конкурентные запросы ждут одну загрузку
+        fetched_at = self._fetched_at
+        async with self._lock:
+            if self._keyset is not None and self._fetched_at != fetched_at:
+                return self._keyset
+            now = time.monotonic()
+            if force and self._keyset is not None and now - self._fetched_at < self._min_refresh_interval:
+                return self._keyset
+            keys = await self._fetch_jwks()
+            self._keyset = jwk.JWKSet.from_json(json.dumps(keys))
+            self._fetched_at = now
+            logger.info(f"JWKS загружен, ключей: {len(self._keyset['keys'])}")
+            return self._keyset
+
+    async def _get_keyset(self, kid: str | None) -> jwk.JWKSet:
+        keyset = self._keyset
+        if keyset is None or time.monotonic() - self._fetched_at >= self._ttl:
+            keyset = await self._refresh()
+        if kid is not None and keyset.get_key(kid) is None:
+            # Ключ мог быть ротирован в Keycloak
+            keyset = await self._refresh(force=True)
+        return keyset
+
+    async def verify(self, token: str) -> dict:
+        """Проверить подпись, exp и aud токена и вернуть его claims"""
+        check_claims: dict = {"exp": None}
+        if self._audience:
+            check_claims["aud"] = self._audience
+        try:
+            parsed = jwt.JWT(jwt=token, check_claims=check_claims)
+            kid = parsed.token.jose_header.get("kid")
+        except (JWException, ValueError) as e:
+            raise InvalidTokenError(f"Malformed token: {e}") from e
+
+        keyset = await self._get_keyset(kid)
+        if kid is not None and keyset.get_key(kid) is None:
+            raise InvalidTokenError(f"Unknown signing key: {kid}")
+
+        try:
+            parsed.leeway = self._leeway
+            parsed.validate(keyset)
+            return json.loads(parsed.claims)
+        except (JWException, ValueError, TypeError) as e:
+            raise InvalidTokenError(str(e)) from e
@@ -2,42 +2,99 @@ from fastapi import HTTPException
 from keycloak import KeycloakOpenID, KeycloakError
 from loguru import logger
 
+from auth.jwks import InvalidTokenError, JWKSVerifier
+from auth.permissions import Principal
+from auth.keycloak_http import CircuitBreaker, CircuitOpenError, KeycloakCaller
+from auth.token_cache import TokenClaimsCache
 from settings.config import settings
 
 
+def unavailable(operation: str, error: Exception) -> HTTPException:
+    logger.error(f'Keycloak unavailable in {operation}: {error!r}')
+    return HTTPException(status_code=503, detail="Keycloak is unavailable")
+
+
 class KeycloakClient:
-    def __init__(self, client: KeycloakOpenID | None = None):
+    def __init__(
+        self,
+        client: KeycloakOpenID | None = None,
+        verifier: JWKSVerifier | None = None,
+        claims_cache: TokenClaimsCache | None = None,
+        caller: KeycloakCaller | None = None,
+    ):
         self.client = client or KeycloakOpenID(
             server_url=settings.KEYCLOAK_BASE_URL,
             client_id=settings.KEYCLOAK_CLIENT_ID,
             realm_name=settings.KEYCLOAK_REALM,
             client_secret_key=settings.KEYCLOAK_CLIENT_SECRET
         )
+        self.caller = caller or KeycloakCaller(
+            breaker=CircuitBreaker(
+                failure_threshold=settings.KEYCLOAK_CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.KEYCLOAK_CIRCUIT_RESET_TIMEOUT,
+            ),
+            attempts=settings.KEYCLOAK_RETRY_ATTEMPTS,
+            backoff_base=settings.KEYCLOAK_RETRY_BACKOFF_BASE,
+            backoff_max=settings.KEYCLOAK_RETRY_BACKOFF_MAX,
+            call_timeout=settings.KEYCLOAK_CALL_TIMEOUT,
+        )
+        # Ключи realm-а загружаются один раз, токены проверяются локально
+        self.verifier = verifier or JWKSVerifier(
+            fetch_jwks=self.get_certs,
+            ttl=settings.KEYCLOAK_JWKS_TTL,
+            audience=settings.KEYCLOAK_AUDIENCE,
+            leeway=settings.KEYCLOAK_TOKEN_LEEWAY,
+            min_refresh_interval=settings.KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL,
+        )
+        # Повторные запросы с тем же access_token не проверяют подпись заново
+        self.claims_cache = claims_cache or TokenClaimsCache(maxsize=settings.KEYCLOAK_TOKEN_CACHE_SIZE)
+
+    async def get_certs(self) -> dict:
+        """JWKS realm-а (публичные ключи подписи токенов)"""
+        return await self.caller.call("certs", self.client.a_certs)
 
     async def get_tokens(self, code: str) -> dict:
         """Обмен authorization code на токены"""
         try:
-            access_token = await self.client.a_token(
-                grant_type='authorization_code',
-                code=code,
-                redirect_uri=settings.redirect_uri
+            # Код авторизации одноразовый: повтор только если запрос не был отправлен
+            access_token = await self.caller.call(
+                "token",
+                lambda: self.client.a_token(
+                    grant_type='authorization_code',
+                    code=code,
+                    redirect_uri=settings.redirect_uri
+                ),
+                idempotent=False,
             )
-            logger.info(f'Success in get_tokens: {access_token}')
+            logger.info('Success in get_tokens, expires_in: {}', access_token.get('expires_in'))
             return access_token
+        except (CircuitOpenError, TimeoutError) as e:
+            raise unavailable("get_tokens", e)
         except KeycloakError as e:
             logger.error(f'Token exchange failed in get_user_info: {e}')
             raise HTTPException(
                 status_code=500, detail=f"Token exchange failed: {str(e)}"
             )
 
-    async def get_user_info(self, token: str) -> dict:
-        """Получить информацию о пользователе по access_token"""
+    async def get_user_info(self, token: str) -> Principal:
+        """
+        Получить информацию о пользователе по access_token (подпись, exp и aud проверяются по JWKS).
+        Роли токена собираются один раз и кешируются вместе с claims.
+        """
+        cached = self.claims_cache.get(token)
+        if cached is not None:
+            return cached.copy()
         try:
-            decoded_token = await self.client.a_decode_token(token, validate=False)
-            logger.info(f"Decoded token in get_user_info: {decoded_token}")
-            # userinfo = await self.client.a_userinfo(token)
-            # logger.info(f'User in get_user_info: {userinfo}')
-            return decoded_token
+            decoded_token = await self.verifier.verify(token)
+            logger.debug("Decoded token in get_user_info for user: {}", decoded_token.get('sub'))
+            principal = Principal(decoded_token)
+            self.claims_cache.set(token, principal)
+            return principal.copy()
+        except InvalidTokenError as e:
+            logger.error(f'Invalid token in get_user_info: {e}')
+            raise HTTPException(status_code=401, detail="Invalid token")
+        except (CircuitOpenError, TimeoutError) as e:
+            raise unavailable("get_user_info", e)
         except KeycloakError as e:
             logger.error(f'Get user failed in get_user_info: {e}')
             raise HTTPException(
@@ -46,7 +103,9 @@ class KeycloakClient:
 
     async def logout(self, refresh_token: str) -> None:
         try:
-            await self.client.a_logout(refresh_token)
+            await self.caller.call("logout", lambda: self.client.a_logout(refresh_token))
+        except (CircuitOpenError, TimeoutError) as e:
+            raise unavailable("logout", e)
         except KeycloakError as e:
             logger.error(f'Logout failed in get_user_info: {e}')
             raise HTTPException(
@@ -55,7 +114,12 @@ class KeycloakClient:
 
     async def refresh(self, refresh_token: str) -> dict:
         try:
-            return await self.client.a_refresh_token(refresh_token)
+            # Refresh token может быть одноразовым (revoke refresh token в realm-е)
+            return await self.caller.call(
+                "refresh", lambda: self.client.a_refresh_token(refresh_token), idempotent=False
+            )
+        except (CircuitOpenError, TimeoutError) as e:
+            raise unavailable("refresh", e)
         except KeycloakError as e:
             logger.error(f'Refresh token failed: {e}')
             raise HTTPException(
@@ -0,0 +1,169 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+from keycloak import KeycloakError
+from keycloak.connection import ConnectionManager
+from keycloak.exceptions import KeycloakConnectionError
+from loguru import logger
+
+from monitoring.metrics import track_keycloak
+from settings.config import settings
+
+
+R = TypeVar("R")
+
+
+class CircuitOpenError(Exception):
+    """Keycloak недоступен, запросы временно не отправляются"""
+
+
+async def configure_connection(connection: ConnectionManager) -> None:
+    """
+    Пул keep-alive соединений и таймауты httpx для всех запросов python-keycloak.
+    Клиент httpx, созданный python-keycloak, закрывается и заменяется настроенным.
+    """
+    http2 = settings.KEYCLOAK_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("KEYCLOAK_HTTP2 включен, но пакет h2 не установлен, используется HTTP/1.1")
+            http2 = False
+    await connection.async_s.aclose()
+    connection.async_s = httpx.AsyncClient(
+        verify=connection.verify,
+        cert=connection.cert,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.KEYCLOAK_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.KEYCLOAK_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.KEYCLOAK_KEEPALIVE_EXPIRY,
+        ),
+    )
+    # Как и в python-keycloak: httpx не должен добавлять свои заголовки авторизации
+    connection.async_s.auth = None
+    # ConnectionManager передает свой timeout в каждый запрос
+    connection.timeout = httpx.Timeout(
+        settings.KEYCLOAK_READ_TIMEOUT,
+        connect=settings.KEYCLOAK_CONNECT_TIMEOUT,
+        pool=settings.KEYCLOAK_POOL_TIMEOUT,
+    )
+
+
+class CircuitBreaker:
+    """
+    После failure_threshold ошибок подряд запросы отклоняются reset_timeout секунд,
+    затем пропускается один пробный запрос (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_in_flight):
+            raise CircuitOpenError("Keycloak circuit breaker is open")
+        if state == "half_open":
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def release(self) -> None:
+        # Вызов отменен до ответа Keycloak: ни успех, ни ошибка, но пробный запрос half-open освобождается
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._opened_at is not None or self._failures >= self._failure_threshold:
+            if self._opened_at is None:
+                logger.error(f"Keycloak circuit breaker открыт после {self._failures} ошибок подряд")
+            self._opened_at = time.monotonic()
+
+
+def is_transient(error: Exception) -> bool:
+    # Сетевые ошибки и 5xx; ответы 4xx - ошибка запроса, а не недоступность Keycloak
+    if isinstance(error, KeycloakConnectionError):
+        return True
+    return isinstance(error, KeycloakError) and (error.response_code or 0) >= 500
+
+
+def is_unsent(error: Exception) -> bool:
+    # Запрос не дошел до Keycloak: безопасно повторить даже неидемпотентный вызов
+    return isinstance(error, KeycloakConnectionError) and isinstance(
+        error.__cause__, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+    )
+
+
+class KeycloakCaller:
+    """Вызов Keycloak с общим дедлайном, повторами с jitter и circuit breaker"""
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker | None = None,
+        attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+        call_timeout: float = 10.0,
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self._attempts = attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._call_timeout = call_timeout
+
+    async def call(self, operation: str, func: Callable[[], Awaitable[R]], idempotent: bool = True) -> R:
+        with track_keycloak(operation):
+            try:
+                return await asyncio.wait_for(
+                    self._call_with_retries(operation, func, idempotent), self._call_timeout
+                )
+            except asyncio.TimeoutError:
+                # Дедлайн вызова истек - Keycloak не ответил вовремя
+                self.breaker.record_failure()
+                raise
+
+    async def _call_with_retries(self, operation: str, func: Callable[[], Awaitable[R]], idempotent: bool) -> R:
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await func()
+            except KeycloakError as e:
+                if not is_transient(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                attempt += 1
+                retryable = (idempotent or is_unsent(e)) and self.breaker.state == "closed"
+                if not retryable or attempt >= self._attempts:
+                    raise
+                # Full jitter: случайная пауза до экспоненциальной границы
+                delay = random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** (attempt - 1)))
+                logger.warning(f"Keycloak {operation} попытка {attempt} не удалась: {e}, повтор через {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Отмена вызывающим (клиент отключился) - не ошибка Keycloak; дедлайн учитывается в call()
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
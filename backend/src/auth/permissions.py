@@ -0,0 +1,23 @@
+def compile_roles(claims: dict) -> frozenset[str]:
+    """
+    Роли токена одним множеством: роли realm-а как есть,
+    роли клиентов (resource_access) как "<client_id>:<роль>".
+    """
+    roles = set(claims.get("realm_access", {}).get("roles", ()))
+    for client_id, access in claims.get("resource_access", {}).items():
+        roles.update(f"{client_id}:{role}" for role in access.get("roles", ()))
+    return frozenset(roles)
+
+
+class Principal(dict):
+    """Claims проверенного токена и роли, собранные один раз при проверке токена"""
+
+    __slots__ = ("roles",)
+
+    def __init__(self, claims: dict, roles: frozenset[str] | None = None):
+        super().__init__(claims)
+        self.roles = compile_roles(claims) if roles is None else roles
+
+    def copy(self) -> "Principal":
+        # Множество ролей неизменяемое, копия его не пересчитывает
+        return Principal(self, self.roles)
@@ -0,0 +1,195 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+
+from fastapi import Response
+from loguru import logger
+from starlette.requests import cookie_parser
+
+from auth.cookies import set_token_cookies
+
+
+def unverified_claims(token: str) -> dict:
+    """Payload JWT без проверки подписи - не для авторизации; некорректный токен - пустой словарь"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError, AttributeError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
+def token_expires_at(token: str) -> float | None:
+    """exp из payload JWT без проверки подписи - только чтобы решить, пора ли обновлять токен"""
+    expires_at = unverified_claims(token).get("exp")
+    return expires_at if isinstance(expires_at, (int, float)) else None
+
+
+class SingleFlightRefresher:
+    """
+    Один запрос refresh в Keycloak на сессию (refresh_token), даже если истекший токен
+    пришел в нескольких параллельных запросах. Результат хранится result_ttl секунд:
+    при ротации refresh token-ов повторный refresh старым токеном уже не сработал бы.
+    """
+
+    def __init__(self, result_ttl: float = 30.0, max_results: int = 10000):
+        self._result_ttl = result_ttl
+        self._max_results = max_results
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._results: dict[str, tuple[float, dict | None]] = {}
+
+    @staticmethod
+    def _key(refresh_token: str) -> str:
+        return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> tuple[bool, dict | None]:
+        entry = self._results.get(key)
+        if entry is None:
+            return False, None
+        stored_at, token_data = entry
+        if time.monotonic() - stored_at >= self._result_ttl:
+            del self._results[key]
+            return False, None
+        return True, token_data
+
+    def _store(self, key: str, token_data: dict | None) -> None:
+        if len(self._results) >= self._max_results:
+            # Сначала удаляются устаревшие записи, затем самые старые
+            now = time.monotonic()
+            for stale in [k for k, (stored_at, _) in self._results.items() if now - stored_at >= self._result_ttl]:
+                del self._results[stale]
+            while len(self._results) >= self._max_results:
+                del self._results[next(iter(self._results))]
+        self._results[key] = (time.monotonic(), token_data)
+
+    def start(self, keycloak, refresh_token: str) -> asyncio.Future:
+        """Запустить refresh (или присоединиться к уже идущему); результат - token data или None"""
+        key = self._key(refresh_token)
+        found, token_data = self._cached(key)
+        if found:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(token_data)
+            return future
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(keycloak, key, refresh_token))
+            self._in_flight[key] = task
+        return task
+
+    async def _refresh(self, keycloak, key: str, refresh_token: str) -> dict | None:
+        try:
+            token_data = await keycloak.refresh(refresh_token)
+            if not token_data.get("access_token") or not token_data.get("refresh_token"):
+                token_data = None
+        except Exception as e:
+            # Сессия в Keycloak закончилась или Keycloak недоступен: дальше обычный 401 и вход
+            logger.warning(f"Token refresh failed: {getattr(e, 'detail', e)}")
+            token_data = None
+        finally:
+            self._in_flight.pop(key, None)
+        self._store(key, token_data)
+        return token_data
+
+
+class TokenRefreshMiddleware:
+    """
+    ASGI middleware прозрачного обновления access_token по cookie refresh_token.
+
+    Если токен истек (или отсутствует), запрос ждет refresh и идет дальше уже с новым токеном.
+    Если до exp осталось меньше refresh_before секунд, refresh выполняется параллельно
+    с обработкой запроса. Новые cookie добавляются в ответ.
+    """
+
+    def __init__(
+        self,
+        app,
+        refresh_before: int = 60,
+        wait_timeout: float = 5.0,
+        exclude_paths: tuple[str, ...] = ("/api/login/callback", "/api/logout", "/metrics"),
+        refresher: SingleFlightRefresher | None = None,
+    ):
+        self.app = app
+        self.refresh_before = refresh_before
+        self.wait_timeout = wait_timeout
+        self.exclude_paths = frozenset(exclude_paths)
+        # Результат refresh хранится все окно обновления: следующие запросы со старыми cookie получат новые
+        self.refresher = refresher or SingleFlightRefresher(result_ttl=refresh_before)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        cookies = self._cookies(scope)
+        refresh_token = cookies.get("refresh_token")
+        if not refresh_token:
+            await self.app(scope, receive, send)
+            return
+
+        access_token = cookies.get("access_token")
+        expires_at = token_expires_at(access_token) if access_token else None
+        now = time.time()
+        if expires_at is not None and expires_at - now > self.refresh_before:
+            await self.app(scope, receive, send)
+            return
+
+        refreshing = self.refresher.start(scope["app"].state.keycloak_client, refresh_token)
+        if expires_at is None or expires_at <= now:
+            # Текущий токен уже не примут: ждем новый до обработки запроса
+            token_data = await self._wait(refreshing)
+            if token_data is not None:
+                scope = self._with_tokens(scope, token_data)
+            await self.app(scope, receive, self._send_with_cookies(send, lambda: token_data))
+            return
+
+        # Токен еще действителен: refresh идет в фоне, запрос не ждет его.
+        # Cookie ставятся, если refresh успел к началу ответа, иначе - в одном из следующих запросов
+        await self.app(scope, receive, self._send_with_cookies(send, lambda: self._done_result(refreshing)))
+
+    @staticmethod
+    def _done_result(refreshing: asyncio.Future) -> dict | None:
+        if refreshing.done() and not refreshing.cancelled() and refreshing.exception() is None:
+            return refreshing.result()
+        return None
+
+    async def _wait(self, refreshing: asyncio.Future) -> dict | None:
+        try:
+            return await asyncio.wait_for(asyncio.shield(refreshing), self.wait_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Token refresh did not finish in time")
+            return None
+
+    @staticmethod
+    def _cookies(scope) -> dict[str, str]:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                return cookie_parser(value.decode("latin-1"))
+        return {}
+
+    @staticmethod
+    def _with_tokens(scope, token_data: dict) -> dict:
+        # Запрос обрабатывается уже с новыми токенами (get_token_from_cookie читает заголовок cookie)
+        cookies = TokenRefreshMiddleware._cookies(scope)
+        for name in ("access_token", "refresh_token", "id_token"):
+            if token_data.get(name):
+                cookies[name] = token_data[name]
+        cookie_header = "; ".join(f"{name}={value}" for name, value in cookies.items())
+        headers = [(name, value) for name, value in scope["headers"] if name != b"cookie"]
+        headers.append((b"cookie", cookie_header.encode("latin-1")))
+        return {**scope, "headers": headers}
+
+    @staticmethod
+    def _send_with_cookies(send, get_tokens):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                token_data = get_tokens()
+                if token_data is not None:
+                    response = Response()
+                    set_token_cookies(response, token_data)
+                    cookie_headers = [header for header in response.raw_headers if header[0] == b"set-cookie"]
+                    message = {**message, "headers": [*message.get("headers", []), *cookie_headers]}
+            await send(message)
+
+        return send_wrapper
@@ -0,0 +1,51 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class TokenClaimsCache:
+    """
+    Ограниченный LRU-кеш проверенных claims токенов.
+    Ключ - sha256 от токена (сам токен в памяти не хранится), запись живет до exp токена.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._maxsize = maxsize
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, claims = entry
+        if expires_at <= time.time():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)) or self._maxsize <= 0:
+            return
+        key = self._key(token)
+        self._data[key] = (float(expires_at), claims)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self._maxsize, "hits": self.hits, "misses": self.misses}
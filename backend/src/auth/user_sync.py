@@ -0,0 +1,128 @@
+"""
+Синхронизация профилей пользователей из Keycloak в таблицу users при логине.
+
+Отпечатки уже записанных профилей хранятся в памяти процесса (LRU), поэтому повторный логин
+с тем же профилем не обращается к БД. Новый или измененный профиль пишется фоновой задачей
+пачками (INSERT ... ON CONFLICT DO UPDATE): логин не ждет БД и не зависит от ее ошибок.
+Строку users для внешнего ключа reports.user_id создает прием отчетов (UsersDAO.ensure_ids),
+поэтому отчет может прийти и до записи профиля.
+Множество известных пользователей у каждого worker-а свое и сбрасывается при перезапуске -
+повторная запись идемпотентна.
+"""
+import asyncio
+from collections import OrderedDict
+from contextlib import suppress
+from itertools import islice
+
+from loguru import logger
+
+from api.schemas import AddUser
+from db.dao import UsersDAO
+from db.database import session_router
+from monitoring.metrics import USER_SYNC_ITEMS, USER_SYNC_PENDING
+from settings.config import settings
+
+
+def _fingerprint(user: AddUser) -> int:
+    return hash(tuple(user.model_dump().values()))
+
+
+class UserProfileSync:
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 0.2,
+        known_size: int = 100000,
+    ):
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._known_size = known_size
+        # user_id -> отпечаток профиля, записанного в БД этим процессом
+        self._known: OrderedDict[str, int] = OrderedDict()
+        # Профили, ожидающие записи (повторный логин до записи заменяет профиль)
+        self._pending: dict[str, AddUser] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._flushing: asyncio.Task | None = None
+
+    def sync(self, user: AddUser) -> bool:
+        """Поставить профиль в очередь записи, если процесс еще не записывал его с такими данными"""
+        if self._known.get(user.id) == _fingerprint(user):
+            self._known.move_to_end(user.id)
+            USER_SYNC_ITEMS.labels("known").inc()
+            return True
+        return self.submit(user)
+
+    def submit(self, user: AddUser) -> bool:
+        """Поставить профиль в очередь фоновой записи; False - очередь переполнена"""
+        if user.id not in self._pending and len(self._pending) >= self._maxsize:
+            # Профиль будет записан при следующем логине, отчеты пользователя от этого не зависят
+            logger.warning(f"Очередь синхронизации пользователей переполнена, профиль {user.id} пропущен")
+            USER_SYNC_ITEMS.labels("dropped").inc()
+            return False
+        self._pending[user.id] = user
+        USER_SYNC_ITEMS.labels("queued").inc()
+        USER_SYNC_PENDING.set(len(self._pending))
+        self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run(), name="user-sync")
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу и записать профили, оставшиеся в очереди"""
+        if self._worker is not None:
+            self._worker.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+        if self._flushing is not None:
+            await self._flushing
+        await self._flush()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Логины за flush_interval записываются одной пачкой
+            await asyncio.sleep(self._flush_interval)
+            self._wakeup.clear()
+            # shield: отмена при остановке не прерывает запись уже собранной пачки
+            self._flushing = asyncio.create_task(self._flush())
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    async def _flush(self) -> None:
+        while self._pending:
+            batch = dict(islice(self._pending.items(), self._batch_size))
+            for user_id in batch:
+                del self._pending[user_id]
+            USER_SYNC_PENDING.set(len(self._pending))
+            try:
+                async with session_router.writer()() as session:
+                    await UsersDAO(session).upsert_many(list(batch.values()))
+                    await session.commit()
+                for user_id, user in batch.items():
+                    session_router.mark_write(user_id)
+                    self._remember(user_id, _fingerprint(user))
+                USER_SYNC_ITEMS.labels("written").inc(len(batch))
+            except Exception as e:
+                # Не записанный профиль повторится при следующем логине
+                logger.error(f"Ошибка записи {len(batch)} профилей пользователей: {e}")
+                USER_SYNC_ITEMS.labels("failed").inc(len(batch))
+
+    def _remember(self, user_id: str, fingerprint: int) -> None:
+        self._known[user_id] = fingerprint
+        self._known.move_to_end(user_id)
+        while len(self._known) > self._known_size:
+            self._known.popitem(last=False)
+
+
+user_profile_sync = UserProfileSync(
+    maxsize=settings.USER_SYNC_QUEUE_SIZE,
+    batch_size=settings.USER_SYNC_BATCH_SIZE,
+    flush_interval=settings.USER_SYNC_FLUSH_INTERVAL,
+    known_size=settings.USER_SYNC_KNOWN_SIZE,
+)
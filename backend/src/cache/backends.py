@@ -0,0 +1,112 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis - необязательная зависимость для общего кеша между процессами
+    redis = None
+
+
+class CacheBackend(ABC):
+    """Интерфейс хранилища кеша. Любой объект с этими методами может подменить backend (например, в тестах)"""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        ...
+
+
+class InMemoryLRUBackend(CacheBackend):
+    """
+    LRU-кеш в памяти процесса с TTL записей. Счетчики incr не вытесняются.
+    Поколения инвалидации тоже в памяти процесса: запись в одном worker-е не сбрасывает кеш
+    других, поэтому backend годится только для одного worker-а
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self._maxsize = maxsize
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class NullBackend(CacheBackend):
+    """
+    Кеш выключен: ничего не хранит, каждый запрос идет в БД.
+    ETag и 304 работают и без кеша - ETag считается по телу ответа
+    """
+
+    async def get(self, key: str) -> bytes | None:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        pass
+
+    async def incr(self, key: str) -> int:
+        return 0
+
+
+class RedisBackend(CacheBackend):
+    """Общий кеш для нескольких воркеров/подов (нужен пакет redis)"""
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("Для RESPONSE_CACHE_BACKEND=redis установите пакет redis")
+        if not url:
+            raise RuntimeError("Для RESPONSE_CACHE_BACKEND=redis задайте RESPONSE_CACHE_URL")
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self._client.set(key, value, ex=ttl)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+
+def build_backend(name: str, url: str = "", maxsize: int = 1024, workers: int = 1) -> CacheBackend:
+    if name == "none":
+        return NullBackend()
+    if name == "memory":
+        if workers > 1:
+            # Иначе worker-ы отдают устаревшие ответы после записи, принятой соседним worker-ом
+            raise ValueError(
+                f"RESPONSE_CACHE_BACKEND=memory работает только с одним worker-ом (WEB_WORKERS={workers}), "
+                "используйте redis или none"
+            )
+        return InMemoryLRUBackend(maxsize=maxsize)
+    if name == "redis":
+        return RedisBackend(url)
+    raise ValueError(f"Неизвестный backend кеша: {name}")
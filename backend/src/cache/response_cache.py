@@ -0,0 +1,83 @@
+import hashlib
+import json
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.backends import CacheBackend, build_backend
+from settings.config import settings
+
+
+# Ключ в session.info с namespace-ами, которые нужно инвалидировать после commit
+SESSION_INVALIDATE_KEY = "response_cache_invalidate"
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+class ResponseCache:
+    """
+    Кеш сериализованных ответов с ETag.
+    Инвалидация через поколение namespace-а: запись увеличивает счетчик, старые ключи больше не читаются.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: int = 60):
+        self.backend = backend
+        self._ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(role: str, params: dict) -> str:
+        return f"{role}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    async def generation(self, namespace: str) -> int:
+        value = await self.backend.get(f"gen:{namespace}")
+        return int(value) if value else 0
+
+    async def get(self, namespace: str, generation: int, key: str) -> CachedResponse | None:
+        value = await self.backend.get(f"resp:{namespace}:{generation}:{key}")
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        etag, body = value.split(b"\n", 1)
+        return CachedResponse(body=body, etag=etag.decode())
+
+    async def set(self, namespace: str, generation: int, key: str, body: bytes) -> CachedResponse:
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        await self.backend.set(f"resp:{namespace}:{generation}:{key}", etag.encode() + b"\n" + body, self._ttl)
+        return CachedResponse(body=body, etag=etag)
+
+    async def invalidate(self, namespace: str) -> None:
+        generation = await self.backend.incr(f"gen:{namespace}")
+        logger.debug("Кеш ответов {} инвалидирован, поколение {}", namespace, generation)
+
+    async def invalidate_session(self, session: AsyncSession) -> None:
+        # Повторная инвалидация после commit: закрывает гонку с чтением между flush и commit
+        for namespace in session.info.pop(SESSION_INVALIDATE_KEY, set()):
+            try:
+                await self.invalidate(namespace)
+            except Exception as e:
+                logger.error(f"Ошибка инвалидации кеша {namespace}: {e}")
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+response_cache = ResponseCache(
+    build_backend(
+        settings.response_cache_backend,
+        url=settings.RESPONSE_CACHE_URL,
+        maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        workers=settings.web_workers,
+    ),
+    ttl=settings.RESPONSE_CACHE_TTL,
+)
@@ -1,12 +1,16 @@
-from typing import Generic, TypeVar
+from typing import AsyncIterator, Generic, TypeVar
 
 from loguru import logger
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache.response_cache import SESSION_INVALIDATE_KEY, response_cache
 from db.database import Base
+from db.pagination import apply_keyset
+from db.query import QueryCompiler, QuerySpec
 
 
 T = TypeVar("T", bound=Base)
@@ -14,6 +18,12 @@ T = TypeVar("T", bound=Base)
 
 class BaseDAO(Generic[T]):
     model: type[T]
+    # Сколько строк отправлять одним INSERT ... VALUES при upsert (лимит параметров SQLite - 32766)
+    bulk_chunk_size: int = 500
+    # Namespace кеша ответов, который сбрасывается при любой записи через DAO
+    cache_namespace: str | None = None
+    # Колонки с индексом: только по ним разрешены фильтры и сортировка в find_by_spec/count_by_spec
+    indexed_columns: frozenset[str] = frozenset({"id"})
 
     def __init__(self, session: AsyncSession):
         self._session = session
@@ -26,8 +36,7 @@ class BaseDAO(Generic[T]):
             query = select(self.model).filter_by(id=data_id)
             result = await self._session.execute(query)
             record = result.scalar_one_or_none()
-            log_message = f"Запись {self.model.__name__} с ID {data_id} {'найдена' if record else 'не найдена'}."
-            logger.info(log_message)
+            logger.debug("Запись {} с ID {} {}.", self.model.__name__, data_id, "найдена" if record else "не найдена")
             return record
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при поиске записи с ID {data_id}: {e}")
@@ -40,29 +49,150 @@ class BaseDAO(Generic[T]):
             query = select(self.model).filter_by(**filter_dict)
             result = await self._session.execute(query)
             record = result.scalar_one_or_none()
-            logger.info(f"Запись {self.model.__name__} с фильтрами {filter_dict} "
-                        f"{'найдена' if record else 'не найдена'}.")
+            logger.debug("Запись {} с фильтрами {} {}.",
+                         self.model.__name__, filter_dict, "найдена" if record else "не найдена")
             return record
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при поиске записи с фильтрами {filter_dict}: {e}")
             raise
 
-    async def find_all(self, filters: BaseModel | None):
+    async def find_all(self, filters: BaseModel | None, limit: int | None = None, cursor: str | None = None):
+        # Найти записи по фильтрам, при limit - одну страницу keyset-пагинации по id
         if filters:
             filter_dict = filters.model_dump(exclude_unset=True)
         else:
             filter_dict = {}
         try:
             query = select(self.model).filter_by(**filter_dict)
+            if limit is not None:
+                query = apply_keyset(query, self.model, limit, cursor)
             result = await self._session.execute(query)
             records = result.scalars().all()
-            logger.info(f"Записи {self.model.__name__} с фильтрами {filter_dict} "
-                        f"{'найдены' if records else 'не найдены'}.")
+            logger.debug("Записи {} с фильтрами {} {}.",
+                         self.model.__name__, filter_dict, "найдены" if records else "не найдены")
             return records
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при поиске записей с фильтрами {filter_dict}: {e}")
             raise
 
+    async def find_by_spec(self, spec: QuerySpec) -> list[dict]:
+        # Найти строки по спецификации запроса (операторы, диапазоны дат, IN, сортировка, limit/offset)
+        query = QueryCompiler(self.model, self.indexed_columns).select(spec)
+        try:
+            result = await self._session.execute(query)
+            rows = [dict(row) for row in result.mappings()]
+            logger.debug("Строки {} по спецификации {}: {} шт.", self.model.__name__, spec, len(rows))
+            return rows
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске строк {self.model.__name__} по спецификации {spec}: {e}")
+            raise
+
+    async def count_by_spec(self, spec: QuerySpec) -> int:
+        # Количество записей по фильтрам спецификации без выборки строк
+        query = QueryCompiler(self.model, self.indexed_columns).count(spec)
+        try:
+            return await self._session.scalar(query)
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при подсчете записей {self.model.__name__} по спецификации {spec}: {e}")
+            raise
+
+    async def _invalidate_cache(self) -> None:
+        # Сбросить кеш сразу и еще раз после commit (см. get_session_with_commit)
+        if not self.cache_namespace:
+            return
+        self._session.info.setdefault(SESSION_INVALIDATE_KEY, set()).add(self.cache_namespace)
+        try:
+            await response_cache.invalidate(self.cache_namespace)
+        except Exception as e:
+            logger.error(f"Ошибка инвалидации кеша {self.cache_namespace}: {e}")
+
+    def _columns(self, columns: list[str] | None):
+        # Колонки для проекции, по умолчанию - все колонки таблицы
+        if not columns:
+            return [getattr(self.model, column.key) for column in self.model.__table__.columns]
+        unknown = set(columns) - set(self.model.__table__.columns.keys())
+        if unknown:
+            raise ValueError(f"Неизвестные колонки {self.model.__name__}: {sorted(unknown)}")
+        return [getattr(self.model, name) for name in columns]
+
+    async def find_one_or_none_row(self, filters: BaseModel, columns: list[str] | None = None) -> dict | None:
+        # Найти одну запись по фильтрам в виде dict без создания ORM-объекта
+        filter_dict = filters.model_dump(exclude_unset=True)
+        try:
+            query = select(*self._columns(columns)).filter_by(**filter_dict)
+            result = await self._session.execute(query)
+            row = result.mappings().one_or_none()
+            logger.debug("Строка {} с фильтрами {} {}.",
+                         self.model.__name__, filter_dict, "найдена" if row else "не найдена")
+            return dict(row) if row else None
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске строки с фильтрами {filter_dict}: {e}")
+            raise
+
+    async def find_all_rows(
+        self,
+        filters: BaseModel | None,
+        columns: list[str] | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> list[dict]:
+        # Найти записи по фильтрам в виде списка dict: только нужные колонки, без identity map
+        filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
+        try:
+            query = select(*self._columns(columns)).filter_by(**filter_dict)
+            if limit is not None:
+                query = apply_keyset(query, self.model, limit, cursor)
+            result = await self._session.execute(query)
+            rows = [dict(row) for row in result.mappings()]
+            logger.debug("Строки {} с фильтрами {} {}.",
+                         self.model.__name__, filter_dict, "найдены" if rows else "не найдены")
+            return rows
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске строк с фильтрами {filter_dict}: {e}")
+            raise
+
+    async def stream_all(self, filters: BaseModel | None, chunk_size: int = 1000) -> AsyncIterator[T]:
+        # Потоково отдать записи по фильтрам, в памяти держится не больше одного чанка
+        filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
+        query = (
+            select(self.model)
+            .filter_by(**filter_dict)
+            .order_by(self.model.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        try:
+            result = await self._session.stream_scalars(query)
+            async for partition in result.partitions():
+                for record in partition:
+                    yield record
+            logger.info("Записи {} с фильтрами {} выгружены потоком.", self.model.__name__, filter_dict)
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при потоковой выгрузке записей с фильтрами {filter_dict}: {e}")
+            raise
+
+    async def stream_rows(
+        self,
+        filters: BaseModel | None,
+        columns: list[str] | None = None,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[list[dict]]:
+        # Потоково отдать записи по фильтрам чанками dict по chunk_size строк, без ORM-объектов
+        filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
+        query = (
+            select(*self._columns(columns))
+            .filter_by(**filter_dict)
+            .order_by(self.model.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        try:
+            result = await self._session.stream(query)
+            async for partition in result.mappings().partitions():
+                yield [dict(row) for row in partition]
+            logger.info("Строки {} с фильтрами {} выгружены потоком.", self.model.__name__, filter_dict)
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при потоковой выгрузке строк с фильтрами {filter_dict}: {e}")
+            raise
+
     async def add(self, values: BaseModel):
         # Добавить одну запись
         values_dict = values.model_dump(exclude_unset=True)
@@ -70,13 +200,78 @@ class BaseDAO(Generic[T]):
         self._session.add(new_instance)
         try:
             await self._session.flush()
-            logger.info(f"Запись {self.model.__name__} с параметрами {values_dict} добавлена.")
+            logger.info("Запись {} добавлена.", self.model.__name__)
+            logger.debug("Параметры добавленной записи {}: {}", self.model.__name__, values_dict)
+            await self._invalidate_cache()
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при добавлении записи с параметрами {values_dict}: {e}")
             await self._session.rollback()
             raise e
         return new_instance
 
+    async def add_many(self, values: list[BaseModel]) -> int:
+        # Добавить много записей одним executemany
+        rows = [item.model_dump(exclude_unset=True) for item in values]
+        if not rows:
+            return 0
+        try:
+            await self._session.execute(insert(self.model), rows)
+            logger.info("Записи {} добавлены: {} шт.", self.model.__name__, len(rows))
+            await self._invalidate_cache()
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при массовом добавлении {len(rows)} записей {self.model.__name__}: {e}")
+            await self._session.rollback()
+            raise e
+        return len(rows)
+
+    async def upsert_many(
+        self,
+        values: list[BaseModel],
+        index_elements: list[str] | None = None,
+        update_columns: list[str] | None = None,
+    ) -> int:
+        # Вставить записи или обновить существующие (INSERT ... ON CONFLICT DO UPDATE) для SQLite и PostgreSQL.
+        # Все записи - с одним набором колонок (все поля схемы, включая значения по умолчанию):
+        # многострочный INSERT ... VALUES и список обновляемых колонок общие для всех строк.
+        rows = [item.model_dump() for item in values]
+        if not rows:
+            return 0
+        columns = list(rows[0])
+        if any(row.keys() != rows[0].keys() for row in rows):
+            raise ValueError(f"upsert_many {self.model.__name__}: у записей разный набор колонок")
+        table = self.model.__table__
+        index_elements = index_elements or [column.name for column in table.primary_key.columns]
+        dialect = self._session.get_bind().dialect.name
+        if dialect == "postgresql":
+            dialect_insert = postgresql.insert
+        elif dialect == "sqlite":
+            dialect_insert = sqlite.insert
+        else:
+            raise ValueError(f"upsert_many поддерживает только SQLite и PostgreSQL, диалект БД: {dialect}")
+        # update_columns=[] - существующие строки не меняются (ON CONFLICT DO NOTHING)
+        if update_columns is None:
+            update_columns = [column for column in columns if column not in index_elements]
+
+        try:
+            for start in range(0, len(rows), self.bulk_chunk_size):
+                chunk = rows[start:start + self.bulk_chunk_size]
+                stmt = dialect_insert(table).values(chunk)
+                set_ = {column: stmt.excluded[column] for column in update_columns}
+                if set_ and "updated_at" in table.columns and "updated_at" not in set_:
+                    set_["updated_at"] = func.now()
+                if set_:
+                    stmt = stmt.on_conflict_do_update(index_elements=index_elements, set_=set_)
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+                await self._session.execute(stmt)
+            logger.info("Записи {} добавлены или обновлены: {} шт.", self.model.__name__, len(rows))
+            await self._invalidate_cache()
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при массовом upsert {len(rows)} записей {self.model.__name__}: {e}")
+            await self._session.rollback()
+            raise e
+        return len(rows)
+
     async def update_one_by_id(self, data_id: int, values: BaseModel):
         # Обновить запись по ID
         values_dict = values.model_dump(exclude_unset=True)
@@ -85,11 +280,30 @@ class BaseDAO(Generic[T]):
             for key, value in values_dict.items():
                 setattr(record, key, value)
             await self._session.flush()
-            logger.info(f"Запись {self.model.__name__} с id {data_id} и параметрами {values_dict} обновлена.")
+            logger.info("Запись {} с id {} обновлена.", self.model.__name__, data_id)
+            logger.debug("Параметры обновленной записи {} с id {}: {}", self.model.__name__, data_id, values_dict)
+            await self._invalidate_cache()
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при обновлении записи с id {data_id} и параметрами {values_dict}: {e}")
             raise e
 
+    async def update_many_by_id(self, values: dict[int | str, BaseModel]) -> int:
+        # Обновить много записей по ID одним executemany (ORM bulk UPDATE по первичному ключу)
+        primary_key = [column.key for column in self.model.__table__.primary_key.columns]
+        if len(primary_key) != 1:
+            raise ValueError(f"update_many_by_id: у {self.model.__name__} составной первичный ключ {primary_key}")
+        rows = [{primary_key[0]: data_id, **item.model_dump(exclude_unset=True)} for data_id, item in values.items()]
+        if not rows:
+            return 0
+        try:
+            await self._session.execute(update(self.model), rows)
+            logger.info("Записи {} обновлены: {} шт.", self.model.__name__, len(rows))
+            await self._invalidate_cache()
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при массовом обновлении {len(rows)} записей {self.model.__name__}: {e}")
+            raise e
+        return len(rows)
+
     async def delete_one_by_id(self, data_id: int):
         # Удалить запись по ID
         try:
@@ -97,7 +311,8 @@ class BaseDAO(Generic[T]):
             if data:
                 await self._session.delete(data)
                 await self._session.flush()
-            logger.info(f"Запись {self.model.__name__} с id {data_id} удалена.")
+            logger.info("Запись {} с id {} удалена.", self.model.__name__, data_id)
+            await self._invalidate_cache()
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при удалении записи с id {data_id}: {e}")
             raise
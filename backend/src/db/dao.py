@@ -1,10 +1,200 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from loguru import logger
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.schemas import AddUser
 from db.base import BaseDAO
-from db.models import Report, User
+from db.models import Report, ReportDailySummary, SummaryWatermark, User
+from db.search import fts5_query, highlight, search_statement
+from settings.config import settings
+
+
+# В SQLite время хранится строкой без долей секунды: граница, сравниваемая как строка
+# с микросекундами, отсекла бы записи той же секунды, поэтому границы берутся с запасом
+TIMESTAMP_SLACK = timedelta(seconds=1)
+
+
+def _day_ranges(days: list[date]) -> list[tuple[datetime, datetime]]:
+    # Отсортированные дни -> границы [начало, конец) подряд идущих дней с запасом TIMESTAMP_SLACK
+    ranges: list[list[date]] = []
+    for day in days:
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [
+        (
+            datetime.combine(first, datetime.min.time()) - TIMESTAMP_SLACK,
+            datetime.combine(last + timedelta(days=1), datetime.min.time()) + TIMESTAMP_SLACK,
+        )
+        for first, last in ranges
+    ]
 
 
 class UsersDAO(BaseDAO):
     model = User
+    indexed_columns = frozenset({"id", "email", "preferred_username"})
+
+    async def ensure_ids(self, user_ids: Iterable[str | None]) -> int:
+        # Минимальные строки users (только id) для внешнего ключа reports.user_id, если пользователь
+        # еще не записан синхронизацией профиля; существующие профили не меняются
+        ids = sorted({user_id for user_id in user_ids if user_id})
+        return await self.upsert_many(
+            [AddUser(id=user_id, preferred_username="") for user_id in ids], update_columns=[]
+        )
 
 
 class ReportsDAO(BaseDAO):
     model = Report
+    cache_namespace = "reports"
+    indexed_columns = frozenset({"id", "user_id", "created_at", "updated_at"})
+    # Сколько пользователей пересчитывать одним запросом summarize_days
+    summary_chunk_size: int = 100
+
+    @staticmethod
+    def _summary_user_key():
+        # Отчеты без владельца попадают в сводку с user_id = ""
+        return func.coalesce(Report.user_id, "")
+
+    async def find_changed_days(
+        self, since: datetime | None, lookback: timedelta = TIMESTAMP_SLACK
+    ) -> tuple[set[tuple[str, date]], datetime | None]:
+        # Ключи сводки (пользователь, день), затронутые записями с updated_at >= since - lookback,
+        # и максимальный updated_at
+        day = func.date(Report.created_at)
+        query = select(self._summary_user_key().label("user_id"), day.label("day")).distinct()
+        max_query = select(func.max(Report.updated_at))
+        if since is not None:
+            query = query.where(Report.updated_at >= since - lookback)
+            max_query = max_query.where(Report.updated_at >= since - lookback)
+        try:
+            keys = {(row.user_id, date.fromisoformat(str(row.day))) for row in await self._session.execute(query)}
+            max_updated_at = await self._session.scalar(max_query)
+            logger.debug("Изменено дней сводки {} с {}: {}", self.model.__name__, since, len(keys))
+            return keys, max_updated_at
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске измененных записей {self.model.__name__} с {since}: {e}")
+            raise
+
+    async def summarize_days(self, keys: set[tuple[str, date]]) -> list[dict]:
+        # Пересчитать сводку только для указанных (пользователь, день) по исходным записям:
+        # условие по каждому пользователю и его дням читает индекс (user_id, created_at),
+        # а не все отчеты затронутых дней
+        if not keys:
+            return []
+        days_by_user: dict[str, list[date]] = {}
+        for user_id, day in sorted(keys):
+            days_by_user.setdefault(user_id, []).append(day)
+        users = list(days_by_user)
+        rows = []
+        try:
+            for start in range(0, len(users), self.summary_chunk_size):
+                chunk = {user_id: days_by_user[user_id] for user_id in users[start:start + self.summary_chunk_size]}
+                for row in (await self._session.execute(self._summary_query(chunk))).mappings():
+                    row = {**row, "day": date.fromisoformat(str(row["day"]))}
+                    # Границы дней взяты с запасом - группы соседних дней отбрасываются
+                    if (row["user_id"], row["day"]) in keys:
+                        rows.append(row)
+            return rows
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при пересчете сводки {self.model.__name__} за {len(keys)} дней: {e}")
+            raise
+
+    def _summary_query(self, days_by_user: dict[str, list[date]]):
+        user_key = self._summary_user_key().label("user_id")
+        day = func.date(Report.created_at).label("day")
+        conditions = []
+        for user_id, days in days_by_user.items():
+            owner = Report.user_id == user_id if user_id else Report.user_id.is_(None)
+            ranges = [
+                and_(Report.created_at >= start, Report.created_at < end) for start, end in _day_ranges(days)
+            ]
+            conditions.append(and_(owner, or_(*ranges)))
+        return (
+            select(
+                user_key,
+                day,
+                func.count().label("reports"),
+                func.coalesce(func.sum(func.length(Report.content)), 0).label("content_length"),
+                func.min(Report.created_at).label("first_report_at"),
+                func.max(Report.created_at).label("last_report_at"),
+            )
+            .where(or_(*conditions))
+            .group_by(user_key, day)
+        )
+
+    async def search(
+        self,
+        user_id: str,
+        query: str,
+        limit: int,
+        offset: int = 0,
+        snippet_tokens: int = 16,
+    ) -> list[dict]:
+        # Полнотекстовый поиск по отчетам пользователя: по убыванию релевантности, с подсвеченным фрагментом
+        dialect = self._session.get_bind().dialect.name
+        params = {"user_id": user_id, "limit": limit, "offset": offset, "snippet_tokens": snippet_tokens}
+        if dialect == "sqlite":
+            params["query"] = fts5_query(query)
+            if not params["query"]:
+                return []
+        else:
+            params.update(query=query, config=settings.SEARCH_TEXT_CONFIG)
+        try:
+            result = await self._session.execute(search_statement(dialect), params)
+            rows = [
+                {**row, "snippet": highlight(row["snippet"]), "rank": abs(row["rank"])}
+                for row in result.mappings()
+            ]
+            logger.debug("Поиск {} по запросу {!r}: {} результатов", self.model.__name__, query, len(rows))
+            return rows
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка полнотекстового поиска {self.model.__name__} по запросу {query!r}: {e}")
+            raise
+
+
+class ReportSummaryDAO(BaseDAO):
+    model = ReportDailySummary
+
+    async def find_user_days(self, user_id: str, date_from: date | None, date_to: date | None) -> list[dict]:
+        # Сводка пользователя по дням из таблицы сводок (без обращения к исходным отчетам)
+        query = select(*self._columns(None)).where(ReportDailySummary.user_id == user_id)
+        query = self._date_range(query, date_from, date_to).order_by(ReportDailySummary.day)
+        try:
+            return [dict(row) for row in (await self._session.execute(query)).mappings()]
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске сводки пользователя {user_id}: {e}")
+            raise
+
+    async def find_daily_totals(self, date_from: date | None, date_to: date | None) -> list[dict]:
+        # Итоги по дням по всем пользователям
+        query = select(
+            ReportDailySummary.day,
+            func.count().label("users"),
+            func.sum(ReportDailySummary.reports).label("reports"),
+            func.sum(ReportDailySummary.content_length).label("content_length"),
+            func.min(ReportDailySummary.first_report_at).label("first_report_at"),
+            func.max(ReportDailySummary.last_report_at).label("last_report_at"),
+        )
+        query = self._date_range(query, date_from, date_to)
+        query = query.group_by(ReportDailySummary.day).order_by(ReportDailySummary.day)
+        try:
+            return [dict(row) for row in (await self._session.execute(query)).mappings()]
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при поиске итогов сводки по дням: {e}")
+            raise
+
+    @staticmethod
+    def _date_range(query, date_from: date | None, date_to: date | None):
+        if date_from is not None:
+            query = query.where(ReportDailySummary.day >= date_from)
+        if date_to is not None:
+            query = query.where(ReportDailySummary.day <= date_to)
+        return query
+
+
+class SummaryWatermarksDAO(BaseDAO):
+    model = SummaryWatermark
@@ -1,23 +1,72 @@
 from datetime import datetime
 
-from sqlalchemy import TIMESTAMP, func
+from sqlalchemy import TIMESTAMP, event, func, make_url
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
-    AsyncSession,
-    async_sessionmaker,
+    AsyncEngine,
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from db.routing import SessionRouter
+from monitoring.db import instrument_engine
 from settings.config import settings
 
 
-# Фабрика асинхронных сессий
-engine = create_async_engine(url=settings.database_url)
-async_session_maker = async_sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL - читатели не блокируют писателя, busy_timeout - конкурентные коммиты ждут, а не падают
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # В SQLite внешние ключи проверяются только при включенной PRAGMA (миграции идут без нее, см. migration/env.py)
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def build_engine(url: str) -> AsyncEngine:
+    """Движок с пулом соединений из настроек (для aiosqlite по умолчанию был бы NullPool)"""
+    connect_args = {}
+    if make_url(url).get_backend_name() == "postgresql":
+        # Кеш подготовленных выражений asyncpg и имя приложения в pg_stat_activity
+        connect_args = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {"application_name": settings.DB_APPLICATION_NAME},
+        }
+    new_engine = create_async_engine(
+        url=url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", set_sqlite_pragmas)
+    instrument_engine(new_engine)
+    return new_engine
+
+
+engine = build_engine(settings.database_url)
+
+# Реплики для чтения, без реплик все сессии идут в основной движок
+replica_engines = [build_engine(url) for url in settings.database_replica_urls]
+session_router = SessionRouter(
+    primary=engine,
+    replicas=replica_engines,
+    strategy=settings.DB_REPLICA_STRATEGY,
+    sticky_seconds=settings.DB_READ_YOUR_WRITES_SECONDS,
 )
 
+# Фабрика асинхронных сессий основного движка
+async_session_maker = session_router.writer()
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     """Базовый класс с часто используемыми полями created_dt и update_dt"""
@@ -1,15 +1,71 @@
+import hashlib
+import hmac
+import math
+import time
 from typing import AsyncGenerator
 
+from fastapi import Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.database import async_session_maker
+from auth.refresh import unverified_claims
+from cache.response_cache import response_cache
+from db.database import session_router
+from settings.config import settings
 
 
-async def get_session_with_commit() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+# Cookie недавней записи: "<unix-время окончания>.<HMAC от sub и времени>"
+WRITE_MARKER_COOKIE = "recent_write"
+
+
+def _write_marker_signature(sticky_key: str, until: int) -> str:
+    message = f"{sticky_key}:{until}".encode("utf-8")
+    return hmac.new(settings.read_your_writes_secret, message, hashlib.sha256).hexdigest()
+
+
+def get_sticky_key(request: Request) -> str | None:
+    """
+    Ключ read-your-writes - sub пользователя из access_token. Подпись токена здесь не проверяется:
+    ключ только выбирает БД для чтения, доступ проверяют зависимости auth.
+    Действующая метка записи из cookie переносится в SessionRouter этого процесса -
+    запись, принятая одним worker-ом, читается из primary и в остальных.
+    """
+    sticky_key = unverified_claims(request.cookies.get("access_token", "")).get("sub")
+    if not isinstance(sticky_key, str) or not sticky_key:
+        return None
+    until, _, signature = request.cookies.get(WRITE_MARKER_COOKIE, "").partition(".")
+    if until.isdigit() and hmac.compare_digest(signature, _write_marker_signature(sticky_key, int(until))):
+        remaining = int(until) - time.time()
+        if remaining > 0:
+            session_router.mark_write(sticky_key, remaining)
+    return sticky_key
+
+
+def mark_write(response: Response, sticky_key: str | None) -> None:
+    """Чтения пользователя sticky_key ближайшие DB_READ_YOUR_WRITES_SECONDS идут в primary во всех worker-ах"""
+    if not sticky_key or not session_router.replicas:
+        return
+    session_router.mark_write(sticky_key)
+    seconds = math.ceil(settings.DB_READ_YOUR_WRITES_SECONDS)
+    until = int(time.time()) + seconds
+    response.set_cookie(
+        key=WRITE_MARKER_COOKIE,
+        value=f"{until}.{_write_marker_signature(sticky_key, until)}",
+        max_age=seconds,
+        httponly=True,
+        secure=True,
+        samesite="lax",
+        path="/",
+    )
+
+
+async def get_session_with_commit(request: Request, response: Response) -> AsyncGenerator[AsyncSession, None]:
+    async with session_router.writer()() as session:
         try:
+            # Cookie ставится до yield: заголовки response копируются в ответ до выхода из зависимости
+            mark_write(response, get_sticky_key(request))
             yield session
             await session.commit()
+            await response_cache.invalidate_session(session)
         except Exception:
             await session.rollback()
             raise
@@ -17,8 +73,8 @@ async def get_session_with_commit() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
-async def get_session_without_commit() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+async def get_session_without_commit(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with session_router.reader(get_sticky_key(request))() as session:
         try:
             yield session
         except Exception:
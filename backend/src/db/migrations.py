@@ -0,0 +1,74 @@
+"""
+Миграции БД при старте и отдельной командой.
+
+Одноразовый запуск (например, перед стартом воркеров uvicorn):
+    python -m db.migrations
+"""
+import asyncio
+import os
+from functools import lru_cache
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from db.database import engine
+
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def alembic_config() -> Config:
+    # Пути от каталога исходников, а не от текущего каталога процесса
+    config = Config(os.path.join(SRC_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(SRC_DIR, "migration"))
+    return config
+
+
+@lru_cache(maxsize=1)
+def script_heads() -> frozenset[str]:
+    # Карта ревизий строится один раз на процесс
+    return frozenset(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+
+async def current_heads(db_engine: AsyncEngine = engine) -> frozenset[str]:
+    def get_heads(sync_connection) -> tuple[str, ...]:
+        return MigrationContext.configure(sync_connection).get_current_heads()
+
+    async with db_engine.connect() as connection:
+        heads = await connection.run_sync(get_heads)
+    return frozenset(heads)
+
+
+async def is_at_head(db_engine: AsyncEngine = engine) -> bool:
+    return await current_heads(db_engine) == script_heads()
+
+
+async def upgrade_connection(connection: AsyncConnection, revision: str = "head") -> None:
+    """
+    Обновить до revision (по умолчанию head) БД открытого соединения (движок не из настроек, например в тестах).
+    SQLite: соединение без выполненных запросов - PRAGMA foreign_keys=OFF действует только вне транзакции;
+    после миграций внешние ключи в соединении выключены, для работы - отдельный движок
+    """
+    def upgrade(sync_connection) -> None:
+        config = alembic_config()
+        config.attributes["connection"] = sync_connection
+        command.upgrade(config, revision)
+
+    await connection.run_sync(upgrade)
+
+
+async def run_migrations(force: bool = False) -> None:
+    """Обновить БД до head; если версия в alembic_version уже совпадает с head, Alembic не запускается"""
+    if not force and await is_at_head():
+        logger.info("Схема БД в актуальной версии, миграции пропущены")
+        return
+    await asyncio.to_thread(command.upgrade, alembic_config(), "head")
+    logger.info("Миграции БД применены")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_migrations())
@@ -1,3 +1,6 @@
+from datetime import date, datetime
+
+from sqlalchemy import TIMESTAMP, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from db.database import Base
@@ -8,18 +11,51 @@ class User(Base):
     __tablename__ = "users"
 
     id: Mapped[str] = mapped_column(primary_key=True)
-    email: Mapped[str] = mapped_column(unique=True)
+    # NULL - профиль без email или минимальная строка, созданная приемом отчетов до первого логина
+    email: Mapped[str | None] = mapped_column(unique=True)
     email_verified: Mapped[bool]
     name: Mapped[str]
-    preferred_username: Mapped[str]
+    preferred_username: Mapped[str] = mapped_column(index=True)
     given_name: Mapped[str]
     family_name: Mapped[str]
 
 
 class Report(Base):
-    """Модель отчетов без привязки к конкретным пользователям"""
+    """Модель отчетов пользователя (user_id = NULL - отчеты, созданные до привязки к пользователям)"""
     __tablename__ = "reports"
+    __table_args__ = (
+        # Инкрементальное обновление сводок выбирает измененные записи по updated_at
+        Index("ix_reports_updated_at", "updated_at"),
+        Index("ix_reports_created_at", "created_at"),
+        # Отчеты пользователя за период и страницы отчетов пользователя (keyset по id)
+        Index("ix_reports_user_id_created_at", "user_id", "created_at"),
+        Index("ix_reports_user_id_id", "user_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[str | None] = mapped_column(ForeignKey("users.id", ondelete="SET NULL"))
     title: Mapped[str]
     content: Mapped[str]
+
+
+class ReportDailySummary(Base):
+    """
+    Сводка отчетов пользователя за день, обновляется инкрементально (db/summary.py).
+    user_id = "" - отчеты без привязки к пользователю.
+    """
+    __tablename__ = "report_daily_summaries"
+
+    user_id: Mapped[str] = mapped_column(primary_key=True)
+    day: Mapped[date] = mapped_column(primary_key=True, index=True)
+    reports: Mapped[int]
+    content_length: Mapped[int]
+    first_report_at: Mapped[datetime] = mapped_column(TIMESTAMP)
+    last_report_at: Mapped[datetime] = mapped_column(TIMESTAMP)
+
+
+class SummaryWatermark(Base):
+    """Граница updated_at исходных записей, до которой сводка уже пересчитана"""
+    __tablename__ = "summary_watermarks"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    watermark: Mapped[datetime] = mapped_column(TIMESTAMP)
@@ -0,0 +1,39 @@
+import base64
+import json
+from collections.abc import Mapping
+from typing import Any
+
+from sqlalchemy import Select
+
+
+def encode_cursor(record_id: Any) -> str:
+    """Непрозрачный курсор keyset-пагинации по id последней записи страницы"""
+    payload = json.dumps([record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    """Разобрать курсор, ValueError при некорректном значении"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        (record_id,) = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+    if not isinstance(record_id, (int, str)):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return record_id
+
+
+def apply_keyset(query: Select, model: Any, limit: int, cursor: str | None) -> Select:
+    """Добавить к запросу сортировку по id, условие "после курсора" и limit"""
+    if cursor:
+        query = query.where(model.id > decode_cursor(cursor))
+    return query.order_by(model.id).limit(limit)
+
+
+def next_cursor(records: list, limit: int) -> str | None:
+    """Курсор следующей страницы или None, если страница последняя"""
+    if limit and len(records) == limit:
+        last = records[-1]
+        return encode_cursor(last["id"] if isinstance(last, Mapping) else last.id)
+    return None
@@ -0,0 +1,139 @@
+"""
+Типизированная спецификация запроса к BaseDAO и ее компиляция в SQLAlchemy Core.
+
+Фильтровать и сортировать можно только по колонкам из indexed_columns DAO:
+любой запрос по спецификации использует индекс, а не полный просмотр таблицы.
+"""
+from datetime import datetime
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from sqlalchemy import TIMESTAMP, Select, bindparam, func, select
+from sqlalchemy.dialects import sqlite
+
+
+MAX_IN_VALUES = 1000
+
+# В SQLite время хранится строкой с точностью до секунды, а DateTime SQLAlchemy передает
+# параметр с микросекундами: строковое сравнение "2026-01-01 00:00:00" >= "2026-01-01 00:00:00.000000"
+# ложно. Для границ используется тот же формат, что у CURRENT_TIMESTAMP.
+TIMESTAMP_BOUND = TIMESTAMP().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
+
+class QuerySpecError(ValueError):
+    """Спецификация запроса ссылается на неизвестные колонки или содержит некорректные значения"""
+
+
+class Condition(BaseModel):
+    field: str
+    op: Literal["eq", "ne", "lt", "le", "gt", "ge", "in", "not_in", "is_null", "not_null"] = "eq"
+    value: Any = None
+
+
+class DateRange(BaseModel):
+    """Полуинтервал [start, end) по колонке времени"""
+    field: Literal["created_at", "updated_at"] = "created_at"
+    start: datetime | None = None
+    end: datetime | None = None
+
+
+class OrderBy(BaseModel):
+    field: str
+    desc: bool = False
+
+
+class QuerySpec(BaseModel):
+    where: list[Condition] = Field(default_factory=list, max_length=20)
+    ranges: list[DateRange] = Field(default_factory=list, max_length=4)
+    order_by: list[OrderBy] = Field(default_factory=list, max_length=4)
+    columns: list[str] | None = None
+    limit: int = Field(default=100, ge=1, le=1000)
+    offset: int = Field(default=0, ge=0, le=10000)
+    count_only: bool = False
+
+
+_COMPARISONS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "lt": lambda column, value: column < value,
+    "le": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "ge": lambda column, value: column >= value,
+}
+
+
+def _bound(column, value: Any):
+    # Значение приводится к типу колонки: ошибки типов видны до запроса в БД
+    try:
+        value = TypeAdapter(column.type.python_type).validate_python(value)
+    except (ValidationError, NotImplementedError) as e:
+        raise QuerySpecError(f"Некорректное значение для {column.key}: {value!r}") from e
+    if isinstance(value, datetime):
+        return bindparam(None, value, type_=TIMESTAMP_BOUND)
+    return value
+
+
+class QueryCompiler:
+    def __init__(self, model, indexed_columns: frozenset[str]):
+        self._model = model
+        self._table = model.__table__
+        self._indexed = indexed_columns
+
+    def _column(self, name: str, purpose: str):
+        if name not in self._table.columns:
+            raise QuerySpecError(f"Неизвестная колонка {self._model.__name__}: {name}")
+        if name not in self._indexed:
+            raise QuerySpecError(f"Колонка {name} не индексирована, {purpose} по ней недоступна")
+        return self._table.columns[name]
+
+    def _condition(self, condition: Condition):
+        column = self._column(condition.field, "фильтрация")
+        if condition.op == "is_null":
+            return column.is_(None)
+        if condition.op == "not_null":
+            return column.is_not(None)
+        if condition.op in ("in", "not_in"):
+            if not isinstance(condition.value, list) or not 0 < len(condition.value) <= MAX_IN_VALUES:
+                raise QuerySpecError(f"Для {condition.op} нужен список из 1..{MAX_IN_VALUES} значений")
+            values = [_bound(column, value) for value in condition.value]
+            return column.in_(values) if condition.op == "in" else column.not_in(values)
+        if condition.value is None:
+            raise QuerySpecError(f"Для {condition.op} нужно значение, для NULL - is_null/not_null")
+        return _COMPARISONS[condition.op](column, _bound(column, condition.value))
+
+    def _where(self, query: Select, spec: QuerySpec) -> Select:
+        for condition in spec.where:
+            query = query.where(self._condition(condition))
+        for date_range in spec.ranges:
+            column = self._column(date_range.field, "фильтрация")
+            if date_range.start is not None:
+                query = query.where(column >= bindparam(None, date_range.start, type_=TIMESTAMP_BOUND))
+            if date_range.end is not None:
+                query = query.where(column < bindparam(None, date_range.end, type_=TIMESTAMP_BOUND))
+        return query
+
+    def select(self, spec: QuerySpec) -> Select:
+        """SELECT по спецификации: фильтры, сортировка (с id для однозначного порядка), limit/offset"""
+        if spec.columns:
+            unknown = set(spec.columns) - set(self._table.columns.keys())
+            if unknown:
+                raise QuerySpecError(f"Неизвестные колонки {self._model.__name__}: {sorted(unknown)}")
+            columns = [self._table.columns[name] for name in spec.columns]
+        else:
+            columns = list(self._table.columns)
+        query = self._where(select(*columns), spec)
+        order = [self._column(item.field, "сортировка") for item in spec.order_by]
+        query = query.order_by(*[
+            column.desc() if item.desc else column.asc() for column, item in zip(order, spec.order_by)
+        ])
+        primary_key = list(self._table.primary_key.columns)
+        if not any(column in primary_key for column in order):
+            query = query.order_by(*primary_key)
+        return query.limit(spec.limit).offset(spec.offset)
+
+    def count(self, spec: QuerySpec) -> Select:
+        """SELECT count(*) по фильтрам спецификации (сортировка и limit не учитываются)"""
+        return self._where(select(func.count()).select_from(self._table), spec)
@@ -0,0 +1,76 @@
+import itertools
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+
+class SessionRouter:
+    """
+    Маршрутизация сессий: запись - в primary, чтение - в одну из реплик.
+    После записи клиент на sticky_seconds читает из primary (read-your-writes).
+    Метки записей хранятся в памяти процесса; между worker-ами их переносит cookie
+    (см. db/dependencies.py).
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine] | None = None,
+        strategy: str = "round_robin",
+        sticky_seconds: float = 5.0,
+        max_sticky_keys: int = 10000,
+    ):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Неизвестная стратегия выбора реплики: {strategy}")
+        self.primary = primary
+        self.replicas = replicas or []
+        self._strategy = strategy
+        self._sticky_seconds = sticky_seconds
+        self._max_sticky_keys = max_sticky_keys
+        self._writer = self._session_maker(primary)
+        self._readers = [self._session_maker(replica) for replica in self.replicas]
+        self._round_robin = itertools.cycle(range(len(self._readers))) if self._readers else None
+        self._recent_writes: dict[str, float] = {}
+
+    @staticmethod
+    def _session_maker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+        return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    def writer(self) -> async_sessionmaker[AsyncSession]:
+        return self._writer
+
+    def reader(self, sticky_key: str | None = None) -> async_sessionmaker[AsyncSession]:
+        if not self._readers or self._is_sticky(sticky_key):
+            return self._writer
+        if self._strategy == "least_connections":
+            index = min(range(len(self.replicas)), key=lambda i: self._checked_out(self.replicas[i]))
+        else:
+            index = next(self._round_robin)
+        return self._readers[index]
+
+    @staticmethod
+    def _checked_out(engine: AsyncEngine) -> int:
+        # У NullPool нет счетчика выданных соединений
+        checkedout = getattr(engine.pool, "checkedout", None)
+        return checkedout() if checkedout else 0
+
+    def mark_write(self, sticky_key: str | None, seconds: float | None = None) -> None:
+        """Чтения по sticky_key ближайшие seconds (по умолчанию sticky_seconds) идут в primary"""
+        if not self._readers or not sticky_key:
+            return
+        now = time.monotonic()
+        if len(self._recent_writes) >= self._max_sticky_keys:
+            self._recent_writes = {key: until for key, until in self._recent_writes.items() if until > now}
+        until = now + (self._sticky_seconds if seconds is None else seconds)
+        self._recent_writes[sticky_key] = max(until, self._recent_writes.get(sticky_key, until))
+
+    def _is_sticky(self, sticky_key: str | None) -> bool:
+        if not sticky_key:
+            return False
+        until = self._recent_writes.get(sticky_key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._recent_writes[sticky_key]
+            return False
+        return True
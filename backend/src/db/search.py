@@ -0,0 +1,94 @@
+"""
+Полнотекстовый поиск по отчетам.
+
+SQLite: external content таблица FTS5 reports_fts (rowid = reports.id), ранжирование bm25.
+PostgreSQL: колонка reports.search_vector (tsvector) с GIN-индексом, ранжирование ts_rank_cd.
+Индексы обновляются триггерами из миграции, модель Report о них не знает.
+Batch-миграции SQLite пересоздают таблицу reports без триггеров - после них триггеры нужно создать заново.
+"""
+import html
+import re
+
+from sqlalchemy import TIMESTAMP, Float, Integer, String, text
+from sqlalchemy.sql.selectable import TextualSelect
+
+
+# Объекты поиска создаются миграцией вручную - autogenerate их не трогает (см. migration/env.py)
+SEARCH_TABLE_PREFIX = "reports_fts"
+SEARCH_COLUMNS = {("reports", "search_vector")}
+SEARCH_INDEXES = {"ix_reports_search_vector"}
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """Фильтр autogenerate Alembic: объекты поиска не описаны в моделях и не сравниваются с ними"""
+    if type_ == "table" and name.startswith(SEARCH_TABLE_PREFIX):
+        return False
+    if type_ == "column" and (obj.table.name, name) in SEARCH_COLUMNS:
+        return False
+    if type_ == "index" and name in SEARCH_INDEXES:
+        return False
+    return True
+
+
+# Маркеры подсветки, которых нет в тексте: текст экранируется, затем маркеры заменяются на <mark>
+_START, _STOP = "\x02", "\x03"
+_TERM = re.compile(r"\w+", re.UNICODE)
+# Типы колонок результата: created_at приходит из БД datetime, как у остальных запросов отчетов
+_RESULT_COLUMNS = {"id": Integer, "title": String, "created_at": TIMESTAMP, "snippet": String, "rank": Float}
+
+SQLITE_SEARCH = text(f"""
+    SELECT r.id, r.title, r.created_at,
+           snippet(reports_fts, -1, '{_START}', '{_STOP}', '…', :snippet_tokens) AS snippet,
+           bm25(reports_fts, 4.0, 1.0) AS rank
+    FROM reports_fts
+    JOIN reports r ON r.id = reports_fts.rowid
+    WHERE reports_fts MATCH :query AND r.user_id = :user_id
+    ORDER BY rank, r.id
+    LIMIT :limit OFFSET :offset
+""").columns(**_RESULT_COLUMNS)
+
+# Подсветка считается только для строк страницы: ts_headline читает весь текст отчета
+POSTGRESQL_SEARCH = text(f"""
+    SELECT page.id, page.title, page.created_at,
+           ts_headline(CAST(:config AS regconfig), r.content, page.query,
+                       'StartSel={_START}, StopSel={_STOP}, MaxFragments=2, FragmentDelimiter=…, '
+                       || 'MaxWords=' || CAST(:snippet_tokens AS text) || ', MinWords=5') AS snippet,
+           page.rank
+    FROM (
+        SELECT r.id, r.title, r.created_at, q.query, ts_rank_cd(r.search_vector, q.query) AS rank
+        FROM reports r, websearch_to_tsquery(CAST(:config AS regconfig), :query) AS q(query)
+        WHERE r.search_vector @@ q.query AND r.user_id = :user_id
+        ORDER BY rank DESC, r.id
+        LIMIT :limit OFFSET :offset
+    ) AS page
+    JOIN reports r ON r.id = page.id
+    ORDER BY page.rank DESC, page.id
+""").columns(**_RESULT_COLUMNS)
+
+
+def fts5_query(query: str) -> str:
+    """
+    Запрос пользователя в синтаксисе FTS5: каждое слово - отдельная фраза в кавычках (все слова
+    обязательны), последнее слово ищется по префиксу. Операторы FTS5 из ввода не интерпретируются.
+    """
+    terms = _TERM.findall(query)
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_statement(dialect: str) -> TextualSelect:
+    if dialect == "sqlite":
+        return SQLITE_SEARCH
+    if dialect == "postgresql":
+        return POSTGRESQL_SEARCH
+    raise ValueError(f"Полнотекстовый поиск поддерживает только SQLite и PostgreSQL, диалект БД: {dialect}")
+
+
+def highlight(snippet: str | None) -> str:
+    """Фрагмент с подсветкой как безопасный HTML: текст отчета экранирован, совпадения в <mark>"""
+    if not snippet:
+        return ""
+    return html.escape(snippet).replace(_START, "<mark>").replace(_STOP, "</mark>")
@@ -0,0 +1,142 @@
+"""
+Инкрементальные сводки отчетов по пользователям и дням (таблица report_daily_summaries).
+
+При каждом обновлении выбираются отчеты с updated_at не раньше сохраненной границы (watermark),
+для затронутых ими (пользователь, день) сводка пересчитывается по исходным записям и
+записывается upsert-ом. Пересчет идемпотентен, поэтому повторная обработка записей на границе
+безопасна. Граница берется с запасом lookback: updated_at - время начала транзакции, и запись
+из долгой транзакции может стать видимой позже записей с большим updated_at.
+Удаление отчетов границу не двигает - для сверки есть полная пересборка:
+    python -m db.summary --rebuild
+
+Фоновое обновление выполняет один worker хоста - владелец файловой блокировки lock_path
+(при завершении worker-а блокировку забирает другой). В PostgreSQL обновления с разных
+хостов дополнительно исключаются advisory-блокировкой транзакции.
+"""
+import argparse
+import asyncio
+import fcntl
+import os
+import zlib
+from contextlib import suppress
+from datetime import timedelta
+from typing import TextIO
+
+from loguru import logger
+from sqlalchemy import delete, func, select, tuple_
+
+from api.schemas import AddReportSummary, SetSummaryWatermark
+from db.dao import ReportsDAO, ReportSummaryDAO, SummaryWatermarksDAO
+from db.database import session_router
+from db.models import ReportDailySummary, SummaryWatermark
+from settings.config import settings
+
+
+class ReportSummaryRefresher:
+    name = "report_daily_summaries"
+
+    def __init__(self, interval: float = 5.0, lookback: float = 120.0, lock_path: str = ""):
+        self._interval = interval
+        self._lookback = timedelta(seconds=lookback)
+        self._lock_path = lock_path
+        self._lock_file: TextIO | None = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> int:
+        """Обновить сводку для отчетов, измененных после границы; возвращает число пересчитанных дней"""
+        async with self._lock, session_router.writer()() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                # Обновление уже выполняется на другом хосте
+                lock_key = zlib.crc32(self.name.encode("utf-8"))
+                if not await session.scalar(select(func.pg_try_advisory_xact_lock(lock_key))):
+                    return 0
+            watermark = await session.get(SummaryWatermark, self.name)
+            reports_dao = ReportsDAO(session)
+            keys, max_updated_at = await reports_dao.find_changed_days(
+                watermark.watermark if watermark else None, self._lookback
+            )
+            if not keys:
+                return 0
+            rows = await reports_dao.summarize_days(keys)
+            await ReportSummaryDAO(session).upsert_many([AddReportSummary(**row) for row in rows])
+            # Дни, в которых после изменений не осталось отчетов
+            empty = keys - {(row["user_id"], row["day"]) for row in rows}
+            if empty:
+                await session.execute(
+                    delete(ReportDailySummary).where(
+                        tuple_(ReportDailySummary.user_id, ReportDailySummary.day).in_(sorted(empty))
+                    )
+                )
+            await SummaryWatermarksDAO(session).upsert_many(
+                [SetSummaryWatermark(name=self.name, watermark=max_updated_at)]
+            )
+            await session.commit()
+        for user_id in {user_id for user_id, _ in keys if user_id}:
+            session_router.mark_write(user_id)
+        logger.debug("Сводка {} обновлена, дней: {}", self.name, len(keys))
+        return len(keys)
+
+    async def rebuild(self) -> int:
+        """Пересобрать сводку с нуля по всем отчетам"""
+        async with self._lock, session_router.writer()() as session:
+            await session.execute(delete(ReportDailySummary))
+            await session.execute(delete(SummaryWatermark).where(SummaryWatermark.name == self.name))
+            await session.commit()
+        return await self.refresh()
+
+    def start(self) -> None:
+        if self._task is None and self._interval > 0:
+            self._task = asyncio.create_task(self._run(), name="report-summary")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _acquire_leadership(self) -> bool:
+        # Блокировка держится до конца процесса, ОС снимает ее и при аварийном завершении
+        if self._lock_file is not None or not self._lock_path:
+            return True
+        os.makedirs(os.path.dirname(self._lock_path), exist_ok=True)
+        lock_file = open(self._lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Сводка {self.name} обновляется в фоне процессом {os.getpid()}")
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            if not self._acquire_leadership():
+                await asyncio.sleep(self._interval)
+                continue
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка обновления сводки {self.name}: {e}")
+            await asyncio.sleep(self._interval)
+
+
+report_summary_refresher = ReportSummaryRefresher(
+    interval=settings.SUMMARY_REFRESH_INTERVAL,
+    lookback=settings.SUMMARY_WATERMARK_LOOKBACK,
+    lock_path=f"{settings.BASE_DIR}/backend-data/report_daily_summaries.lock",
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обновление сводок отчетов")
+    parser.add_argument("--rebuild", action="store_true", help="пересобрать сводку с нуля")
+    arguments = parser.parse_args()
+    refresher = ReportSummaryRefresher(lookback=settings.SUMMARY_WATERMARK_LOOKBACK)
+    days = asyncio.run(refresher.rebuild() if arguments.rebuild else refresher.refresh())
+    logger.info(f"Сводка {refresher.name} обновлена, дней: {days}")
@@ -0,0 +1,263 @@
+"""
+Фоновые выгрузки отчетов пользователя в CSV, XLSX и PDF.
+
+POST /api/reports/export ставит задание в очередь процесса. Фоновая задача читает отчеты
+из БД чанками в NDJSON-спул на диске, затем рендерит файл в ProcessPoolExecutor - рендеринг
+не занимает event loop, который обслуживает остальные запросы.
+Состояние задания - файл job.json в каталоге задания рядом с результатом, поэтому статус
+и скачивание доступны из любого worker-а на этом хосте. Каталоги заданий удаляются через ttl
+после завершения задания. Файлы заданий читаются и пишутся в потоках (asyncio.to_thread).
+
+Пул процессов рендеринга у каждого worker-а свой: на хосте до WEB_WORKERS * processes процессов,
+размер на хост задает EXPORT_PROCESSES_TOTAL. Процессы запускаются пулом при первых выгрузках.
+При остановке начатый рендеринг дожидается завершения, задание завершается как обычно.
+"""
+import asyncio
+import multiprocessing
+import os
+import re
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from datetime import datetime, timezone
+
+import orjson
+from loguru import logger
+
+from api.schemas import ExportJob, UserReportsFilter
+from db.dao import ReportsDAO
+from db.database import session_router
+from export.render import COLUMNS, available_formats, render
+from monitoring.metrics import EXPORT_JOBS, EXPORT_RENDER_DURATION
+from settings.config import settings
+
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+_JOB_FILE = "job.json"
+_SPOOL_FILE = "rows.ndjson"
+
+
+class ExportJobManager:
+    def __init__(
+        self,
+        directory: str,
+        processes: int = 2,
+        queue_size: int = 100,
+        chunk_size: int = 1000,
+        max_rows: int = 100000,
+        ttl: float = 3600,
+        cleanup_interval: float = 300,
+        pdf_font: str = "",
+    ):
+        self._directory = directory
+        self._processes = processes
+        self._queue: asyncio.Queue[tuple[ExportJob, str | None]] = asyncio.Queue(maxsize=queue_size)
+        self._chunk_size = chunk_size
+        self._max_rows = max_rows
+        self._ttl = ttl
+        self._cleanup_interval = cleanup_interval
+        self._pdf_font = pdf_font
+        self._pool: ProcessPoolExecutor | None = None
+        self._workers: list[asyncio.Task] = []
+        self._cleaner: asyncio.Task | None = None
+
+    @property
+    def formats(self) -> set[str]:
+        return available_formats()
+
+    async def submit(self, user_id: str, export_format: str, sticky_key: str | None = None) -> ExportJob | None:
+        """Поставить выгрузку в очередь; None - очередь заполнена"""
+        if self._queue.full():
+            EXPORT_JOBS.labels(export_format, "rejected").inc()
+            return None
+        job = ExportJob(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            format=export_format,
+            created_at=datetime.now(timezone.utc),
+        )
+        await asyncio.to_thread(self._create, job)
+        try:
+            # Пока файл задания писался, очередь могли заполнить другие запросы
+            self._queue.put_nowait((job, sticky_key))
+        except asyncio.QueueFull:
+            await asyncio.to_thread(shutil.rmtree, self._job_dir(job.id), True)
+            EXPORT_JOBS.labels(export_format, "rejected").inc()
+            return None
+        EXPORT_JOBS.labels(export_format, "queued").inc()
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> ExportJob | None:
+        """Задание пользователя по id; чужие и удаленные задания не отличаются от несуществующих"""
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        job = await asyncio.to_thread(self._load, job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def result_path(self, job: ExportJob) -> str:
+        return os.path.join(self._job_dir(job.id), f"reports.{job.format}")
+
+    @staticmethod
+    def filename(job: ExportJob) -> str:
+        return f"reports-{job.created_at:%Y%m%d-%H%M%S}.{job.format}"
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        os.makedirs(self._directory, exist_ok=True)
+        # spawn: дочерние процессы не наследуют event loop, потоки и соединения с БД worker-а
+        self._pool = ProcessPoolExecutor(self._processes, mp_context=multiprocessing.get_context("spawn"))
+        self._workers = [
+            asyncio.create_task(self._run(), name=f"report-export-{i}") for i in range(self._processes)
+        ]
+        if self._cleanup_interval > 0:
+            self._cleaner = asyncio.create_task(self._clean_periodically(), name="report-export-cleanup")
+
+    async def stop(self) -> None:
+        """
+        Остановить выгрузки: начатый рендеринг завершается, остальные незавершенные задания
+        помечаются неуспешными. Возвращается после выхода процессов пула.
+        """
+        for task in [*self._workers, self._cleaner]:
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        self._workers, self._cleaner = [], None
+        while not self._queue.empty():
+            job, _ = self._queue.get_nowait()
+            await self._finish(job, error="Выгрузка прервана остановкой сервера")
+        if self._pool is not None:
+            # Задач в пуле нет: shutdown дожидается выхода процессов, не блокируя event loop
+            await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
+            self._pool = None
+
+    def cleanup(self) -> int:
+        """Удалить каталоги заданий, завершенных больше ttl секунд назад; возвращает число удаленных"""
+        removed = 0
+        now = time.time()
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                if not entry.is_dir() or not _JOB_ID.fullmatch(entry.name):
+                    continue
+                job_path = os.path.join(entry.path, _JOB_FILE)
+                try:
+                    age = now - os.stat(job_path).st_mtime
+                    with open(job_path, "rb") as job_file:
+                        finished = ExportJob.model_validate_json(job_file.read()).status in ("done", "failed")
+                except (OSError, ValueError):
+                    age, finished = now - entry.stat().st_mtime, True
+                # Незавершенные задания старше 4 * ttl остались от процесса, остановленного аварийно
+                if age > self._ttl and (finished or age > 4 * self._ttl):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+        return removed
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self._directory, job_id)
+
+    def _create(self, job: ExportJob) -> None:
+        os.makedirs(self._job_dir(job.id), exist_ok=True)
+        self._save(job)
+
+    def _load(self, job_id: str) -> ExportJob | None:
+        try:
+            with open(os.path.join(self._job_dir(job_id), _JOB_FILE), "rb") as job_file:
+                return ExportJob.model_validate_json(job_file.read())
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, job: ExportJob) -> None:
+        # Запись через временный файл: читатели не видят job.json наполовину
+        job_path = os.path.join(self._job_dir(job.id), _JOB_FILE)
+        with open(f"{job_path}.tmp", "wb") as job_file:
+            job_file.write(job.model_dump_json().encode("utf-8"))
+        os.replace(f"{job_path}.tmp", job_path)
+
+    async def _finish(self, job: ExportJob, error: str | None = None) -> None:
+        job.status = "failed" if error else "done"
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        EXPORT_JOBS.labels(job.format, job.status).inc()
+        with suppress(OSError):
+            await asyncio.to_thread(self._save, job)
+
+    async def _run(self) -> None:
+        while True:
+            job, sticky_key = await self._queue.get()
+            try:
+                await self._export(job, sticky_key)
+                await self._finish(job)
+                logger.info(f"Выгрузка {job.id} ({job.format}) готова: {job.rows} отчетов, {job.size} байт")
+            except asyncio.CancelledError:
+                # size задан - рендеринг закончился во время остановки, файл выгрузки готов
+                if job.size is not None:
+                    await self._finish(job)
+                else:
+                    await self._finish(job, error="Выгрузка прервана остановкой сервера")
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка выгрузки {job.id} ({job.format}): {e}")
+                await self._finish(job, error="Ошибка формирования выгрузки")
+            finally:
+                with suppress(OSError):
+                    await asyncio.to_thread(os.remove, os.path.join(self._job_dir(job.id), _SPOOL_FILE))
+
+    async def _export(self, job: ExportJob, sticky_key: str | None) -> None:
+        job.status = "running"
+        await asyncio.to_thread(self._save, job)
+        spool_path = os.path.join(self._job_dir(job.id), _SPOOL_FILE)
+        spool = await asyncio.to_thread(open, spool_path, "wb")
+        try:
+            async with session_router.reader(sticky_key)() as session:
+                chunks = ReportsDAO(session).stream_rows(
+                    UserReportsFilter(user_id=job.user_id), columns=list(COLUMNS), chunk_size=self._chunk_size
+                )
+                async for rows in chunks:
+                    rows = rows[:self._max_rows - job.rows]
+                    data = b"".join(orjson.dumps(row) + b"\n" for row in rows)
+                    await asyncio.to_thread(spool.write, data)
+                    job.rows += len(rows)
+                    if job.rows >= self._max_rows:
+                        job.truncated = True
+                        break
+        finally:
+            await asyncio.to_thread(spool.close)
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        rendering = loop.run_in_executor(
+            self._pool, render, job.format, spool_path, self.result_path(job), self._pdf_font
+        )
+        try:
+            job.size = await asyncio.shield(rendering)
+        except asyncio.CancelledError:
+            # Процесс пула не прервать: остановка дожидается рендеринга, чтобы файл не появился
+            # у задания, уже помеченного неуспешным
+            with suppress(Exception):
+                job.size = await rendering
+            raise
+        EXPORT_RENDER_DURATION.labels(job.format).observe(time.perf_counter() - started)
+
+    async def _clean_periodically(self) -> None:
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.cleanup)
+                if removed:
+                    logger.info(f"Удалено устаревших выгрузок: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка очистки выгрузок: {e}")
+            await asyncio.sleep(self._cleanup_interval)
+
+
+export_jobs = ExportJobManager(
+    directory=settings.export_dir,
+    processes=settings.export_processes,
+    queue_size=settings.EXPORT_QUEUE_SIZE,
+    chunk_size=settings.EXPORT_CHUNK_SIZE,
+    max_rows=settings.EXPORT_MAX_ROWS,
+    ttl=settings.EXPORT_TTL,
+    cleanup_interval=settings.EXPORT_CLEANUP_INTERVAL,
+    pdf_font=settings.EXPORT_PDF_FONT,
+)
@@ -0,0 +1,124 @@
+"""
+Рендеринг выгрузок отчетов. Функции модуля выполняются в дочерних процессах ProcessPoolExecutor:
+аргументы - пути к файлам и простые значения, настройки и БД приложения не импортируются.
+Строки читаются из NDJSON-спула построчно, результат пишется во временный файл и переименовывается.
+"""
+import csv
+import os
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import orjson
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+except ImportError:  # openpyxl и reportlab - необязательные зависимости (форматы xlsx и pdf)
+    Workbook = None
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+except ImportError:
+    SimpleDocTemplate = None
+
+
+COLUMNS = ("id", "title", "content", "created_at", "updated_at")
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+# Максимальная длина текста в ячейке Excel
+XLSX_CELL_LIMIT = 32767
+# Первые символы, с которых табличные редакторы начинают формулу (CSV/formula injection)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+PDF_FONT_NAME = "ExportFont"
+
+
+def available_formats() -> set[str]:
+    formats = {"csv"}
+    if Workbook is not None:
+        formats.add("xlsx")
+    if SimpleDocTemplate is not None:
+        formats.add("pdf")
+    return formats
+
+
+def _rows(spool_path: str):
+    with open(spool_path, "rb") as spool:
+        for line in spool:
+            yield orjson.loads(line)
+
+
+def csv_value(value):
+    # Текст пользователя, похожий на формулу, экранируется апострофом и остается текстом
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _render_csv(spool_path: str, output_path: str, pdf_font: str) -> None:
+    # BOM: Excel открывает UTF-8 CSV с кириллицей без выбора кодировки
+    with open(output_path, "w", encoding="utf-8-sig", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow(COLUMNS)
+        for row in _rows(spool_path):
+            writer.writerow([csv_value(row[column]) for column in COLUMNS])
+
+
+def _xlsx_cell(sheet, column: str, value):
+    if column in ("created_at", "updated_at"):
+        return datetime.fromisoformat(value)
+    if not isinstance(value, str):
+        return value
+    cell = WriteOnlyCell(sheet, value=ILLEGAL_CHARACTERS_RE.sub("", value)[:XLSX_CELL_LIMIT])
+    # openpyxl записывает строку, начинающуюся с "=", как формулу - текст пользователя всегда строка
+    cell.data_type = "s"
+    return cell
+
+
+def _render_xlsx(spool_path: str, output_path: str, pdf_font: str) -> None:
+    # write_only: строки пишутся в файл сразу, лист не держится в памяти
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Reports")
+    sheet.append(COLUMNS)
+    for row in _rows(spool_path):
+        sheet.append([_xlsx_cell(sheet, column, row[column]) for column in COLUMNS])
+    workbook.save(output_path)
+
+
+def _render_pdf(spool_path: str, output_path: str, pdf_font: str) -> None:
+    styles = getSampleStyleSheet()
+    title_style, meta_style, body_style = styles["Heading3"], styles["Italic"], styles["BodyText"]
+    # Стандартные шрифты PDF без кириллицы: при наличии TTF-шрифта текст набирается им
+    if pdf_font and os.path.exists(pdf_font):
+        if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, pdf_font))
+        for style in (title_style, meta_style, body_style):
+            style.fontName = PDF_FONT_NAME
+    story = []
+    for row in _rows(spool_path):
+        story.append(Paragraph(f"#{row['id']} {escape(row['title'])}", title_style))
+        story.append(Paragraph(escape(row["created_at"].replace("T", " ")), meta_style))
+        story.append(Paragraph(escape(row["content"]).replace("\n", "<br/>"), body_style))
+        story.append(Spacer(1, 6))
+    SimpleDocTemplate(output_path, pagesize=A4, title="Reports").build(story)
+
+
+_RENDERERS = {"csv": _render_csv, "xlsx": _render_xlsx, "pdf": _render_pdf}
+
+
+def render(export_format: str, spool_path: str, output_path: str, pdf_font: str = "") -> int:
+    """Отрендерить спул строк в файл выгрузки; возвращает размер файла в байтах"""
+    partial_path = f"{output_path}.part"
+    try:
+        _RENDERERS[export_format](spool_path, partial_path, pdf_font)
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return os.path.getsize(output_path)
@@ -0,0 +1,60 @@
+"""
+Production-режим: gunicorn с воркерами uvicorn (uvloop + httptools).
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Миграции выполняются один раз в мастер-процессе до запуска воркеров.
+Движок БД, пакетный sink логов и KeycloakClient создаются в каждом воркере заново.
+"""
+import asyncio
+import os
+import shutil
+
+from settings.config import settings
+
+# Метрики prometheus из всех воркеров, каталог задается до импорта приложения
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = f"{settings.WEB_HOST}:{settings.WEB_PORT}"
+workers = settings.web_workers
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = settings.WEB_PRELOAD
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS_JITTER
+timeout = settings.WEB_TIMEOUT
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT
+keepalive = settings.WEB_KEEPALIVE
+loglevel = settings.LOG_LEVEL.lower()
+
+
+def on_starting(server):
+    # Один прогон миграций вместо гонки между воркерами
+    from db.migrations import run_migrations
+    from db.database import engine
+
+    async def migrate() -> None:
+        if settings.RUN_MIGRATIONS_ON_STARTUP:
+            await run_migrations()
+        await engine.dispose()
+
+    asyncio.run(migrate())
+    settings.RUN_MIGRATIONS_ON_STARTUP = False
+    os.environ["RUN_MIGRATIONS_ON_STARTUP"] = "false"
+
+
+def post_fork(server, worker):
+    # Соединения пула и поток записи логов не переживают fork
+    from db.database import engine, replica_engines
+    from settings.log_config import setup_logging
+
+    for db_engine in (engine, *replica_engines):
+        db_engine.sync_engine.dispose(close=False)
+    setup_logging(settings)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
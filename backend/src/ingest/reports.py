@@ -0,0 +1,233 @@
+"""
+Прием отчетов через очередь в памяти процесса с записью в БД пачками.
+
+Гарантии доставки: 202 означает, что отчеты в очереди процесса. Неудачная запись пачки
+повторяется с экспоненциальной задержкой, затем пачка делится пополам, чтобы записать
+корректные отчеты; отчеты, которые не записываются и по одному, сохраняются на диск
+(dead letter, NDJSON) и дописываются в БД командой:
+    python -m ingest.reports --replay
+Отчеты, еще не записанные на момент аварийного завершения процесса (SIGKILL, OOM),
+теряются - при сбое процесса доставка не более одного раза.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from contextlib import suppress
+
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+
+from api.schemas import AddReport
+from cache.response_cache import response_cache
+from db.dao import ReportsDAO, UsersDAO
+from db.database import session_router
+from monitoring.metrics import INGEST_BATCH_SIZE, INGEST_ITEMS, INGEST_QUEUE_DEPTH
+from settings.config import settings
+
+
+_report_list = TypeAdapter(list[AddReport])
+
+
+def parse_reports(body: bytes, content_type: str) -> list[AddReport]:
+    """
+    Отчеты из тела запроса: NDJSON (application/x-ndjson, один объект на строку)
+    или JSON - массив объектов либо один объект. Ошибка формата - ValueError.
+    """
+    try:
+        if "ndjson" in content_type:
+            return [AddReport.model_validate_json(line) for line in body.splitlines() if line.strip()]
+        if body.lstrip().startswith(b"["):
+            return _report_list.validate_json(body)
+        return [AddReport.model_validate_json(body)]
+    except ValidationError as e:
+        raise ValueError(f"Invalid report payload: {e.error_count()} errors") from e
+
+
+class ReportIngestQueue:
+    """
+    Буфер приема отчетов: запрос только кладет записи в asyncio.Queue,
+    фоновая задача пишет их в БД пачками add_many - до batch_size записей
+    или через flush_interval секунд после первой записи пачки.
+    Если в очереди нет места для всего запроса, он отклоняется целиком.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        write_attempts: int = 3,
+        write_backoff: float = 0.5,
+        dead_letter_dir: str = "",
+    ):
+        self._queue: asyncio.Queue[AddReport] = asyncio.Queue(maxsize=maxsize)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._write_attempts = write_attempts
+        self._write_backoff = write_backoff
+        self._dead_letter_dir = dead_letter_dir
+        self._worker: asyncio.Task | None = None
+        # Собираемая пачка и пачка в записи - чтобы дописать их при остановке
+        self._pending: list[AddReport] = []
+        self._flushing: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def offer(self, reports: list[AddReport]) -> bool:
+        """Положить отчеты в очередь; False - места нет (backpressure)"""
+        if self._queue.maxsize - self._queue.qsize() < len(reports):
+            INGEST_ITEMS.labels("rejected").inc(len(reports))
+            return False
+        # Между put_nowait нет await, запрос попадает в очередь целиком
+        for report in reports:
+            self._queue.put_nowait(report)
+        INGEST_ITEMS.labels("accepted").inc(len(reports))
+        INGEST_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run(), name="report-ingest")
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу и записать все, что осталось в очереди"""
+        if self._worker is not None:
+            self._worker.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+        if self._flushing is not None:
+            await self._flushing
+        batch, self._pending = self._pending, []
+        while True:
+            batch.extend(self._take(self._batch_size - len(batch)))
+            if not batch:
+                break
+            await self._flush(batch)
+            batch = []
+
+    def _take(self, limit: int) -> list[AddReport]:
+        items = []
+        while len(items) < limit and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._pending = [await self._queue.get()]
+            deadline = loop.time() + self._flush_interval
+            while len(self._pending) < self._batch_size:
+                self._pending.extend(self._take(self._batch_size - len(self._pending)))
+                timeout = deadline - loop.time()
+                if len(self._pending) >= self._batch_size or timeout <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._pending = self._pending, []
+            INGEST_QUEUE_DEPTH.set(self._queue.qsize())
+            # shield: отмена при остановке не прерывает запись уже собранной пачки
+            self._flushing = asyncio.create_task(self._flush(batch))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    async def _flush(self, batch: list[AddReport]) -> None:
+        INGEST_BATCH_SIZE.observe(len(batch))
+        for attempt in range(self._write_attempts):
+            try:
+                await write_reports(batch)
+                INGEST_ITEMS.labels("written").inc(len(batch))
+                return
+            except Exception as e:
+                logger.error(f"Ошибка записи пачки из {len(batch)} принятых отчетов (попытка {attempt + 1}): {e}")
+                if attempt + 1 < self._write_attempts:
+                    await asyncio.sleep(self._write_backoff * 2 ** attempt)
+        await self._isolate(batch)
+
+    async def _isolate(self, batch: list[AddReport]) -> None:
+        # Пачка делится пополам, пока не останутся отчеты, которые не записываются сами по себе
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            for half in (batch[:middle], batch[middle:]):
+                try:
+                    await write_reports(half)
+                    INGEST_ITEMS.labels("written").inc(len(half))
+                except Exception:
+                    await self._isolate(half)
+            return
+        try:
+            path = await asyncio.to_thread(spool_dead_letter, self._dead_letter_dir, batch)
+            logger.error(f"Отчет не записан в БД и сохранен в {path}")
+            INGEST_ITEMS.labels("dead_letter").inc(len(batch))
+        except OSError as e:
+            logger.error(f"Отчет не записан ни в БД, ни в {self._dead_letter_dir}: {e}")
+            INGEST_ITEMS.labels("failed").inc(len(batch))
+
+
+async def write_reports(reports: list[AddReport]) -> None:
+    async with session_router.writer()() as session:
+        # Строка users для внешнего ключа: отчет может прийти раньше, чем профиль запишет синхронизация
+        await UsersDAO(session).ensure_ids(report.user_id for report in reports)
+        await ReportsDAO(session).add_many(reports)
+        await session.commit()
+        await response_cache.invalidate_session(session)
+    # Окно read-your-writes отсчитывается и от фактической записи, а не только от ответа 202
+    for user_id in {report.user_id for report in reports}:
+        session_router.mark_write(user_id)
+
+
+def spool_dead_letter(directory: str, reports: list[AddReport]) -> str:
+    """Сохранить незаписанные отчеты в NDJSON-файл каталога dead letter; файл появляется целиком"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"reports-{time.time_ns()}-{uuid.uuid4().hex[:8]}.ndjson")
+    with open(f"{path}.tmp", "wb") as spool:
+        spool.write(b"".join(report.model_dump_json().encode("utf-8") + b"\n" for report in reports))
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+async def replay_dead_letters(directory: str) -> tuple[int, int]:
+    """Дописать в БД отчеты из каталога dead letter; возвращает (записано, не записано)"""
+    written = failed = 0
+    if not os.path.isdir(directory):
+        return written, failed
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".ndjson"):
+            continue
+        path = os.path.join(directory, name)
+        with open(path, "rb") as spool:
+            reports = parse_reports(spool.read(), "application/x-ndjson")
+        try:
+            await write_reports(reports)
+        except Exception as e:
+            logger.error(f"Отчеты из {path} не записаны: {e}")
+            failed += len(reports)
+            continue
+        os.remove(path)
+        written += len(reports)
+    return written, failed
+
+
+report_ingest_queue = ReportIngestQueue(
+    maxsize=settings.INGEST_QUEUE_SIZE,
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL,
+    write_attempts=settings.INGEST_WRITE_ATTEMPTS,
+    write_backoff=settings.INGEST_WRITE_BACKOFF,
+    dead_letter_dir=settings.ingest_dead_letter_dir,
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Прием отчетов")
+    parser.add_argument("--replay", action="store_true", help="дописать в БД отчеты из каталога dead letter")
+    arguments = parser.parse_args()
+    if arguments.replay:
+        written, failed = asyncio.run(replay_dead_letters(settings.ingest_dead_letter_dir))
+        logger.info(f"Отчеты из dead letter: записано {written}, не записано {failed}")
@@ -1,37 +1,30 @@
-import asyncio
 from contextlib import asynccontextmanager
-import sys
 
-from alembic.config import Config
-from alembic import command
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse, JSONResponse
 from keycloak import KeycloakOpenID
-from loguru import logger
 
 from settings.config import settings
+from settings.log_config import setup_logging
+from api.compression import CompressionMiddleware
 from auth.keycloak_client import KeycloakClient
+from auth.keycloak_http import configure_connection
+from auth.refresh import TokenRefreshMiddleware
+from auth.user_sync import user_profile_sync
+from cache.response_cache import response_cache
+from db.migrations import run_migrations
+from db.summary import report_summary_refresher
+from export.jobs import export_jobs
+from ingest.reports import report_ingest_queue
+from monitoring.metrics import cache_stats
+from monitoring.middleware import MetricsMiddleware, record_route
 
 from api.router import router as api_router
+from monitoring.router import router as monitoring_router
 
-# Очистка стандартных хендлеров
-logger.remove()
-
-# Настройка логгирования в stdout с debug-информацией
-logger.add(
-    sys.stdout,
-    level="DEBUG",
-    backtrace=True,
-    diagnose=True,  # Показывает подробности при исключениях
-    enqueue=True,   # Thread-safe логгирование
-)
-
-
-async def run_migrations() -> None:
-    # Выполняет миграции в БД
-    alembic_cfg = Config("alembic.ini")
-    await asyncio.to_thread(command.upgrade, alembic_cfg, "head")
+# Логгирование в stdout: уровень, формат, пакетная запись и сэмплирование задаются в Settings
+setup_logging(settings)
 
 
 @asynccontextmanager
@@ -43,20 +36,60 @@ async def lifespan(app: FastAPI):
         realm_name=settings.KEYCLOAK_REALM,
         client_secret_key=settings.KEYCLOAK_CLIENT_SECRET
     )
+    # Пул соединений и таймауты httpx для запросов в Keycloak
+    await configure_connection(keycloak_client.connection)
     app.state.keycloak_client = KeycloakClient(keycloak_client)
 
-    # Миграции БД
-    await run_migrations()
+    # Счетчики попаданий кешей для /metrics
+    cache_stats.register("token_claims", lambda: app.state.keycloak_client.claims_cache)
+    cache_stats.register("response", lambda: response_cache)
+
+    # Миграции БД (при RUN_MIGRATIONS_ON_STARTUP=false выполняются отдельно: python -m db.migrations)
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        await run_migrations()
+
+    # Фоновая запись профилей пользователей после логина
+    user_profile_sync.start()
+    # Фоновая запись принятых отчетов пачками
+    report_ingest_queue.start()
+    # Фоновое инкрементальное обновление сводок отчетов
+    report_summary_refresher.start()
+    # Фоновые выгрузки отчетов и очистка устаревших файлов выгрузок
+    export_jobs.start()
 
     #  Подключаем роутеры и статику
     app.include_router(api_router)
+    app.include_router(monitoring_router)
 
     yield
 
+    # Дописать в БД отчеты, оставшиеся в очереди приема
+    await report_ingest_queue.stop()
+    await user_profile_sync.stop()
+    await report_summary_refresher.stop()
+    await export_jobs.stop()
+
     #  Закрываем клиент
     await keycloak_client.connection.aclose()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(record_route)])
+if settings.COMPRESSION_ENABLED:
+    # Сжатие по Accept-Encoding: zstd, br или gzip
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        zstd_level=settings.COMPRESSION_ZSTD_LEVEL,
+    )
+if settings.TOKEN_REFRESH_ENABLED:
+    # Истекающий access_token обновляется по cookie refresh_token без редиректа на страницу входа
+    app.add_middleware(
+        TokenRefreshMiddleware,
+        refresh_before=settings.TOKEN_REFRESH_BEFORE_EXPIRY,
+        wait_timeout=settings.TOKEN_REFRESH_WAIT_TIMEOUT,
+    )
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -79,5 +112,6 @@ async def auth_exception_handler(request: Request, exc: HTTPException):
         )
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=exc.headers,
     )
@@ -8,7 +8,8 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
 from db.database import Base
-from db.models import User, Report  # noqa
+from db.models import User, Report, ReportDailySummary, SummaryWatermark  # noqa
+from db.search import include_object
 from settings.config import settings
 
 # this is the Alembic Config object, which provides
@@ -18,8 +19,9 @@ config.set_main_option("sqlalchemy.url", settings.database_url)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
+# Existing loggers (gunicorn, uvicorn) are kept when migrations run in-process.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -27,6 +29,7 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -49,6 +52,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -58,7 +62,16 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    if connection.dialect.name == "sqlite":
+        # batch-миграции пересоздают таблицы: с внешними ключами DROP TABLE users
+        # выполнил бы ON DELETE SET NULL для reports. Вне транзакции, иначе PRAGMA не действует
+        in_transaction = connection.in_transaction()
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        if not in_transaction:
+            # PRAGMA открыла транзакцию SQLAlchemy (autobegin): без commit Alembic счел бы ее внешней
+            # и не закоммитил бы миграции
+            connection.commit()
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
 
     with context.begin_transaction():
         context.run_migrations()
@@ -84,6 +97,11 @@ async def run_async_migrations() -> None:
 
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
+    # Соединение, переданное вызывающим кодом (тесты): миграции выполняются в нем
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
 
     asyncio.run(run_async_migrations())
 
@@ -0,0 +1,31 @@
+"""Nullable user email
+
+Revision ID: 9c2e4b7a1d05
+Revises: 054aee18c009
+Create Date: 2026-10-18 16:42:10.215337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2e4b7a1d05'
+down_revision: Union[str, None] = '054aee18c009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Профиль Keycloak может быть без email; прием отчетов создает строку users только с id
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('email', existing_type=sa.String(), nullable=True)
+
+
+def downgrade() -> None:
+    # Пустой email, уникальный для каждого пользователя без email
+    op.execute("UPDATE users SET email = id WHERE email IS NULL")
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('email', existing_type=sa.String(), nullable=False)
@@ -0,0 +1,106 @@
+"""Reports full text search
+
+Revision ID: b748e152a365
+Revises: f36333ca1d2b
+Create Date: 2026-10-18 15:24:50.628064
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from settings.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b748e152a365'
+down_revision: Union[str, None] = 'f36333ca1d2b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = [
+    # external content: текст хранится только в reports, в FTS5 - индекс
+    """
+    CREATE VIRTUAL TABLE reports_fts USING fts5(
+        title, content, content='reports', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER reports_fts_insert AFTER INSERT ON reports BEGIN
+        INSERT INTO reports_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER reports_fts_delete AFTER DELETE ON reports BEGIN
+        INSERT INTO reports_fts(reports_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER reports_fts_update AFTER UPDATE OF title, content ON reports BEGIN
+        INSERT INTO reports_fts(reports_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO reports_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS reports_fts_update",
+    "DROP TRIGGER IF EXISTS reports_fts_delete",
+    "DROP TRIGGER IF EXISTS reports_fts_insert",
+    "DROP TABLE IF EXISTS reports_fts",
+]
+
+
+def postgresql_upgrade(config: str) -> list[str]:
+    # Заголовок весит больше текста отчета (A > B)
+    vector = (
+        f"setweight(to_tsvector('{config}', coalesce(new.title, '')), 'A') || "
+        f"setweight(to_tsvector('{config}', coalesce(new.content, '')), 'B')"
+    )
+    return [
+        "ALTER TABLE reports ADD COLUMN search_vector tsvector",
+        f"""
+        CREATE FUNCTION reports_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            new.search_vector := {vector};
+            RETURN new;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER reports_search_vector_update BEFORE INSERT OR UPDATE OF title, content ON reports
+        FOR EACH ROW EXECUTE FUNCTION reports_search_vector_update()
+        """,
+        # Заполнение существующих строк через тот же триггер
+        "UPDATE reports SET title = title",
+        "CREATE INDEX ix_reports_search_vector ON reports USING gin (search_vector)",
+    ]
+
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_reports_search_vector",
+    "DROP TRIGGER IF EXISTS reports_search_vector_update ON reports",
+    "DROP FUNCTION IF EXISTS reports_search_vector_update()",
+    "ALTER TABLE reports DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        statements = SQLITE_UPGRADE
+    elif dialect == "postgresql":
+        statements = postgresql_upgrade(settings.SEARCH_TEXT_CONFIG)
+    else:
+        raise ValueError(f"Полнотекстовый поиск поддерживает только SQLite и PostgreSQL, диалект БД: {dialect}")
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for statement in SQLITE_DOWNGRADE if dialect == "sqlite" else POSTGRESQL_DOWNGRADE:
+        op.execute(statement)
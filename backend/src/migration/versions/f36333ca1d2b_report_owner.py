@@ -0,0 +1,72 @@
+"""Report owner
+
+Revision ID: f36333ca1d2b
+Revises: ecdf9e35942e
+Create Date: 2026-10-18 15:23:18.401919
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from settings.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f36333ca1d2b'
+down_revision: Union[str, None] = 'ecdf9e35942e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    # batch-режим: в SQLite внешний ключ добавляется только пересозданием таблицы
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.String(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_reports_user_id_users', 'users', ['user_id'], ['id'], ondelete='SET NULL'
+        )
+    op.create_index('ix_reports_user_id_created_at', 'reports', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_reports_user_id_id', 'reports', ['user_id', 'id'], unique=False)
+    backfill_owner()
+
+
+def backfill_owner() -> None:
+    """
+    Существующие отчеты не хранят автора, поэтому они привязываются к пользователю из
+    REPORTS_BACKFILL_USER_ID (если он задан и есть в users). Иначе user_id остается NULL:
+    такие отчеты не видны пользователям протезов. Обновление идет пачками по id, но миграция
+    Alembic выполняется одной транзакцией: пачки ограничивают размер одного UPDATE, а блокировки
+    обновленных строк держатся до конца миграции.
+    Сводки по дням (report_daily_summaries) хранятся по владельцу отчета: после смены владельца
+    они и граница обновления сбрасываются, ReportSummaryRefresher пересобирает их с нуля.
+    """
+    owner = settings.REPORTS_BACKFILL_USER_ID
+    if not owner:
+        return
+    connection = op.get_bind()
+    if connection.execute(sa.text("SELECT 1 FROM users WHERE id = :owner"), {"owner": owner}).first() is None:
+        return
+    max_id = connection.execute(sa.text("SELECT MAX(id) FROM reports")).scalar() or 0
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        connection.execute(
+            sa.text(
+                "UPDATE reports SET user_id = :owner, updated_at = CURRENT_TIMESTAMP "
+                "WHERE user_id IS NULL AND id > :start AND id <= :end"
+            ),
+            {"owner": owner, "start": start, "end": start + BACKFILL_BATCH_SIZE},
+        )
+    connection.execute(sa.text("DELETE FROM report_daily_summaries"))
+    connection.execute(sa.text("DELETE FROM summary_watermarks WHERE name = 'report_daily_summaries'"))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reports_user_id_id', table_name='reports')
+    op.drop_index('ix_reports_user_id_created_at', table_name='reports')
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_constraint('fk_reports_user_id_users', type_='foreignkey')
+        batch_op.drop_column('user_id')
@@ -0,0 +1,40 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from monitoring.metrics import DB_POOL_CHECKED_OUT, DB_POOL_CONNECTS, DB_QUERY_DURATION, request_stats
+
+
+def _connect(dbapi_connection, connection_record):
+    DB_POOL_CONNECTS.inc()
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def _checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    # Занятость пула по публичным событиям: выданные соединения против pool_size + max_overflow
+    event.listen(engine.sync_engine.pool, "connect", _connect)
+    event.listen(engine.sync_engine.pool, "checkout", _checkout)
+    event.listen(engine.sync_engine.pool, "checkin", _checkin)
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,135 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+)
+AUTH_DURATION = Histogram(
+    "auth_duration_seconds",
+    "Время проверки access_token в get_current_user",
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Время выполнения одного SQL-запроса",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Количество SQL-запросов на один HTTP-запрос",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Суммарное время SQL-запросов на один HTTP-запрос",
+    ["route"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Соединения, выданные из пула и еще не возвращенные",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTS = Counter(
+    "db_pool_connects",
+    "Новые соединения с БД, открытые пулом",
+)
+KEYCLOAK_REQUEST_DURATION = Histogram(
+    "keycloak_request_duration_seconds",
+    "Время запросов в Keycloak",
+    ["operation", "outcome"],
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "ingest_queue_depth",
+    "Записи в очереди приема отчетов, ожидающие записи в БД",
+    multiprocess_mode="livesum",
+)
+INGEST_ITEMS = Counter(
+    "ingest_items",
+    "Записи приема отчетов по результату",
+    ["outcome"],
+)
+INGEST_BATCH_SIZE = Histogram(
+    "ingest_batch_size",
+    "Размер пачки записи принятых отчетов в БД",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+EXPORT_JOBS = Counter(
+    "export_jobs",
+    "Задания выгрузки отчетов по формату и результату",
+    ["format", "outcome"],
+)
+EXPORT_RENDER_DURATION = Histogram(
+    "export_render_duration_seconds",
+    "Время рендеринга выгрузки отчетов в процессе",
+    ["format"],
+    buckets=(0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+USER_SYNC_PENDING = Gauge(
+    "user_sync_pending",
+    "Профили пользователей, ожидающие записи в БД",
+    multiprocess_mode="livesum",
+)
+USER_SYNC_ITEMS = Counter(
+    "user_sync_items",
+    "Профили пользователей после логина по результату",
+    ["outcome"],
+)
+
+
+@contextmanager
+def track_keycloak(operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        KEYCLOAK_REQUEST_DURATION.labels(operation, outcome).observe(time.perf_counter() - started)
+
+
+class RequestStats:
+    """Счетчики SQL-запросов текущего HTTP-запроса (изменяются из событий SQLAlchemy) и его маршрут"""
+
+    __slots__ = ("queries", "db_time", "route")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.route: str | None = None
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class CacheStatsCollector:
+    """Экспорт hits/misses кешей, которые сами ведут счетчики"""
+
+    def __init__(self):
+        self._caches: dict[str, Callable[[], object]] = {}
+
+    def register(self, name: str, get_cache: Callable[[], object]) -> None:
+        self._caches[name] = get_cache
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Попадания в кеш", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Промахи кеша", labels=["cache"])
+        for name, get_cache in self._caches.items():
+            cache = get_cache()
+            if cache is None:
+                continue
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+        yield hits
+        yield misses
+
+
+cache_stats = CacheStatsCollector()
+REGISTRY.register(cache_stats)
@@ -0,0 +1,59 @@
+import time
+
+from fastapi import Request
+
+from monitoring.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST,
+    HTTP_REQUEST_DURATION,
+    RequestStats,
+    request_stats,
+)
+
+
+async def record_route(request: Request) -> None:
+    """
+    Зависимость приложения: сохраняет шаблон маршрута в RequestStats запроса.
+
+    Роутер записывает route в scope, который получил сам; middleware ниже MetricsMiddleware
+    (TokenRefreshMiddleware после refresh) передают дальше копию scope, и в scope
+    MetricsMiddleware маршрута уже нет. RequestStats общий для всего запроса.
+    """
+    stats = request_stats.get()
+    route = request.scope.get("route")
+    if stats is not None and route is not None:
+        stats.route = route.path
+
+
+class MetricsMiddleware:
+    """ASGI middleware: латентность по шаблону маршрута и число/время SQL-запросов на запрос"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_stats.reset(token)
+            # Шаблон пути, а не сам путь: иначе кардинальность меток не ограничена
+            route = stats.route or getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status_code)).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.db_time)
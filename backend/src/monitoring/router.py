@@ -0,0 +1,21 @@
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+
+from monitoring.metrics import cache_stats
+
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Метрики в текстовом формате Prometheus"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Несколько воркеров: гистограммы собираются из файлов всех процессов, кеши - текущего воркера
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(cache_stats)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
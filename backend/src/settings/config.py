@@ -14,10 +14,194 @@ class Settings(BaseSettings):
     KEYCLOAK_ADMIN_ROLE: str = Field(default='', alias='KEYCLOAK_ADMIN_ROLE')
     KEYCLOAK_PROTHETIC_USER_ROLE: str = Field(default='', alias='KEYCLOAK_PROTHETIC_USER_ROLE')
 
+    # Локальная проверка JWT по JWKS
+    KEYCLOAK_AUDIENCE: str = Field(default='', alias='KEYCLOAK_AUDIENCE')
+    KEYCLOAK_JWKS_TTL: int = Field(default=3600, alias='KEYCLOAK_JWKS_TTL')
+    KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL: int = Field(default=10, alias='KEYCLOAK_JWKS_MIN_REFRESH_INTERVAL')
+    KEYCLOAK_TOKEN_LEEWAY: int = Field(default=60, alias='KEYCLOAK_TOKEN_LEEWAY')
+    KEYCLOAK_TOKEN_CACHE_SIZE: int = Field(default=10000, alias='KEYCLOAK_TOKEN_CACHE_SIZE')
+
+    # Прозрачное обновление access_token по refresh_token (секунд до exp, когда начинается refresh)
+    TOKEN_REFRESH_ENABLED: bool = Field(default=True, alias='TOKEN_REFRESH_ENABLED')
+    TOKEN_REFRESH_BEFORE_EXPIRY: int = Field(default=60, alias='TOKEN_REFRESH_BEFORE_EXPIRY')
+    TOKEN_REFRESH_WAIT_TIMEOUT: float = Field(default=5.0, alias='TOKEN_REFRESH_WAIT_TIMEOUT')
+
+    # HTTP-соединения с Keycloak: пул keep-alive, таймауты, повторы и circuit breaker
+    KEYCLOAK_HTTP2: bool = Field(default=False, alias='KEYCLOAK_HTTP2')
+    KEYCLOAK_MAX_CONNECTIONS: int = Field(default=100, alias='KEYCLOAK_MAX_CONNECTIONS')
+    KEYCLOAK_MAX_KEEPALIVE_CONNECTIONS: int = Field(default=20, alias='KEYCLOAK_MAX_KEEPALIVE_CONNECTIONS')
+    KEYCLOAK_KEEPALIVE_EXPIRY: float = Field(default=30.0, alias='KEYCLOAK_KEEPALIVE_EXPIRY')
+    KEYCLOAK_CONNECT_TIMEOUT: float = Field(default=2.0, alias='KEYCLOAK_CONNECT_TIMEOUT')
+    KEYCLOAK_READ_TIMEOUT: float = Field(default=5.0, alias='KEYCLOAK_READ_TIMEOUT')
+    KEYCLOAK_POOL_TIMEOUT: float = Field(default=2.0, alias='KEYCLOAK_POOL_TIMEOUT')
+    KEYCLOAK_CALL_TIMEOUT: float = Field(default=10.0, alias='KEYCLOAK_CALL_TIMEOUT')
+    KEYCLOAK_RETRY_ATTEMPTS: int = Field(default=3, alias='KEYCLOAK_RETRY_ATTEMPTS')
+    KEYCLOAK_RETRY_BACKOFF_BASE: float = Field(default=0.1, alias='KEYCLOAK_RETRY_BACKOFF_BASE')
+    KEYCLOAK_RETRY_BACKOFF_MAX: float = Field(default=2.0, alias='KEYCLOAK_RETRY_BACKOFF_MAX')
+    KEYCLOAK_CIRCUIT_FAILURE_THRESHOLD: int = Field(default=5, alias='KEYCLOAK_CIRCUIT_FAILURE_THRESHOLD')
+    KEYCLOAK_CIRCUIT_RESET_TIMEOUT: float = Field(default=30.0, alias='KEYCLOAK_CIRCUIT_RESET_TIMEOUT')
+
+    REPORTS_STREAM_CHUNK_SIZE: int = Field(default=1000, alias='REPORTS_STREAM_CHUNK_SIZE')
+    # Конфигурация текстового поиска PostgreSQL (to_tsvector), должна совпадать с триггером из миграции
+    SEARCH_TEXT_CONFIG: str = Field(default='simple', alias='SEARCH_TEXT_CONFIG')
+    # Глубина страниц поиска (OFFSET): дальние страницы по релевантности дороги и почти не нужны
+    SEARCH_MAX_OFFSET: int = Field(default=1000, alias='SEARCH_MAX_OFFSET')
+
+    # Сжатие ответов (zstd и br - если установлены zstandard и brotli), ответы меньше порога не сжимаются
+    COMPRESSION_ENABLED: bool = Field(default=True, alias='COMPRESSION_ENABLED')
+    COMPRESSION_MIN_SIZE: int = Field(default=1024, alias='COMPRESSION_MIN_SIZE')
+    COMPRESSION_GZIP_LEVEL: int = Field(default=6, alias='COMPRESSION_GZIP_LEVEL')
+    COMPRESSION_BROTLI_QUALITY: int = Field(default=4, alias='COMPRESSION_BROTLI_QUALITY')
+    COMPRESSION_ZSTD_LEVEL: int = Field(default=3, alias='COMPRESSION_ZSTD_LEVEL')
+
+    # Прием отчетов: очередь в памяти процесса и запись в БД пачками
+    INGEST_QUEUE_SIZE: int = Field(default=10000, alias='INGEST_QUEUE_SIZE')
+    INGEST_BATCH_SIZE: int = Field(default=500, alias='INGEST_BATCH_SIZE')
+    INGEST_FLUSH_INTERVAL: float = Field(default=0.5, alias='INGEST_FLUSH_INTERVAL')
+    INGEST_MAX_ITEMS_PER_REQUEST: int = Field(default=5000, alias='INGEST_MAX_ITEMS_PER_REQUEST')
+    # Предел тела запроса приема: проверяется по Content-Length и при чтении, до разбора JSON
+    INGEST_MAX_BODY_BYTES: int = Field(default=16 * 1024 * 1024, alias='INGEST_MAX_BODY_BYTES')
+    INGEST_RETRY_AFTER: int = Field(default=1, alias='INGEST_RETRY_AFTER')
+    # Повторы записи пачки с экспоненциальной задержкой, затем - каталог dead letter (python -m ingest.reports --replay)
+    INGEST_WRITE_ATTEMPTS: int = Field(default=3, alias='INGEST_WRITE_ATTEMPTS')
+    INGEST_WRITE_BACKOFF: float = Field(default=0.5, alias='INGEST_WRITE_BACKOFF')
+    INGEST_DEAD_LETTER_DIR: str = Field(default='', alias='INGEST_DEAD_LETTER_DIR')
+
+    # Запись профилей пользователей после логина: фоновая очередь и известные пользователи в памяти процесса
+    USER_SYNC_QUEUE_SIZE: int = Field(default=10000, alias='USER_SYNC_QUEUE_SIZE')
+    USER_SYNC_BATCH_SIZE: int = Field(default=100, alias='USER_SYNC_BATCH_SIZE')
+    USER_SYNC_FLUSH_INTERVAL: float = Field(default=0.2, alias='USER_SYNC_FLUSH_INTERVAL')
+    USER_SYNC_KNOWN_SIZE: int = Field(default=100000, alias='USER_SYNC_KNOWN_SIZE')
+
+    # Период фонового обновления сводок отчетов в секундах (0 - только вручную: python -m db.summary)
+    SUMMARY_REFRESH_INTERVAL: float = Field(default=5.0, alias='SUMMARY_REFRESH_INTERVAL')
+    # Запас границы обновления сводок в секундах. updated_at - время начала транзакции (now() в PostgreSQL):
+    # транзакция, закоммиченная позже записей с большим updated_at, попадет в сводку, только если
+    # длилась меньше запаса. Должен быть больше самой долгой пишущей транзакции (WEB_TIMEOUT, запись пачек)
+    SUMMARY_WATERMARK_LOOKBACK: float = Field(default=120.0, alias='SUMMARY_WATERMARK_LOOKBACK')
+
+    # Выгрузки отчетов: процессы рендеринга на worker, очередь заданий, срок хранения файлов в секундах.
+    # EXPORT_PROCESSES_TOTAL > 0 - процессы рендеринга на хост, делятся на WEB_WORKERS (не меньше одного)
+    EXPORT_DIR: str = Field(default='', alias='EXPORT_DIR')
+    EXPORT_PROCESSES: int = Field(default=2, alias='EXPORT_PROCESSES')
+    EXPORT_PROCESSES_TOTAL: int = Field(default=0, alias='EXPORT_PROCESSES_TOTAL')
+    EXPORT_QUEUE_SIZE: int = Field(default=100, alias='EXPORT_QUEUE_SIZE')
+    EXPORT_CHUNK_SIZE: int = Field(default=1000, alias='EXPORT_CHUNK_SIZE')
+    EXPORT_MAX_ROWS: int = Field(default=100000, alias='EXPORT_MAX_ROWS')
+    EXPORT_TTL: int = Field(default=3600, alias='EXPORT_TTL')
+    EXPORT_CLEANUP_INTERVAL: float = Field(default=300, alias='EXPORT_CLEANUP_INTERVAL')
+    EXPORT_RETRY_AFTER: int = Field(default=5, alias='EXPORT_RETRY_AFTER')
+    # TTF-шрифт с кириллицей для PDF (стандартные шрифты PDF кириллицу не содержат)
+    EXPORT_PDF_FONT: str = Field(default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', alias='EXPORT_PDF_FONT')
+
+    # Кеш ответов: memory (LRU в процессе, только при одном worker-е), redis (общий, RESPONSE_CACHE_URL,
+    # нужен пакет redis) или none (выключен). Пусто - memory при WEB_WORKERS=1, иначе none
+    RESPONSE_CACHE_BACKEND: str = Field(default='', alias='RESPONSE_CACHE_BACKEND')
+    RESPONSE_CACHE_URL: str = Field(default='', alias='RESPONSE_CACHE_URL')
+    RESPONSE_CACHE_TTL: int = Field(default=60, alias='RESPONSE_CACHE_TTL')
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=1024, alias='RESPONSE_CACHE_MAX_ENTRIES')
+
+    # БД: sqlite+aiosqlite (по умолчанию) или postgresql+asyncpg
+    DATABASE_URL: str = Field(default='', alias='DATABASE_URL')
+    # Реплики для чтения через запятую, стратегия round_robin или least_connections
+    DATABASE_REPLICA_URLS: str = Field(default='', alias='DATABASE_REPLICA_URLS')
+    DB_REPLICA_STRATEGY: str = Field(default='round_robin', alias='DB_REPLICA_STRATEGY')
+    DB_READ_YOUR_WRITES_SECONDS: float = Field(default=5.0, alias='DB_READ_YOUR_WRITES_SECONDS')
+    # Ключ подписи cookie недавней записи (общий для всех worker-ов и подов); пусто - KEYCLOAK_CLIENT_SECRET
+    DB_READ_YOUR_WRITES_SECRET: str = Field(default='', alias='DB_READ_YOUR_WRITES_SECRET')
+
+    # Миграции в lifespan каждого воркера; false - только отдельной командой python -m db.migrations
+    RUN_MIGRATIONS_ON_STARTUP: bool = Field(default=True, alias='RUN_MIGRATIONS_ON_STARTUP')
+    # Владелец отчетов, созданных до появления reports.user_id (заполняется миграцией)
+    REPORTS_BACKFILL_USER_ID: str = Field(default='', alias='REPORTS_BACKFILL_USER_ID')
+
+    # Пул соединений БД на процесс; *_TOTAL > 0 - лимит на все воркеры, делится на WEB_WORKERS
+    DB_POOL_SIZE: int = Field(default=5, alias='DB_POOL_SIZE')
+    DB_MAX_OVERFLOW: int = Field(default=10, alias='DB_MAX_OVERFLOW')
+    DB_POOL_SIZE_TOTAL: int = Field(default=0, alias='DB_POOL_SIZE_TOTAL')
+    DB_MAX_OVERFLOW_TOTAL: int = Field(default=0, alias='DB_MAX_OVERFLOW_TOTAL')
+    DB_POOL_TIMEOUT: float = Field(default=30.0, alias='DB_POOL_TIMEOUT')
+    DB_POOL_RECYCLE: int = Field(default=1800, alias='DB_POOL_RECYCLE')
+    DB_POOL_PRE_PING: bool = Field(default=True, alias='DB_POOL_PRE_PING')
+    DB_STATEMENT_CACHE_SIZE: int = Field(default=500, alias='DB_STATEMENT_CACHE_SIZE')
+    DB_APPLICATION_NAME: str = Field(default='bionicpro-backend', alias='DB_APPLICATION_NAME')
+
+    # PRAGMA-профиль SQLite, применяется к каждому новому соединению
+    SQLITE_JOURNAL_MODE: str = Field(default='WAL', alias='SQLITE_JOURNAL_MODE')
+    SQLITE_SYNCHRONOUS: str = Field(default='NORMAL', alias='SQLITE_SYNCHRONOUS')
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000, alias='SQLITE_BUSY_TIMEOUT_MS')
+    SQLITE_CACHE_SIZE_KB: int = Field(default=65536, alias='SQLITE_CACHE_SIZE_KB')
+    SQLITE_MMAP_SIZE: int = Field(default=268435456, alias='SQLITE_MMAP_SIZE')
+
+    # Production-сервер (gunicorn.conf.py): WEB_WORKERS=0 - по числу CPU
+    WEB_HOST: str = Field(default='0.0.0.0', alias='WEB_HOST')
+    WEB_PORT: int = Field(default=8000, alias='WEB_PORT')
+    WEB_WORKERS: int = Field(default=1, alias='WEB_WORKERS')
+    WEB_PRELOAD: bool = Field(default=True, alias='WEB_PRELOAD')
+    WEB_MAX_REQUESTS: int = Field(default=10000, alias='WEB_MAX_REQUESTS')
+    WEB_MAX_REQUESTS_JITTER: int = Field(default=1000, alias='WEB_MAX_REQUESTS_JITTER')
+    WEB_TIMEOUT: int = Field(default=60, alias='WEB_TIMEOUT')
+    WEB_GRACEFUL_TIMEOUT: int = Field(default=30, alias='WEB_GRACEFUL_TIMEOUT')
+    WEB_KEEPALIVE: int = Field(default=5, alias='WEB_KEEPALIVE')
+
+    # Логирование: уровни и сэмплирование по модулям в формате "db.base=WARNING,auth=DEBUG" / "db.base=0.1"
+    LOG_LEVEL: str = Field(default='INFO', alias='LOG_LEVEL')
+    LOG_JSON: bool = Field(default=False, alias='LOG_JSON')
+    LOG_BATCHING: bool = Field(default=True, alias='LOG_BATCHING')
+    LOG_DIAGNOSE: bool = Field(default=False, alias='LOG_DIAGNOSE')
+    LOG_LEVELS: str = Field(default='', alias='LOG_LEVELS')
+    LOG_SAMPLING: str = Field(default='', alias='LOG_SAMPLING')
+
     @property
     def database_url(self) -> str:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"sqlite+aiosqlite:///{self.BASE_DIR}/backend-data/db.sqlite3"
 
+    @property
+    def ingest_dead_letter_dir(self) -> str:
+        return self.INGEST_DEAD_LETTER_DIR or f"{self.BASE_DIR}/backend-data/ingest-dead-letter"
+
+    @property
+    def export_dir(self) -> str:
+        return self.EXPORT_DIR or f"{self.BASE_DIR}/backend-data/exports"
+
+    @property
+    def export_processes(self) -> int:
+        if self.EXPORT_PROCESSES_TOTAL > 0:
+            return max(1, self.EXPORT_PROCESSES_TOTAL // self.web_workers)
+        return self.EXPORT_PROCESSES
+
+    @property
+    def web_workers(self) -> int:
+        return self.WEB_WORKERS or os.cpu_count() or 1
+
+    @property
+    def read_your_writes_secret(self) -> bytes:
+        return (self.DB_READ_YOUR_WRITES_SECRET or self.KEYCLOAK_CLIENT_SECRET).encode("utf-8")
+
+    @property
+    def response_cache_backend(self) -> str:
+        if self.RESPONSE_CACHE_BACKEND:
+            return self.RESPONSE_CACHE_BACKEND
+        return "memory" if self.web_workers == 1 else "none"
+
+    @property
+    def db_pool_size(self) -> int:
+        if self.DB_POOL_SIZE_TOTAL > 0:
+            return max(1, self.DB_POOL_SIZE_TOTAL // self.web_workers)
+        return self.DB_POOL_SIZE
+
+    @property
+    def db_max_overflow(self) -> int:
+        if self.DB_MAX_OVERFLOW_TOTAL > 0:
+            return self.DB_MAX_OVERFLOW_TOTAL // self.web_workers
+        return self.DB_MAX_OVERFLOW
+
+    @property
+    def database_replica_urls(self) -> list[str]:
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
     @property
     def token_url(self) -> str:
         return f"{self.KEYCLOAK_BASE_URL}/realms/{self.KEYCLOAK_REALM}/protocol/openid-connect/token"
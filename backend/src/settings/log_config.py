@@ -0,0 +1,122 @@
+import atexit
+import queue
+import random
+import sys
+import threading
+from typing import TextIO
+
+from loguru import logger
+
+from settings.config import Settings
+
+
+class BatchingSink:
+    """
+    Sink loguru, который только кладет строку в очередь.
+    Запись в поток идет пачками из отдельного потока, event loop не ждет stdout.
+    """
+
+    _STOP = object()
+
+    def __init__(self, stream: TextIO, max_batch: int = 512, flush_interval: float = 0.2):
+        self._stream = stream
+        self._max_batch = max_batch
+        self._flush_interval = flush_interval
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        # Дописать хвост очереди при завершении процесса
+        atexit.register(self.stop)
+
+    def write(self, message: str) -> None:
+        self._queue.put(message)
+
+    def stop(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self._flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self._max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is self._STOP:
+                batch.pop()
+                stopping = True
+            if batch:
+                self._stream.write("".join(batch))
+                self._stream.flush()
+
+
+def parse_mapping(value: str) -> dict[str, str]:
+    # "db.base=WARNING,auth=DEBUG" -> {"db.base": "WARNING", "auth": "DEBUG"}
+    result = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, _, option = item.partition("=")
+            result[name.strip()] = option.strip()
+    return result
+
+
+def build_filter(levels: dict[str, str], sampling: dict[str, float], default_level: str = "TRACE"):
+    """
+    Фильтр с уровнями и долей сэмплирования по имени модуля (ищется самый длинный префикс).
+    default_level - уровень модулей без своего уровня в levels.
+    """
+    level_nos = {name: logger.level(level.upper()).no for name, level in levels.items()}
+    default_no = logger.level(default_level.upper()).no
+    warning_no = logger.level("WARNING").no
+    resolved: dict[str, tuple[int, float]] = {}
+
+    def resolve(name: str) -> tuple[int, float]:
+        if name not in resolved:
+            def lookup(options: dict, default):
+                parts = name.split(".")
+                for i in range(len(parts), 0, -1):
+                    prefix = ".".join(parts[:i])
+                    if prefix in options:
+                        return options[prefix]
+                return default
+            resolved[name] = (lookup(level_nos, default_no), lookup(sampling, 1.0))
+        return resolved[name]
+
+    def _filter(record) -> bool:
+        min_level, rate = resolve(record["name"] or "")
+        level_no = record["level"].no
+        if level_no < min_level:
+            return False
+        # Ошибки и предупреждения не сэмплируются
+        return level_no >= warning_no or rate >= 1.0 or random.random() < rate
+
+    return _filter
+
+
+def setup_logging(settings: Settings) -> None:
+    """Настроить loguru из Settings: уровень, JSON-формат, пакетная запись, уровни и сэмплирование по модулям"""
+    logger.remove()
+    sink = BatchingSink(sys.stdout) if settings.LOG_BATCHING else sys.stdout
+    levels = parse_mapping(settings.LOG_LEVELS)
+    # loguru отбрасывает записи ниже уровня handler-а до вызова filter: уровень handler-а - самый
+    # подробный из LOG_LEVEL и LOG_LEVELS, а LOG_LEVEL применяется в фильтре к остальным модулям
+    handler_level = min(logger.level(level.upper()).no for level in [settings.LOG_LEVEL, *levels.values()])
+    logger.add(
+        sink,
+        level=handler_level,
+        serialize=settings.LOG_JSON,
+        backtrace=settings.LOG_DIAGNOSE,
+        diagnose=settings.LOG_DIAGNOSE,
+        enqueue=not settings.LOG_BATCHING,
+        filter=build_filter(
+            levels,
+            {name: float(rate) for name, rate in parse_mapping(settings.LOG_SAMPLING).items()},
+            default_level=settings.LOG_LEVEL,
+        ),
+    )
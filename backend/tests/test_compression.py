@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+from api.compression import CompressionMiddleware, parse_accept_encoding
+from api.responses import MSGPACK_MEDIA_TYPE, negotiated_response, render
+
+
+ROWS = [{"id": i, "title": f"Отчет {i}", "created_at": datetime(2026, 1, 1, 10, i % 60)} for i in range(200)]
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("br;q=1.0, gzip;q=0.8, *;q=0.1, x;q=bad") == {"br": 1.0, "gzip": 0.8, "*": 0.1, "x": 0.0}
+    assert parse_accept_encoding("") == {}
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip;q=0.5, br", "br"),
+        ("*;q=0.5, gzip", "gzip"),
+        ("identity", None),
+        ("gzip;q=0", None),
+    ],
+)
+def test_choose_encoding(accept_encoding, expected):
+    middleware = CompressionMiddleware(app=None)
+    if expected == "br" and "br" not in middleware.encodings:
+        pytest.skip("brotli не установлен")
+    assert middleware.choose_encoding(accept_encoding) == expected
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+
+    @app.get("/rows")
+    async def rows(request: Request):
+        return negotiated_response(request, {"rows": ROWS})
+
+    @app.get("/small")
+    async def small():
+        return {"status": "ok"}
+
+    @app.get("/etag")
+    async def etag():
+        return Response(render({"rows": ROWS}, "application/json"), media_type="application/json", headers={"ETag": '"v1"'})
+
+    @app.get("/binary")
+    async def binary():
+        return Response(b"\0" * 4096, media_type="application/octet-stream")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for row in ROWS:
+                yield render(row, "application/json") + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+async def get(app: FastAPI, path: str, **headers) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.get(path, headers=headers)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+async def test_large_json_is_compressed(app, encoding):
+    if encoding not in CompressionMiddleware(app=None).encodings:
+        pytest.skip(f"{encoding} не установлен")
+    response = await get(app, "/rows", **{"accept-encoding": encoding})
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    # httpx распаковывает тело: содержимое совпадает с несжатым
+    assert response.content == render({"rows": ROWS}, "application/json")
+    assert response.json()["rows"][1]["created_at"] == "2026-01-01T10:01:00"
+
+
+@pytest.mark.anyio
+async def test_small_and_binary_responses_are_not_compressed(app):
+    for path in ("/small", "/binary"):
+        response = await get(app, path, **{"accept-encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_compressed_etag_becomes_weak(app):
+    response = await get(app, "/etag", **{"accept-encoding": "gzip"})
+    assert response.headers["etag"] == 'W/"v1"'
+    response = await get(app, "/etag", **{"accept-encoding": "identity"})
+    assert response.headers["etag"] == '"v1"'
+
+
+@pytest.mark.anyio
+async def test_stream_is_compressed_by_chunks(app):
+    response = await get(app, "/stream", **{"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.text.splitlines()) == len(ROWS)
+
+
+@pytest.mark.anyio
+async def test_msgpack_negotiation(app):
+    msgpack = pytest.importorskip("msgpack")
+    response = await get(app, "/rows", accept=MSGPACK_MEDIA_TYPE, **{"accept-encoding": "identity"})
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert msgpack.unpackb(response.content)["rows"][0] == {"id": 0, "title": "Отчет 0", "created_at": "2026-01-01T10:00:00"}
@@ -0,0 +1,76 @@
+import pytest
+from pydantic import BaseModel
+
+from api.schemas import AddReport, AddUser, UserReportsFilter
+from db.dao import ReportsDAO, UsersDAO
+
+
+pytestmark = pytest.mark.anyio
+
+
+class ReportTitle(BaseModel):
+    title: str
+
+
+def user(user_id: str, **profile) -> AddUser:
+    return AddUser(id=user_id, email=f"{user_id}@example.com", preferred_username=user_id, **profile)
+
+
+async def test_upsert_many_inserts_and_updates(session_maker):
+    async with session_maker() as session:
+        dao = UsersDAO(session)
+        assert await dao.upsert_many([user("u1", name="Первый"), user("u2")]) == 2
+        # Поля со значениями по умолчанию тоже перезаписываются: набор колонок у всех строк один
+        assert await dao.upsert_many([user("u1"), user("u3", email_verified=True)]) == 2
+        await session.commit()
+
+    async with session_maker() as session:
+        rows = await UsersDAO(session).find_all_rows(None, columns=["id", "name", "email_verified"])
+        assert sorted(rows, key=lambda row: row["id"]) == [
+            {"id": "u1", "name": "", "email_verified": False},
+            {"id": "u2", "name": "", "email_verified": False},
+            {"id": "u3", "name": "", "email_verified": True},
+        ]
+
+
+async def test_upsert_many_in_chunks(session_maker):
+    async with session_maker() as session:
+        dao = UsersDAO(session)
+        dao.bulk_chunk_size = 7
+        assert await dao.upsert_many([user(f"u{i}") for i in range(30)]) == 30
+        assert await dao.upsert_many([]) == 0
+        await session.commit()
+        assert len(await dao.find_all_rows(None, columns=["id"])) == 30
+
+
+async def test_upsert_many_requires_same_columns(session_maker):
+    async with session_maker() as session:
+        with pytest.raises(ValueError, match="разный набор колонок"):
+            await UsersDAO(session).upsert_many([user("u1"), ReportTitle(title="x")])
+
+
+async def test_update_many_by_id(session_maker):
+    async with session_maker() as session:
+        dao = ReportsDAO(session)
+        await dao.add_many([AddReport(title=f"Отчет {i}", content="...") for i in range(3)])
+        await session.commit()
+        ids = [row["id"] for row in await dao.find_all_rows(None, columns=["id"])]
+        assert await dao.update_many_by_id({ids[0]: ReportTitle(title="Первый"), ids[2]: ReportTitle(title="Третий")}) == 2
+        await session.commit()
+
+    async with session_maker() as session:
+        rows = await ReportsDAO(session).find_all_rows(None, columns=["title"], limit=10)
+        assert [row["title"] for row in rows] == ["Первый", "Отчет 1", "Третий"]
+
+
+async def test_stream_rows_in_chunks(session_maker):
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([user("u1")])
+        await ReportsDAO(session).add_many([AddReport(title=f"Отчет {i}", content="...", user_id="u1") for i in range(5)])
+        await session.commit()
+        chunks = [
+            chunk
+            async for chunk in ReportsDAO(session).stream_rows(UserReportsFilter(user_id="u1"), ["title"], chunk_size=2)
+        ]
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert chunks[0][0] == {"title": "Отчет 0"}
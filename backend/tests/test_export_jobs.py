@@ -0,0 +1,91 @@
+import asyncio
+import csv
+import os
+import time
+
+import pytest
+
+from api.schemas import AddReport, AddUser
+from db.dao import ReportsDAO, UsersDAO
+from export.jobs import ExportJobManager
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def wait_finished(manager: ExportJobManager, job_id: str, user_id: str):
+    for _ in range(300):
+        job = await manager.get(job_id, user_id)
+        if job.status in ("done", "failed"):
+            return job
+        await asyncio.sleep(0.1)
+    raise AssertionError(f"Выгрузка {job_id} не завершилась")
+
+
+async def test_export_job_lifecycle(db_router, session_maker, tmp_path):
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([
+            AddUser(id=user_id, email=f"{user_id}@example.com", preferred_username=user_id) for user_id in ("u1", "u2")
+        ])
+        await ReportsDAO(session).add_many(
+            [AddReport(title=f"Отчет {i}", content="Сигнал", user_id="u1") for i in range(5)]
+            + [AddReport(title="Чужой", content="", user_id="u2")]
+        )
+        await session.commit()
+
+    manager = ExportJobManager(str(tmp_path / "exports"), processes=1, chunk_size=2, max_rows=3, cleanup_interval=0)
+    manager.start()
+    try:
+        job = await manager.submit("u1", "csv")
+        assert job.status == "queued"
+        job = await wait_finished(manager, job.id, "u1")
+    finally:
+        await manager.stop()
+
+    assert job.status == "done" and job.error is None
+    # max_rows ограничивает выгрузку, чтение идет чанками по chunk_size
+    assert job.rows == 3 and job.truncated
+    path = manager.result_path(job)
+    assert job.size == os.path.getsize(path)
+    with open(path, encoding="utf-8-sig", newline="") as result:
+        rows = list(csv.reader(result))
+    assert len(rows) == 4 and all(row[1].startswith("Отчет") for row in rows[1:])
+    # Спул удаляется после рендеринга
+    assert sorted(os.listdir(os.path.dirname(path))) == ["job.json", "reports.csv"]
+    assert manager.filename(job) == f"reports-{job.created_at:%Y%m%d-%H%M%S}.csv"
+
+    # Чужие и некорректные id не отличаются от несуществующих
+    assert await manager.get(job.id, "u2") is None
+    assert await manager.get("../" + job.id, "u1") is None
+
+
+async def test_queue_full_and_stop_fail_pending_jobs(tmp_path):
+    manager = ExportJobManager(str(tmp_path), queue_size=1, cleanup_interval=0)
+    job = await manager.submit("u1", "csv")
+    assert await manager.submit("u1", "csv") is None
+    # Не начатое задание помечается неуспешным при остановке
+    await manager.stop()
+    job = await manager.get(job.id, "u1")
+    assert job.status == "failed" and job.error == "Выгрузка прервана остановкой сервера"
+    assert len(os.listdir(tmp_path)) == 1
+
+
+async def test_cleanup_removes_expired_jobs(tmp_path):
+    manager = ExportJobManager(str(tmp_path), queue_size=10, ttl=60, cleanup_interval=0)
+    finished = await manager.submit("u1", "csv")
+    pending = await manager.submit("u1", "csv")
+    abandoned = await manager.submit("u1", "csv")
+    await manager._finish(finished)
+    (tmp_path / "not-a-job").mkdir()
+
+    def age(job_id: str, seconds: float) -> None:
+        path = os.path.join(tmp_path, job_id, "job.json")
+        os.utime(path, (time.time() - seconds,) * 2)
+
+    age(finished.id, 120)
+    age(pending.id, 120)
+    age(abandoned.id, 300)
+    assert manager.cleanup() == 2
+    # Незавершенное задание младше 4 * ttl остается, посторонние каталоги не трогаются
+    assert sorted(os.listdir(tmp_path)) == sorted([pending.id, "not-a-job"])
+    assert manager.cleanup() == 0
@@ -0,0 +1,123 @@
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+
+import ingest.reports
+from api.router import router
+from api.schemas import AddReport
+from auth.dependencies import check_prothetic_user
+from db.dao import ReportsDAO
+from ingest.reports import ReportIngestQueue, replay_dead_letters
+from settings.config import settings
+
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.offered = []
+
+    def offer(self, reports):
+        self.offered.extend(reports)
+        return True
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = RecordingQueue()
+    monkeypatch.setattr("api.router.report_ingest_queue", queue)
+    monkeypatch.setattr(settings, "INGEST_MAX_BODY_BYTES", 200)
+    return queue
+
+
+@pytest.fixture
+async def client(queue):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[check_prothetic_user] = lambda: {"sub": "u1"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def ndjson(count: int) -> bytes:
+    return b"".join(orjson.dumps({"title": f"Отчет {i}", "content": "...", "user_id": "чужой"}) + b"\n" for i in range(count))
+
+
+async def test_ingest_accepts_reports_of_token_owner(client, queue):
+    response = await client.post(
+        "/api/reports/ingest", content=ndjson(2), headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 202
+    assert response.json()["accepted"] == 2
+    assert [report.user_id for report in queue.offered] == ["u1", "u1"]
+
+
+async def test_ingest_rejects_large_content_length(client, queue):
+    response = await client.post(
+        "/api/reports/ingest", content=ndjson(10), headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 413
+    assert queue.offered == []
+
+
+async def test_ingest_rejects_large_chunked_body(client, queue):
+    async def chunks():
+        # Без Content-Length: предел проверяется по прочитанным байтам
+        for _ in range(10):
+            yield ndjson(1)
+
+    response = await client.post(
+        "/api/reports/ingest", content=chunks(), headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 413
+    assert queue.offered == []
+
+
+async def test_flush_retries_failed_batch(monkeypatch, tmp_path):
+    written = []
+    calls = 0
+
+    async def flaky_write(reports):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ConnectionError("БД недоступна")
+        written.extend(reports)
+
+    monkeypatch.setattr(ingest.reports, "write_reports", flaky_write)
+    queue = ReportIngestQueue(write_attempts=2, write_backoff=0, dead_letter_dir=str(tmp_path))
+    assert queue.offer([AddReport(title=f"Отчет {i}", content="...") for i in range(3)])
+    await queue.stop()
+    assert len(written) == 3
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_dead_letter_and_replay(db_router, session_maker, monkeypatch, tmp_path):
+    dead_letter_dir = tmp_path / "dead-letter"
+    write_reports = ingest.reports.write_reports
+
+    async def write_without_broken(reports):
+        if any(report.title == "Сломанный" for report in reports):
+            raise ValueError("Некорректный отчет")
+        await write_reports(reports)
+
+    monkeypatch.setattr(ingest.reports, "write_reports", write_without_broken)
+    queue = ReportIngestQueue(write_attempts=1, write_backoff=0, dead_letter_dir=str(dead_letter_dir))
+    titles = ["Первый", "Сломанный", "Третий", "Четвертый"]
+    assert queue.offer([AddReport(title=title, content="...") for title in titles])
+    await queue.stop()
+
+    # Корректные отчеты пачки записаны, некорректный - в dead letter
+    async with session_maker() as session:
+        rows = await ReportsDAO(session).find_all_rows(None, columns=["title"], limit=10)
+    assert sorted(row["title"] for row in rows) == ["Первый", "Третий", "Четвертый"]
+    assert len(list(dead_letter_dir.glob("*.ndjson"))) == 1
+
+    # Replay пишет отчеты из dead letter и удаляет файл
+    monkeypatch.setattr(ingest.reports, "write_reports", write_reports)
+    assert await replay_dead_letters(str(dead_letter_dir)) == (1, 0)
+    assert list(dead_letter_dir.iterdir()) == []
+    async with session_maker() as session:
+        assert len(await ReportsDAO(session).find_all_rows(None, columns=["id"], limit=10)) == 4
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+from jwcrypto import jwk, jwt
+
+from auth.jwks import InvalidTokenError, JWKSVerifier
+from fake_oidc import TokenSigner
+
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeJWKS:
+    """JWKS realm-а с подсчетом загрузок; ключи можно ротировать"""
+
+    def __init__(self, signer: TokenSigner):
+        self.signer = signer
+        self.fetches = 0
+
+    async def __call__(self) -> dict:
+        self.fetches += 1
+        return self.signer.jwks()
+
+
+@pytest.fixture
+def signer():
+    return TokenSigner(issuer="http://keycloak/realms/test", audience="reports-api")
+
+
+def sign(signer: TokenSigner, **claims) -> str:
+    now = int(time.time())
+    token = jwt.JWT(
+        header={"alg": "RS256", "kid": signer.key.kid},
+        claims={"sub": "u1", "aud": signer.audience, "iat": now, "exp": now + 300, **claims},
+    )
+    token.make_signed_token(signer.key)
+    return token.serialize()
+
+
+async def test_verify_returns_claims_and_caches_keys(signer):
+    fetch = FakeJWKS(signer)
+    verifier = JWKSVerifier(fetch, audience="reports-api")
+    for _ in range(3):
+        claims = await verifier.verify(signer.issue("u1", ["prothetic_user"]))
+        assert claims["sub"] == "u1"
+        assert claims["realm_access"]["roles"] == ["prothetic_user"]
+    assert fetch.fetches == 1
+
+
+async def test_unknown_kid_reloads_keys_after_rotation(signer):
+    fetch = FakeJWKS(signer)
+    verifier = JWKSVerifier(fetch, min_refresh_interval=0)
+    await verifier.verify(signer.issue("u1", []))
+    # Keycloak ротировал ключ: новый kid находится после перезагрузки JWKS
+    fetch.signer = rotated = TokenSigner(issuer=signer.issuer, audience=signer.audience)
+    claims = await verifier.verify(rotated.issue("u2", []))
+    assert claims["sub"] == "u2"
+    assert fetch.fetches == 2
+
+
+async def test_unknown_kid_reload_is_rate_limited(signer):
+    fetch = FakeJWKS(signer)
+    verifier = JWKSVerifier(fetch, min_refresh_interval=60)
+    await verifier.verify(signer.issue("u1", []))
+    stranger = TokenSigner(issuer=signer.issuer)
+    for _ in range(3):
+        with pytest.raises(InvalidTokenError, match="Unknown signing key"):
+            await verifier.verify(stranger.issue("u1", []))
+    assert fetch.fetches == 1
+
+
+async def test_keys_reloaded_after_ttl(signer):
+    fetch = FakeJWKS(signer)
+    verifier = JWKSVerifier(fetch, ttl=0)
+    await verifier.verify(signer.issue("u1", []))
+    await verifier.verify(signer.issue("u1", []))
+    assert fetch.fetches == 2
+
+
+@pytest.mark.parametrize(
+    "claims, error",
+    [
+        ({"exp": int(time.time()) - 3600}, "Expired"),
+        ({"aud": "another-client"}, "aud"),
+    ],
+)
+async def test_rejects_invalid_claims(signer, claims, error):
+    verifier = JWKSVerifier(FakeJWKS(signer), audience="reports-api", leeway=0)
+    with pytest.raises(InvalidTokenError, match=error):
+        await verifier.verify(sign(signer, **claims))
+
+
+async def test_rejects_foreign_signature(signer):
+    verifier = JWKSVerifier(FakeJWKS(signer))
+    forged = TokenSigner(issuer=signer.issuer)
+    # Подделка с kid настоящего ключа, но подписанная другим ключом
+    forged.key = jwk.JWK.generate(kty="RSA", size=2048, kid=signer.key.kid, alg="RS256")
+    with pytest.raises(InvalidTokenError):
+        await verifier.verify(forged.issue("u1", []))
+
+
+async def test_rejects_malformed_token(signer):
+    verifier = JWKSVerifier(FakeJWKS(signer))
+    with pytest.raises(InvalidTokenError, match="Malformed"):
+        await verifier.verify("not-a-jwt")
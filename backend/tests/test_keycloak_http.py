@@ -0,0 +1,183 @@
+import asyncio
+
+import httpx
+import pytest
+from keycloak import KeycloakError, KeycloakOpenID
+
+from auth.keycloak_http import CircuitBreaker, CircuitOpenError, KeycloakCaller
+from fake_oidc import TokenSigner, create_fake_oidc_app
+
+
+pytestmark = pytest.mark.anyio
+
+REALM = "test"
+
+
+class MockKeycloak(httpx.AsyncBaseTransport):
+    """
+    Keycloak для тестов (token endpoint и JWKS из fake_oidc) с внедрением сбоев:
+    failures - статусы ответов на следующие запросы, down - соединение не устанавливается
+    """
+
+    def __init__(self):
+        self.signer = TokenSigner(issuer=f"http://keycloak/realms/{REALM}")
+        self._app = httpx.ASGITransport(app=create_fake_oidc_app(REALM, self.signer))
+        self.failures: list[int] = []
+        self.down = False
+        self.requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.down:
+            raise httpx.ConnectError("Connection refused", request=request)
+        self.requests += 1
+        if self.failures:
+            return httpx.Response(self.failures.pop(0), json={"error": "unavailable"}, request=request)
+        return await self._app.handle_async_request(request)
+
+
+@pytest.fixture
+def keycloak():
+    return MockKeycloak()
+
+
+@pytest.fixture
+async def client(keycloak):
+    client = KeycloakOpenID(
+        server_url="http://keycloak",
+        realm_name=REALM,
+        client_id="reports-api",
+        client_secret_key="secret",
+    )
+    await client.connection.async_s.aclose()
+    client.connection.async_s = httpx.AsyncClient(transport=keycloak)
+    yield client
+    await client.connection.aclose()
+
+
+def make_caller(failure_threshold: int = 5, reset_timeout: float = 30.0, **kwargs) -> KeycloakCaller:
+    breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+    return KeycloakCaller(breaker, backoff_base=0, backoff_max=0, **kwargs)
+
+
+def exchange_code(client: KeycloakOpenID):
+    return lambda: client.a_token(grant_type="authorization_code", code="u1:prothetic_user", redirect_uri="http://app")
+
+
+async def test_transient_errors_are_retried(client, keycloak):
+    keycloak.failures = [503, 502]
+    caller = make_caller(attempts=3)
+    certs = await caller.call("certs", client.a_certs)
+    assert certs == keycloak.signer.jwks()
+    assert keycloak.requests == 3
+    assert caller.breaker.state == "closed"
+
+
+async def test_retries_stop_after_attempts(client, keycloak):
+    keycloak.failures = [503] * 5
+    caller = make_caller(attempts=3)
+    with pytest.raises(KeycloakError) as error:
+        await caller.call("certs", client.a_certs)
+    assert error.value.response_code == 503
+    assert keycloak.requests == 3
+
+
+async def test_client_errors_are_not_retried(client, keycloak):
+    caller = make_caller(failure_threshold=1)
+    with pytest.raises(KeycloakError) as error:
+        await caller.call("token", lambda: client.a_token(grant_type="password", username="u1", password="x"))
+    assert error.value.response_code == 400
+    assert keycloak.requests == 1
+    # Ответ 4xx - Keycloak доступен
+    assert caller.breaker.state == "closed"
+
+
+async def test_sent_non_idempotent_call_is_not_retried(client, keycloak):
+    keycloak.failures = [503]
+    caller = make_caller(attempts=3)
+    with pytest.raises(KeycloakError):
+        await caller.call("token", exchange_code(client), idempotent=False)
+    assert keycloak.requests == 1
+
+
+async def test_unsent_non_idempotent_call_is_retried(client, keycloak):
+    keycloak.down = True
+    caller = make_caller(attempts=3)
+    calls = 0
+
+    async def exchange():
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            keycloak.down = False
+        return await exchange_code(client)()
+
+    tokens = await caller.call("token", exchange, idempotent=False)
+    assert tokens["access_token"]
+    assert calls == 2
+
+
+async def test_breaker_opens_and_recovers(client, keycloak):
+    keycloak.down = True
+    caller = make_caller(failure_threshold=2, reset_timeout=0.05, attempts=1)
+    for _ in range(2):
+        with pytest.raises(KeycloakError):
+            await caller.call("certs", client.a_certs)
+    assert caller.breaker.state == "open"
+    # Открытый breaker отклоняет вызовы без запросов в Keycloak
+    keycloak.down = False
+    with pytest.raises(CircuitOpenError):
+        await caller.call("certs", client.a_certs)
+    assert keycloak.requests == 0
+
+    await asyncio.sleep(0.06)
+    assert caller.breaker.state == "half_open"
+    await caller.call("certs", client.a_certs)
+    assert caller.breaker.state == "closed"
+    assert keycloak.requests == 1
+
+
+async def test_failed_trial_reopens_breaker(client, keycloak):
+    keycloak.failures = [503]
+    caller = make_caller(failure_threshold=1, reset_timeout=0.05, attempts=3)
+    with pytest.raises(KeycloakError):
+        await caller.call("certs", client.a_certs)
+    await asyncio.sleep(0.06)
+    keycloak.failures = [503]
+    with pytest.raises(KeycloakError):
+        await caller.call("certs", client.a_certs)
+    assert caller.breaker.state == "open"
+    assert keycloak.requests == 2
+
+
+async def test_deadline_counts_as_failure():
+    caller = make_caller(failure_threshold=1, call_timeout=0.05)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await caller.call("certs", hang)
+    assert caller.breaker.state == "open"
+
+
+async def test_cancellation_is_not_a_failure(client, keycloak):
+    caller = make_caller(failure_threshold=1, reset_timeout=0.05)
+    keycloak.down = True
+    with pytest.raises(KeycloakError):
+        await caller.call("certs", client.a_certs)
+    await asyncio.sleep(0.06)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    # Клиент отключился во время пробного запроса half-open: breaker не открывается снова
+    task = asyncio.create_task(caller.call("certs", hang))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert caller.breaker.state == "half_open"
+
+    keycloak.down = False
+    await caller.call("certs", client.a_certs)
+    assert caller.breaker.state == "closed"
@@ -0,0 +1,54 @@
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+
+from db.database import build_engine
+from monitoring.middleware import MetricsMiddleware, record_route
+
+
+pytestmark = pytest.mark.anyio
+
+
+class ScopeCopyMiddleware:
+    """Как TokenRefreshMiddleware после refresh: передает дальше копию scope"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app({**scope}, receive, send)
+
+
+def duration_count(route: str) -> float:
+    labels = {"method": "GET", "route": route, "status": "200"}
+    return REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0.0
+
+
+async def test_route_label_survives_scope_copy():
+    app = FastAPI(dependencies=[Depends(record_route)])
+
+    @app.get("/metrics-test/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(ScopeCopyMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
+    before = duration_count("/metrics-test/{item_id}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/metrics-test/1")).status_code == 200
+        assert (await client.get("/metrics-test/2")).status_code == 200
+    assert duration_count("/metrics-test/{item_id}") == before + 2
+
+
+async def test_pool_checked_out_gauge(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path}/pool.sqlite3")
+    before = REGISTRY.get_sample_value("db_pool_checked_out")
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+        assert REGISTRY.get_sample_value("db_pool_checked_out") == before + 1
+    assert REGISTRY.get_sample_value("db_pool_checked_out") == before
+    assert REGISTRY.get_sample_value("db_pool_connects_total") >= 1
+    await engine.dispose()
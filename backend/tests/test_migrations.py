@@ -0,0 +1,85 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import delete, insert, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from api.schemas import AddReport, AddUser
+from db.dao import ReportsDAO, UsersDAO
+from db.database import Base, build_engine
+from db.migrations import current_heads, run_migrations, script_heads, upgrade_connection
+from db.models import Report, User
+from db.search import include_object
+from settings.config import settings
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_migrations_reach_head_and_match_models(session_maker):
+    async with session_maker() as session:
+        connection = await session.connection()
+
+        def check(sync_connection):
+            context = MigrationContext.configure(sync_connection, opts={"include_object": include_object})
+            assert frozenset(context.get_current_heads()) == script_heads()
+            # Схема после цепочки миграций совпадает с моделями (autogenerate не нашел бы изменений)
+            return compare_metadata(context, Base.metadata)
+
+        assert await connection.run_sync(check) == []
+        tables = await connection.run_sync(lambda sync_connection: inspect(sync_connection).get_table_names())
+        assert {"users", "reports", "report_daily_summaries", "summary_watermarks"} <= set(tables)
+
+
+async def test_report_owner_foreign_key(session_maker):
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([AddUser(id="u1", preferred_username="u1")])
+        await ReportsDAO(session).add_many([AddReport(title="Отчет", content="...", user_id="u1")])
+        await session.commit()
+        # Отчет неизвестного пользователя не вставляется (в SQLite - PRAGMA foreign_keys=ON)
+        with pytest.raises(IntegrityError):
+            await session.execute(insert(Report).values(title="Чужой", content="...", user_id="missing"))
+        await session.rollback()
+
+        await session.execute(delete(User).where(User.id == "u1"))
+        await session.commit()
+        assert await session.scalar(select(Report.user_id)) is None
+
+
+async def test_sqlite_batch_migration_keeps_report_owners(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path}/upgrade.sqlite3"
+    migration_engine = create_async_engine(url, poolclass=NullPool)
+    async with migration_engine.begin() as connection:
+        await upgrade_connection(connection, "054aee18c009")
+        await connection.execute(text(
+            "INSERT INTO users (id, email, email_verified, name, preferred_username, given_name, family_name) "
+            "VALUES ('u1', 'u1@example.com', 0, '', 'u1', '', '')"
+        ))
+        await connection.execute(text("INSERT INTO reports (title, content, user_id) VALUES ('Отчет', '...', 'u1')"))
+    await migration_engine.dispose()
+
+    # Соединение приложения с PRAGMA foreign_keys=ON: пересоздание users не должно обнулить владельцев
+    engine = build_engine(url)
+    async with engine.begin() as connection:
+        await upgrade_connection(connection)
+    await engine.dispose()
+    engine = build_engine(url)
+    async with engine.connect() as connection:
+        assert (await connection.execute(text("SELECT user_id FROM reports"))).scalar() == "u1"
+        assert (await connection.execute(text("PRAGMA foreign_keys"))).scalar() == 1
+    await engine.dispose()
+
+
+async def test_standalone_sqlite_migrations_are_committed(tmp_path, monkeypatch):
+    # python -m db.migrations: движок Alembic из настроек, без внешней транзакции
+    url = f"sqlite+aiosqlite:///{tmp_path}/standalone.sqlite3"
+    monkeypatch.setattr(settings, "DATABASE_URL", url)
+    await run_migrations(force=True)
+    engine = create_async_engine(url, poolclass=NullPool)
+    assert await current_heads(engine) == script_heads()
+    async with engine.connect() as connection:
+        tables = await connection.run_sync(lambda sync_connection: inspect(sync_connection).get_table_names())
+    assert {"users", "reports", "summary_watermarks"} <= set(tables)
+    await engine.dispose()
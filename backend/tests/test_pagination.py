@@ -0,0 +1,51 @@
+import pytest
+
+from api.schemas import AddReport, AddUser, UserReportsFilter
+from db.dao import ReportsDAO, UsersDAO
+from db.pagination import decode_cursor, encode_cursor, next_cursor
+
+
+@pytest.mark.parametrize("record_id", [0, 42, 2**53, "0b6c4a1e-2f7d", "отчет"])
+def test_cursor_round_trip(record_id):
+    cursor = encode_cursor(record_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == record_id
+
+
+@pytest.mark.parametrize("cursor", ["", "%%%", "bm90IGpzb24", "W10", "W251bGxd", "WzEsMl0"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_next_cursor_only_for_full_page():
+    assert next_cursor([{"id": 1}, {"id": 2}], limit=2) == encode_cursor(2)
+    assert next_cursor([{"id": 1}], limit=2) is None
+    assert next_cursor([], limit=0) is None
+
+
+@pytest.mark.anyio
+async def test_pages_cover_all_rows_once(session_maker):
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([AddUser(id="u1", email="u1@example.com", preferred_username="u1")])
+        await ReportsDAO(session).add_many(
+            [AddReport(title=f"Отчет {i}", content="...", user_id="u1" if i % 3 else None) for i in range(25)]
+        )
+        await session.commit()
+
+    async with session_maker() as session:
+        dao = ReportsDAO(session)
+        ids, cursor = [], None
+        while True:
+            rows = await dao.find_all_rows(UserReportsFilter(user_id="u1"), columns=["id"], limit=4, cursor=cursor)
+            ids += [row["id"] for row in rows]
+            cursor = next_cursor(rows, 4)
+            if cursor is None:
+                break
+        expected = await dao.find_all_rows(UserReportsFilter(user_id="u1"), columns=["id"])
+        assert ids == sorted(row["id"] for row in expected)
+        assert len(ids) == 16
+
+        # Страницы ORM-объектов и строк совпадают
+        records = await dao.find_all(UserReportsFilter(user_id="u1"), limit=4, cursor=encode_cursor(ids[3]))
+        assert [record.id for record in records] == ids[4:8]
@@ -0,0 +1,64 @@
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from auth.dependencies import get_current_user, requires
+from auth.permissions import Principal, compile_roles
+
+
+CLAIMS = {
+    "sub": "u1",
+    "realm_access": {"roles": ["prothetic_user", "offline_access"]},
+    "resource_access": {"reports-api": {"roles": ["export"]}, "account": {"roles": ["view-profile"]}},
+}
+
+
+def test_compile_roles():
+    assert compile_roles(CLAIMS) == {"prothetic_user", "offline_access", "reports-api:export", "account:view-profile"}
+    assert compile_roles({"sub": "u1"}) == frozenset()
+
+
+def test_principal_copy_keeps_compiled_roles():
+    principal = Principal(CLAIMS)
+    copy = principal.copy()
+    assert copy == principal and copy is not principal
+    assert copy.roles is principal.roles
+
+
+def test_unknown_match_mode():
+    with pytest.raises(ValueError, match="Unknown match mode"):
+        requires(["administrator"], match="some")
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    checks = {
+        "all": requires(["prothetic_user", "offline_access"]),
+        "all-missing": requires(["prothetic_user", "administrator"]),
+        "any": requires(["administrator", "prothetic_user"], match="any"),
+        "client": requires(["export"], client="reports-api"),
+        "other-client": requires(["export"], client="account"),
+    }
+    for name, check in checks.items():
+        app.add_api_route(f"/{name}", lambda user=Depends(check): {"sub": user["sub"]})
+    return app
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "path, status",
+    [("/all", 200), ("/all-missing", 403), ("/any", 200), ("/client", 200), ("/other-client", 403)],
+)
+async def test_requires(app, path, status):
+    app.dependency_overrides[get_current_user] = lambda: Principal(CLAIMS)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get(path)).status_code == status
+
+
+@pytest.mark.anyio
+async def test_requires_token(app):
+    # Без cookie access_token Keycloak не вызывается
+    app.state.keycloak_client = None
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/any")).status_code == 401
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from api.schemas import AddUser
+from db.dao import ReportsDAO, UsersDAO
+from db.models import Report
+from db.query import MAX_IN_VALUES, Condition, DateRange, OrderBy, QueryCompiler, QuerySpec, QuerySpecError
+
+
+def compile_sql(spec: QuerySpec) -> str:
+    query = QueryCompiler(Report, ReportsDAO.indexed_columns).select(spec)
+    return " ".join(str(query).split())
+
+
+@pytest.mark.parametrize(
+    "spec, error",
+    [
+        (QuerySpec(where=[Condition(field="missing", value=1)]), "Неизвестная колонка"),
+        (QuerySpec(where=[Condition(field="title", value="x")]), "не индексирована"),
+        (QuerySpec(order_by=[OrderBy(field="content")]), "не индексирована"),
+        (QuerySpec(columns=["id", "missing"]), "Неизвестные колонки"),
+        (QuerySpec(where=[Condition(field="id", value="abc")]), "Некорректное значение"),
+        (QuerySpec(where=[Condition(field="id", op="gt")]), "нужно значение"),
+        (QuerySpec(where=[Condition(field="id", op="in", value=[])]), "нужен список"),
+        (QuerySpec(where=[Condition(field="id", op="in", value=list(range(MAX_IN_VALUES + 1)))]), "нужен список"),
+    ],
+)
+def test_invalid_spec(spec, error):
+    with pytest.raises(QuerySpecError, match=error):
+        compile_sql(spec)
+
+
+def test_order_falls_back_to_primary_key():
+    sql = compile_sql(QuerySpec(order_by=[OrderBy(field="created_at", desc=True)], limit=10, offset=20))
+    assert "ORDER BY reports.created_at DESC, reports.id LIMIT :param_1 OFFSET :param_2" in sql
+    # Сортировка уже по первичному ключу - id не добавляется второй раз
+    sql = compile_sql(QuerySpec(order_by=[OrderBy(field="id", desc=True)]))
+    assert "ORDER BY reports.id DESC LIMIT" in sql
+
+
+@pytest.mark.anyio
+async def test_find_and_count_by_spec(session_maker):
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([
+            AddUser(id=user_id, email=f"{user_id}@example.com", preferred_username=user_id) for user_id in ("u1", "u2")
+        ])
+        await session.execute(insert(Report), [
+            {
+                "title": f"Отчет {day}",
+                "content": "...",
+                "user_id": "u1" if day % 2 else "u2",
+                "created_at": datetime(2026, 1, day, 12),
+                "updated_at": datetime(2026, 1, day, 12),
+            }
+            for day in range(1, 11)
+        ])
+        await session.commit()
+
+    async with session_maker() as session:
+        dao = ReportsDAO(session)
+        spec = QuerySpec(
+            where=[Condition(field="user_id", op="in", value=["u1"])],
+            ranges=[DateRange(start=datetime(2026, 1, 3), end=datetime(2026, 1, 8))],
+            order_by=[OrderBy(field="created_at", desc=True)],
+            columns=["title", "user_id"],
+        )
+        rows = await dao.find_by_spec(spec)
+        assert rows == [
+            {"title": "Отчет 7", "user_id": "u1"},
+            {"title": "Отчет 5", "user_id": "u1"},
+            {"title": "Отчет 3", "user_id": "u1"},
+        ]
+        assert await dao.count_by_spec(spec) == 3
+
+        # Граница диапазона - полуинтервал [start, end)
+        day_range = QuerySpec(ranges=[DateRange(start=datetime(2026, 1, 2, 12), end=datetime(2026, 1, 4, 12))])
+        assert await dao.count_by_spec(day_range) == 2
+
+        page = await dao.find_by_spec(QuerySpec(where=[Condition(field="id", op="ge", value="2")], limit=3, offset=1))
+        assert [row["id"] for row in page] == [3, 4, 5]
+
+        no_owner = QuerySpec(where=[Condition(field="user_id", op="is_null")])
+        assert await dao.count_by_spec(no_owner) == 0
@@ -0,0 +1,111 @@
+import base64
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.router import router
+from api.schemas import AddUser
+from auth.dependencies import check_prothetic_user
+from cache.backends import NullBackend
+from cache.response_cache import ResponseCache
+from db.dao import UsersDAO
+from db.database import build_engine
+from db.dependencies import WRITE_MARKER_COOKIE
+from db.migrations import upgrade_connection
+from db.routing import SessionRouter
+from ingest.reports import ReportIngestQueue
+
+
+pytestmark = pytest.mark.anyio
+
+
+def access_token(sub: str) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"sub": sub}).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+@pytest.fixture
+async def replica(tmp_path):
+    # Реплика, которая еще не получила записи primary
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.sqlite3")
+    async with engine.begin() as connection:
+        await upgrade_connection(connection)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def new_worker(session_maker, replica, use_session_router):
+    """SessionRouter с репликой и без меток записей - как в другом worker-е"""
+    return lambda: use_session_router(SessionRouter(primary=session_maker.kw["bind"], replicas=[replica]))
+
+
+@pytest.fixture
+async def client(monkeypatch, session_maker):
+    for module in ("api.router", "db.base", "ingest.reports", "db.dependencies"):
+        monkeypatch.setattr(f"{module}.response_cache", ResponseCache(NullBackend()))
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([AddUser(id="u1", email="u1@example.com", preferred_username="u1")])
+        await session.commit()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[check_prothetic_user] = lambda: {"sub": "u1"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://test") as client:
+        client.cookies.set("access_token", access_token("u1"))
+        yield client
+
+
+async def report_titles(client, **params) -> list[str]:
+    response = await client.get("/api/reports", params=params)
+    assert response.status_code == 200
+    if params.get("stream"):
+        return [json.loads(line)["title"] for line in response.text.splitlines()]
+    return [report["title"] for report in response.json()["reports"]]
+
+
+async def test_read_after_write_goes_to_primary(client, new_worker, monkeypatch):
+    new_worker()
+    queue = ReportIngestQueue()
+    monkeypatch.setattr("api.router.report_ingest_queue", queue)
+    response = await client.post(
+        "/api/reports/ingest",
+        json={"title": "Новый", "content": "..."},
+    )
+    assert response.status_code == 202
+    assert WRITE_MARKER_COOKIE in response.cookies
+    await queue.stop()
+
+    # Тот же worker: метка в памяти процесса
+    assert await report_titles(client) == ["Новый"]
+
+    # Другой worker: метку приносит cookie
+    new_worker()
+    assert await report_titles(client) == ["Новый"]
+    new_worker()
+    assert await report_titles(client, stream="true") == ["Новый"]
+
+    # Без cookie чтение идет в реплику, которая еще отстает
+    client.cookies.delete(WRITE_MARKER_COOKIE)
+    new_worker()
+    assert await report_titles(client) == []
+
+
+async def test_forged_marker_is_ignored(client, new_worker):
+    new_worker()
+    client.cookies.set(WRITE_MARKER_COOKIE, "9999999999.forged")
+    assert await report_titles(client) == []
+
+
+async def test_marker_of_other_user_is_ignored(client, new_worker, monkeypatch):
+    new_worker()
+    queue = ReportIngestQueue()
+    monkeypatch.setattr("api.router.report_ingest_queue", queue)
+    await client.post("/api/reports/ingest", json={"title": "Новый", "content": "..."})
+    await queue.stop()
+    # Cookie подписана для sub u1: с access_token другого пользователя она не действует
+    client.cookies.set("access_token", access_token("u2"))
+    new_worker()
+    assert await report_titles(client) == []
@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from auth.refresh import TokenRefreshMiddleware, token_expires_at, unverified_claims
+
+
+pytestmark = pytest.mark.anyio
+
+
+def token(sub: str, ttl: float) -> str:
+    payload = json.dumps({"sub": sub, "exp": int(time.time() + ttl)}).encode()
+    return f"header.{base64.urlsafe_b64encode(payload).decode().rstrip('=')}.signature"
+
+
+class FakeKeycloak:
+    """refresh с подсчетом вызовов; новый access_token живет час"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def refresh(self, refresh_token: str) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("Session not active")
+        return {"access_token": token("u1", 3600), "refresh_token": f"{refresh_token}-next", "expires_in": 3600}
+
+
+def create_app(keycloak: FakeKeycloak) -> FastAPI:
+    app = FastAPI()
+    app.state.keycloak_client = keycloak
+
+    @app.get("/api/whoami")
+    async def whoami(request: Request):
+        # Токен, с которым обрабатывается запрос
+        return {"access_token": request.cookies.get("access_token")}
+
+    @app.get("/api/logout")
+    async def logout(request: Request):
+        return {"access_token": request.cookies.get("access_token")}
+
+    app.add_middleware(TokenRefreshMiddleware, refresh_before=60, wait_timeout=1.0)
+    return app
+
+
+async def get(app: FastAPI, path: str, cookies: dict) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://test", cookies=cookies) as client:
+        return await client.get(path)
+
+
+def test_unverified_claims():
+    assert token_expires_at(token("u1", 100)) == pytest.approx(time.time() + 100, abs=2)
+    assert unverified_claims("not-a-jwt") == {}
+    assert token_expires_at("a.!!!.c") is None
+
+
+async def test_expired_token_is_refreshed_before_request():
+    keycloak = FakeKeycloak()
+    app = create_app(keycloak)
+    response = await get(app, "/api/whoami", {"access_token": token("u1", -10), "refresh_token": "r1"})
+    new_token = response.cookies["access_token"]
+    assert response.json()["access_token"] == new_token
+    assert response.cookies["refresh_token"] == "r1-next"
+    assert keycloak.calls == 1
+
+
+async def test_concurrent_requests_share_one_refresh():
+    keycloak = FakeKeycloak(delay=0.05)
+    app = create_app(keycloak)
+    cookies = {"access_token": token("u1", -10), "refresh_token": "r1"}
+    responses = await asyncio.gather(*(get(app, "/api/whoami", cookies) for _ in range(5)))
+    assert keycloak.calls == 1
+    assert len({response.json()["access_token"] for response in responses}) == 1
+
+
+async def test_valid_token_is_not_refreshed():
+    keycloak = FakeKeycloak()
+    app = create_app(keycloak)
+    current = token("u1", 3600)
+    response = await get(app, "/api/whoami", {"access_token": current, "refresh_token": "r1"})
+    assert response.json()["access_token"] == current
+    assert "access_token" not in response.cookies
+    assert keycloak.calls == 0
+
+
+async def test_expiring_token_is_refreshed_in_background():
+    keycloak = FakeKeycloak(delay=0.05)
+    app = create_app(keycloak)
+    cookies = {"access_token": token("u1", 30), "refresh_token": "r1"}
+    # Запрос не ждет refresh и обрабатывается с текущим токеном
+    response = await get(app, "/api/whoami", cookies)
+    assert response.json()["access_token"] == cookies["access_token"]
+    await asyncio.sleep(0.1)
+    # Следующий запрос со старыми cookie получает результат того же refresh
+    response = await get(app, "/api/whoami", cookies)
+    assert response.cookies["refresh_token"] == "r1-next"
+    assert keycloak.calls == 1
+
+
+async def test_failed_refresh_keeps_request_and_cookies():
+    keycloak = FakeKeycloak(fail=True)
+    app = create_app(keycloak)
+    expired = token("u1", -10)
+    response = await get(app, "/api/whoami", {"access_token": expired, "refresh_token": "r1"})
+    # Дальше обычная проверка токена (401 и вход), cookie не меняются
+    assert response.json()["access_token"] == expired
+    assert "access_token" not in response.cookies
+
+
+async def test_excluded_paths_are_not_refreshed():
+    keycloak = FakeKeycloak()
+    app = create_app(keycloak)
+    await get(app, "/api/logout", {"access_token": token("u1", -10), "refresh_token": "r1"})
+    assert keycloak.calls == 0
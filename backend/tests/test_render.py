@@ -0,0 +1,103 @@
+import csv
+import os
+
+import orjson
+import pytest
+
+from export.render import COLUMNS, XLSX_CELL_LIMIT, available_formats, csv_value, render
+
+
+ROWS = [
+    {
+        "id": 1,
+        "title": "Отчет <1> & ко",
+        "content": "Сигнал\nмиографии",
+        "created_at": "2026-01-01T10:00:00",
+        "updated_at": "2026-01-01T10:05:00",
+    },
+    {
+        "id": 2,
+        "title": "=HYPERLINK(\"http://evil\",\"x\")",
+        "content": "@SUM(A1:A2)",
+        "created_at": "2026-01-02T10:00:00",
+        "updated_at": "2026-01-02T10:00:00",
+    },
+    {
+        "id": 3,
+        "title": "-1+1",
+        "content": "x" * (XLSX_CELL_LIMIT + 10) + "\x07",
+        "created_at": "2026-01-03T10:00:00",
+        "updated_at": "2026-01-03T10:00:00",
+    },
+]
+
+
+@pytest.fixture
+def spool(tmp_path):
+    path = tmp_path / "rows.ndjson"
+    path.write_bytes(b"".join(orjson.dumps(row) + b"\n" for row in ROWS))
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("=1+1", "'=1+1"),
+        ("+7 900", "'+7 900"),
+        ("-5", "'-5"),
+        ("@cmd", "'@cmd"),
+        ("\t=1", "'\t=1"),
+        ("Отчет = итог", "Отчет = итог"),
+        (5, 5),
+    ],
+)
+def test_csv_value_neutralises_formulas(value, expected):
+    assert csv_value(value) == expected
+
+
+def test_render_csv(spool, tmp_path):
+    output = str(tmp_path / "reports.csv")
+    size = render("csv", spool, output)
+    assert size == os.path.getsize(output)
+    assert not os.path.exists(f"{output}.part")
+    with open(output, encoding="utf-8-sig", newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == list(COLUMNS)
+    assert rows[1][1:3] == ["Отчет <1> & ко", "Сигнал\nмиографии"]
+    assert rows[2][1:3] == ["'=HYPERLINK(\"http://evil\",\"x\")", "'@SUM(A1:A2)"]
+    assert len(rows) == len(ROWS) + 1
+
+
+def test_render_xlsx(spool, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    output = str(tmp_path / "reports.xlsx")
+    render("xlsx", spool, output)
+    sheet = openpyxl.load_workbook(output).active
+    assert [cell.value for cell in sheet[1]] == list(COLUMNS)
+    title, content = sheet["B3"], sheet["C3"]
+    # Текст, похожий на формулу, остается строкой
+    assert (title.data_type, title.value) == ("s", "=HYPERLINK(\"http://evil\",\"x\")")
+    assert (content.data_type, content.value) == ("s", "@SUM(A1:A2)")
+    # Текст обрезан до лимита ячейки Excel, недопустимые в XML символы удалены
+    assert sheet["C4"].value == "x" * XLSX_CELL_LIMIT
+    assert sheet["D2"].is_date
+
+
+def test_render_pdf(spool, tmp_path):
+    pytest.importorskip("reportlab")
+    output = str(tmp_path / "reports.pdf")
+    size = render("pdf", spool, output)
+    with open(output, "rb") as file:
+        assert file.read(5) == b"%PDF-"
+    assert size > 0
+
+
+def test_failed_render_leaves_no_files(tmp_path):
+    output = str(tmp_path / "reports.csv")
+    with pytest.raises(OSError):
+        render("csv", str(tmp_path / "missing.ndjson"), output)
+    assert os.listdir(tmp_path) == []
+
+
+def test_available_formats():
+    assert "csv" in available_formats()
@@ -0,0 +1,81 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.router import router
+from api.schemas import AddReport, AddUser
+from auth.dependencies import check_prothetic_user
+from cache.backends import InMemoryLRUBackend, NullBackend, build_backend
+from cache.response_cache import ResponseCache, etag_matches
+from db.dao import ReportsDAO, UsersDAO
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "none"])
+def cache(request, monkeypatch):
+    backend = InMemoryLRUBackend() if request.param == "memory" else NullBackend()
+    cache = ResponseCache(backend, ttl=60)
+    for module in ("api.router", "db.base", "ingest.reports"):
+        monkeypatch.setattr(f"{module}.response_cache", cache)
+    return cache
+
+
+@pytest.fixture
+async def client(db_router, cache):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[check_prothetic_user] = lambda: {"sub": "u1"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def add_report(session_maker, title: str) -> None:
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([AddUser(id="u1", email="u1@example.com", preferred_username="u1")])
+        await ReportsDAO(session).add_many([AddReport(title=title, content="...", user_id="u1")])
+        await session.commit()
+
+
+def test_build_backend():
+    assert isinstance(build_backend("none", workers=4), NullBackend)
+    assert isinstance(build_backend("memory", workers=1), InMemoryLRUBackend)
+    with pytest.raises(ValueError, match="только с одним worker-ом"):
+        build_backend("memory", workers=4)
+
+
+def test_etag_matches():
+    assert etag_matches('W/"a", "b"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches(None, '"a"')
+
+
+async def test_etag_and_not_modified(client, cache, session_maker):
+    await add_report(session_maker, "Первый")
+    first = await client.get("/api/reports")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = await client.get("/api/reports")
+    assert (second.status_code, second.headers["etag"], second.content) == (200, etag, first.content)
+    if isinstance(cache.backend, InMemoryLRUBackend):
+        assert (cache.hits, cache.misses) == (1, 1)
+    else:
+        # Без кеша каждый запрос идет в БД, ETag тот же - по телу ответа
+        assert (cache.hits, cache.misses) == (0, 2)
+
+    not_modified = await client.get("/api/reports", headers={"If-None-Match": etag})
+    assert (not_modified.status_code, not_modified.content) == (304, b"")
+    assert not_modified.headers["etag"] == etag
+
+
+async def test_write_invalidates_cached_page(client, session_maker):
+    await add_report(session_maker, "Первый")
+    etag = (await client.get("/api/reports")).headers["etag"]
+
+    await add_report(session_maker, "Второй")
+    response = await client.get("/api/reports", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [report["title"] for report in response.json()["reports"]] == ["Первый", "Второй"]
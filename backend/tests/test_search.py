@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, update
+
+from api.responses import JSON_MEDIA_TYPE, render
+from api.schemas import AddReport, AddUser
+from db.dao import ReportsDAO, UsersDAO
+from db.models import Report
+from db.search import fts5_query, highlight, search_statement
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("миография сигнал", '"миография" "сигнал"*'),
+        ('amp* OR "x" NEAR(a b) -c', '"amp" "OR" "x" "NEAR" "a" "b" "c"*'),
+        ("  ", ""),
+    ],
+)
+def test_fts5_query_quotes_terms(query, expected):
+    assert fts5_query(query) == expected
+
+
+def test_highlight_escapes_text():
+    assert highlight("<b>\x02сигнал\x03</b>") == "&lt;b&gt;<mark>сигнал</mark>&lt;/b&gt;"
+    assert highlight(None) == ""
+
+
+def test_unsupported_dialect():
+    with pytest.raises(ValueError, match="только SQLite и PostgreSQL"):
+        search_statement("mysql")
+
+
+@pytest.mark.anyio
+async def test_search_user_reports(session_maker):
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([
+            AddUser(id=user_id, email=f"{user_id}@example.com", preferred_username=user_id) for user_id in ("u1", "u2")
+        ])
+        await ReportsDAO(session).add_many([
+            AddReport(title="Миография кисти", content="Сигнал стабильный <норма>", user_id="u1"),
+            AddReport(title="Калибровка", content="Сигнал миографии зашумлен", user_id="u1"),
+            AddReport(title="Миография", content="Чужой отчет", user_id="u2"),
+        ])
+        await session.commit()
+
+    async with session_maker() as session:
+        dao = ReportsDAO(session)
+        results = await dao.search("u1", "сигнал", limit=10)
+        assert sorted(row["title"] for row in results) == ["Калибровка", "Миография кисти"]
+        # По убыванию релевантности
+        assert [row["rank"] for row in results] == sorted((row["rank"] for row in results), reverse=True)
+        first = next(row for row in results if row["title"] == "Миография кисти")
+        # Типы как у остальных запросов отчетов: datetime сериализуется в ISO 8601
+        assert isinstance(first["created_at"], datetime)
+        assert b'"created_at":"' + first["created_at"].isoformat().encode() in render({"r": first}, JSON_MEDIA_TYPE)
+        assert "<mark>" in first["snippet"] and "<норма>" not in first["snippet"]
+        assert first["rank"] >= 0
+
+        assert await dao.search("u1", "чужой", limit=10) == []
+        assert len(await dao.search("u1", "сигнал", limit=1, offset=1)) == 1
+
+        # Индекс обновляется триггерами при изменении и удалении отчетов
+        report_id = next(row["id"] for row in results if row["title"] == "Калибровка")
+        await session.execute(update(Report).where(Report.id == report_id).values(content="Протез исправен"))
+        await session.commit()
+        assert [row["id"] for row in await dao.search("u1", "протез", limit=10)] == [report_id]
+        await session.execute(delete(Report).where(Report.id == report_id))
+        await session.commit()
+        assert await dao.search("u1", "протез", limit=10) == []
@@ -0,0 +1,107 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, insert, select, update
+
+from api.schemas import AddUser
+from db.dao import ReportsDAO, UsersDAO
+from db.models import Report, ReportDailySummary
+from db.summary import ReportSummaryRefresher
+
+
+pytestmark = pytest.mark.anyio
+
+DAY = date(2026, 1, 1)
+
+
+async def seed(session_maker) -> None:
+    async with session_maker() as session:
+        await UsersDAO(session).upsert_many([
+            AddUser(id=user_id, email=f"{user_id}@example.com", preferred_username=user_id) for user_id in ("u1", "u2")
+        ])
+        # Отчеты u2 изменены давно, отчеты u1 - позже: граница после первого обновления - updated_at u1
+        await session.execute(insert(Report), [
+            {"title": "a", "content": "12345", "user_id": "u1",
+             "created_at": datetime(2026, 1, 1, 9), "updated_at": datetime(2026, 1, 1, 10)},
+            {"title": "b", "content": "123", "user_id": "u2",
+             "created_at": datetime(2026, 1, 1, 7), "updated_at": datetime(2026, 1, 1, 8)},
+            {"title": "c", "content": "1", "user_id": None,
+             "created_at": datetime(2026, 1, 2, 7), "updated_at": datetime(2026, 1, 1, 8)},
+        ])
+        await session.commit()
+
+
+async def summaries(session_maker) -> dict:
+    async with session_maker() as session:
+        rows = (await session.execute(select(ReportDailySummary))).scalars().all()
+        return {(row.user_id, row.day): (row.reports, row.content_length) for row in rows}
+
+
+@pytest.fixture
+def statements(session_maker):
+    """SQL-запросы, выполненные движком тестовой БД"""
+    executed = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    sync_engine = session_maker.kw["bind"].sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    yield executed
+    event.remove(sync_engine, "before_cursor_execute", capture)
+
+
+async def test_summarize_days_filters_by_user(session_maker, statements):
+    await seed(session_maker)
+    async with session_maker() as session:
+        statements.clear()
+        rows = await ReportsDAO(session).summarize_days({("u1", DAY)})
+    assert [(row["user_id"], row["day"], row["reports"], row["content_length"]) for row in rows] == [
+        ("u1", DAY, 1, 5)
+    ]
+    # Отчеты других пользователей за тот же день не читаются: условие по user_id в запросе
+    ((statement, parameters),) = statements
+    assert "reports.user_id =" in statement
+    assert "u2" not in str(parameters)
+
+
+async def test_refresh_recomputes_only_changed_days(session_maker, db_router, statements):
+    await seed(session_maker)
+    refresher = ReportSummaryRefresher(lookback=60)
+    assert await refresher.refresh() == 3
+    assert await summaries(session_maker) == {("u1", DAY): (1, 5), ("u2", DAY): (1, 3), ("", date(2026, 1, 2)): (1, 1)}
+
+    async with session_maker() as session:
+        await session.execute(update(Report).where(Report.user_id == "u1").values(content="1234567"))
+        await session.commit()
+    statements.clear()
+    assert await refresher.refresh() == 1
+    assert await summaries(session_maker) == {("u1", DAY): (1, 7), ("u2", DAY): (1, 3), ("", date(2026, 1, 2)): (1, 1)}
+    summary_queries = [parameters for statement, parameters in statements if "GROUP BY" in statement]
+    assert summary_queries and all("u2" not in str(parameters) for parameters in summary_queries)
+
+    # Запись в пределах lookback от границы пересчитывается повторно (идемпотентно), остальные - нет
+    assert await refresher.refresh() == 1
+    # Полная пересборка дает ту же сводку
+    assert await refresher.rebuild() == 3
+    assert await summaries(session_maker) == {("u1", DAY): (1, 7), ("u2", DAY): (1, 3), ("", date(2026, 1, 2)): (1, 1)}
+
+
+async def test_summarize_days_in_chunks(session_maker):
+    await seed(session_maker)
+    async with session_maker() as session:
+        dao = ReportsDAO(session)
+        dao.summary_chunk_size = 1
+        rows = await dao.summarize_days({("u1", DAY), ("u2", DAY), ("", date(2026, 1, 2)), ("u2", date(2026, 1, 5))})
+    assert sorted((row["user_id"], row["day"]) for row in rows) == [("", date(2026, 1, 2)), ("u1", DAY), ("u2", DAY)]
+
+
+async def test_single_leader_per_host(tmp_path):
+    lock_path = str(tmp_path / "summary.lock")
+    first, second = ReportSummaryRefresher(lock_path=lock_path), ReportSummaryRefresher(lock_path=lock_path)
+    assert first._acquire_leadership()
+    assert not second._acquire_leadership()
+    # Лидер остановился - фоновое обновление забирает другой worker
+    await first.stop()
+    assert second._acquire_leadership()
+    await second.stop()
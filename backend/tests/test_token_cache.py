@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from auth.jwks import InvalidTokenError
+from auth.keycloak_client import KeycloakClient
+from auth.token_cache import TokenClaimsCache
+
+
+def claims(sub: str, ttl: float = 300) -> dict:
+    return {"sub": sub, "exp": time.time() + ttl}
+
+
+def test_get_set_and_stats():
+    cache = TokenClaimsCache(maxsize=10)
+    assert cache.get("token") is None
+    cache.set("token", claims("u1"))
+    assert cache.get("token")["sub"] == "u1"
+    assert cache.stats() == {"size": 1, "maxsize": 10, "hits": 1, "misses": 1}
+
+
+def test_key_is_token_hash():
+    cache = TokenClaimsCache()
+    cache.set("secret-token", claims("u1"))
+    assert "secret-token" not in cache._data
+    assert all(len(key) == 64 for key in cache._data)
+
+
+def test_expired_entry_is_evicted():
+    cache = TokenClaimsCache()
+    cache.set("token", claims("u1", ttl=-1))
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = TokenClaimsCache(maxsize=2)
+    cache.set("a", claims("a"))
+    cache.set("b", claims("b"))
+    cache.get("a")
+    cache.set("c", claims("c"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_tokens_without_exp_and_zero_size_are_not_cached():
+    cache = TokenClaimsCache()
+    cache.set("token", {"sub": "u1"})
+    assert cache.get("token") is None
+    disabled = TokenClaimsCache(maxsize=0)
+    disabled.set("token", claims("u1"))
+    assert disabled.get("token") is None
+
+
+class FakeVerifier:
+    def __init__(self):
+        self.calls = 0
+
+    async def verify(self, token: str) -> dict:
+        self.calls += 1
+        if token == "bad":
+            raise InvalidTokenError("Signature verification failed")
+        return {**claims(token), "realm_access": {"roles": ["prothetic_user"]}}
+
+
+@pytest.mark.anyio
+async def test_get_user_info_verifies_token_once():
+    verifier = FakeVerifier()
+    keycloak = KeycloakClient(client=object(), verifier=verifier)
+    first = await keycloak.get_user_info("u1")
+    # Изменение возвращенной копии не меняет запись кеша
+    first["sub"] = "changed"
+    second = await keycloak.get_user_info("u1")
+    assert second["sub"] == "u1"
+    assert "prothetic_user" in second.roles
+    assert verifier.calls == 1
+
+    # Неверный токен не кешируется
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            await keycloak.get_user_info("bad")
+        assert error.value.status_code == 401
+    assert verifier.calls == 3
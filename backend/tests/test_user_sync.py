@@ -0,0 +1,94 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api.router import router
+from api.schemas import AddReport, AddUser
+from auth.dependencies import get_keycloak_client
+from auth.user_sync import UserProfileSync
+from db.dao import UsersDAO
+from ingest.reports import write_reports
+
+
+pytestmark = pytest.mark.anyio
+
+COLUMNS = ["id", "email", "preferred_username"]
+
+
+class FakeKeycloak:
+    def __init__(self, user_info: dict):
+        self.user_info = user_info
+
+    async def get_tokens(self, code: str) -> dict:
+        return {"access_token": "access", "refresh_token": "refresh", "id_token": "id"}
+
+    async def get_user_info(self, access_token: str) -> dict:
+        return self.user_info
+
+
+@pytest.fixture
+def sync(monkeypatch):
+    sync = UserProfileSync(flush_interval=0)
+    monkeypatch.setattr("api.router.user_profile_sync", sync)
+    return sync
+
+
+async def login(user_info: dict) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_keycloak_client] = lambda: FakeKeycloak(user_info)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="https://test") as client:
+        return await client.get("/api/login/callback", params={"code": "code"})
+
+
+async def users(session_maker) -> list[dict]:
+    async with session_maker() as session:
+        return sorted(await UsersDAO(session).find_all_rows(None, columns=COLUMNS), key=lambda row: row["id"])
+
+
+async def test_ensure_ids_keeps_existing_profiles(session_maker):
+    async with session_maker() as session:
+        dao = UsersDAO(session)
+        await dao.upsert_many([AddUser(id="u1", email="u1@example.com", preferred_username="first")])
+        assert await dao.ensure_ids(["u1", "u2", None, "u2"]) == 2
+        await session.commit()
+    assert await users(session_maker) == [
+        {"id": "u1", "email": "u1@example.com", "preferred_username": "first"},
+        {"id": "u2", "email": None, "preferred_username": ""},
+    ]
+
+
+async def test_ingest_creates_user_row(db_router, session_maker):
+    await write_reports([AddReport(title="Отчет", content="...", user_id="new-user")])
+    assert await users(session_maker) == [{"id": "new-user", "email": None, "preferred_username": ""}]
+
+
+async def test_login_queues_profile_without_email(db_router, session_maker, sync):
+    response = await login({"sub": "u1", "preferred_username": "first"})
+    assert response.status_code == 307
+    assert response.headers["location"] == "/protected"
+    # Профиль пишется в фоне, не в запросе логина
+    assert await users(session_maker) == []
+    await sync.stop()
+    assert await users(session_maker) == [{"id": "u1", "email": None, "preferred_username": "first"}]
+
+    # Повторный логин с тем же профилем БД не трогает, измененный профиль снова в очереди
+    assert sync.sync(AddUser(id="u1", preferred_username="first"))
+    assert sync._pending == {}
+    sync.sync(AddUser(id="u1", email="u1@example.com", preferred_username="first"))
+    await sync.stop()
+    assert (await users(session_maker))[0]["email"] == "u1@example.com"
+
+
+async def test_login_does_not_depend_on_profile_sync(sync, monkeypatch):
+    def broken_sync(user):
+        raise RuntimeError("очередь недоступна")
+
+    monkeypatch.setattr(sync, "sync", broken_sync)
+    response = await login({"sub": "u1", "preferred_username": "first"})
+    assert response.status_code == 307
+    assert "access_token" in response.cookies
+
+    # Неполный профиль тоже не мешает логину
+    response = await login({"sub": "u1"})
+    assert response.status_code == 307
@@ -0,0 +1,3 @@
+-- БД backend-а в том же PostgreSQL, что и Keycloak (скрипт выполняется только при инициализации тома).
+-- Для уже созданного тома: docker compose exec keycloak_db createdb -U keycloak_user reports_db
+CREATE DATABASE reports_db;